@@ -15,5 +15,7 @@ class ActionWithContext(Action[TMessage], Generic[TMessage]):
         # would raise an exception.
         # self.channel = app.state.channel
         self.repository = app.state.repository
+        self.job_state_store = app.state.job_state_store
         self.filesystem = app.state.filesystem
+        self.result_archive = app.state.result_archive
         self.config = app.state.config
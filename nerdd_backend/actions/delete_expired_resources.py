@@ -51,6 +51,7 @@ class DeleteExpiredResources(ActionWithContext[LogMessage]):
             # -> track the start time
             t = datetime.now()
 
+            expired_source_ids = []
             async for source in self.repository.get_expired_sources(deadline):
                 try:
                     uuid = source.id
@@ -63,8 +64,7 @@ class DeleteExpiredResources(ActionWithContext[LogMessage]):
                     except FileNotFoundError:
                         pass
 
-                    # delete source from database
-                    await self.repository.delete_source_by_id(uuid)
+                    expired_source_ids.append(uuid)
                 except Exception as e:
                     logger.error(f"Error deleting expired source {source.id}", exc_info=e)
 
@@ -72,6 +72,10 @@ class DeleteExpiredResources(ActionWithContext[LogMessage]):
                 if datetime.now() - t > timedelta(seconds=5):
                     break
 
+            # delete sources from database (in a single operation)
+            if len(expired_source_ids) > 0:
+                await self.repository.delete_sources_by_ids(expired_source_ids)
+
             # wait a bit before checking for expired jobs again
             await asyncio.sleep(30)
 
@@ -1,4 +1,5 @@
 import logging
+from typing import List
 
 from nerdd_link import JobMessage, SerializationRequestMessage, Tombstone
 
@@ -11,32 +12,41 @@ logger = logging.getLogger(__name__)
 
 class DeleteJob(ActionWithContext[JobMessage]):
     def __init__(self, app) -> None:
-        super().__init__(app, app.state.channel.jobs_topic())
+        super().__init__(app, app.state.channel.jobs_topic(), batch_size=100)
 
     async def _process_message(self, message: JobMessage) -> None:
         pass
 
-    async def _process_tombstone(self, message: Tombstone[JobMessage]) -> None:
-        job_id = message.id
-        logger.info(f"Deleting job with ID {job_id}")
-
-        # delete job (if not already deleted)
-        await self.repository.delete_job_by_id(job_id)
-
-        # send tombstone messages on results topic
-        # for result in self.repository.get_results_by_job_id(job_id):
-        #     await self.channel.results_topic().send(
-        #         Tombstone(
-        #             ResultMessage,
-        #             id=result.id,
-        #         )
-        #     )
-
-        # delete corresponding results
-        await self.repository.delete_results_by_job_id(job_id)
-
-        # send tombstone messages on serialization requests topic
-        for output_format in self.config.output_formats:
-            await self.channel.serialization_requests_topic().send(
-                Tombstone(SerializationRequestMessage, job_id=job_id, output_format=output_format)
-            )
+    async def _process_tombstones(self, tombstones: List[Tombstone[JobMessage]]) -> None:
+        if len(tombstones) == 0:
+            return
+
+        job_ids = list(dict.fromkeys(tombstone.id for tombstone in tombstones))
+        logger.info(f"Deleting jobs with IDs {job_ids}")
+
+        # delete jobs (if not already deleted) in a single operation
+        await self.repository.delete_jobs_by_ids(job_ids)
+        for job_id in job_ids:
+            self.job_state_store.invalidate(job_id)
+
+        for job_id in job_ids:
+            # send tombstone messages on results topic
+            # for result in self.repository.get_results_by_job_id(job_id):
+            #     await self.channel.results_topic().send(
+            #         Tombstone(
+            #             ResultMessage,
+            #             id=result.id,
+            #         )
+            #     )
+
+            # delete corresponding results (in the database or in the archive)
+            await self.repository.delete_results_by_job_id(job_id)
+            await self.result_archive.delete(job_id)
+
+            # send tombstone messages on serialization requests topic
+            for output_format in self.config.output_formats:
+                await self.channel.serialization_requests_topic().send(
+                    Tombstone(
+                        SerializationRequestMessage, job_id=job_id, output_format=output_format
+                    )
+                )
@@ -24,6 +24,7 @@ class ProcessSerializationResult(ActionWithContext[SerializationResultMessage]):
             updated_job = await self.repository.update_job(
                 JobUpdate(id=job_id, new_output_formats=[output_format])
             )
+            self.job_state_store.apply_update(updated_job)
 
             #
             # Check if all output formats have been processed.
@@ -45,10 +46,34 @@ class ProcessSerializationResult(ActionWithContext[SerializationResultMessage]):
             # But more importantly, the topic is partitioned by job ID, so only one worker will
             # process the serialization result for a given job at a time!
             if len(set(updated_job.output_formats)) == len(set(self.config.output_formats)):
-                await self.repository.update_job(JobUpdate(id=job_id, status="completed"))
+                completed_job = await self.repository.update_job(
+                    JobUpdate(id=job_id, status="completed")
+                )
+                self.job_state_store.apply_update(completed_job)
+
+                if self.config.result_archive_enabled:
+                    await self._archive_results(job_id)
         except RecordNotFoundError as e:
             # The job might have been deleted in the meantime.
             logger.warning(f"Job with ID {job_id} not found: {e}")
 
+    async def _archive_results(self, job_id: str) -> None:
+        # Results might still be on their way to the database (they are consumed by another
+        # action). Incomplete jobs are not archived and their results stay in the database.
+        job = await self.repository.get_job_by_id(job_id)
+        if not job.is_done():
+            logger.info(f"Results of job {job_id} are incomplete, skipping archival")
+            return
+
+        # results are streamed into the archive page by page (jobs might be very large)
+        num_bytes = await self.result_archive.write(
+            job_id, job.page_size, self.repository.iter_results_by_job_id(job_id)
+        )
+        logger.info(f"Archived results of job {job_id} ({num_bytes} bytes)")
+
+        # The archive is used as soon as it exists -> the results can be deleted. Results that
+        # are redelivered afterwards are ignored by SaveResultToDb.
+        await self.repository.delete_results_by_job_id(job_id)
+
     def _get_group_name(self):
         return "process-serialization-result"
@@ -28,6 +28,8 @@ class SaveResultCheckpointToDb(ActionWithContext[ResultCheckpointMessage]):
             logger.warning(f"Job {job_id} not found, skipping checkpoint processing")
             return
 
+        self.job_state_store.apply_update(job)
+
         # create result checkpoint
         try:
             await self.repository.create_result_checkpoint(
@@ -1,10 +1,9 @@
-import asyncio
 import logging
-from typing import List
+from collections import defaultdict
+from typing import Dict, List
 
 from nerdd_link import ResultMessage
 
-from ..data import RecordNotFoundError
 from ..models import Result
 from .action_with_context import ActionWithContext
 
@@ -21,43 +20,51 @@ class SaveResultToDb(ActionWithContext[ResultMessage]):
         #
         # Validate job ids
         #
-        valid_jobs = set()
-        invalid_jobs = set()
-        valid_messages = []
-        for message in messages:
-            job_id = message.job_id
-
-            if job_id not in valid_jobs and job_id not in invalid_jobs:
-                try:
-                    await self.repository.get_job_by_id(job_id)
-                    valid_jobs.add(job_id)
-                except RecordNotFoundError:
-                    logger.warning(f"Job with id {job_id} not found. Ignoring this result.")
-                    invalid_jobs.add(job_id)
-
-            if job_id in valid_jobs:
-                valid_messages.append(message.model_dump())
-            elif job_id in invalid_jobs:
-                # If a job was submitted and deleted during processing, results might still be
-                # generated. In this case, we ignore the results of the deleted job.
-                continue
+        job_ids = list({message.job_id for message in messages})
+        valid_jobs = {
+            job["id"] for job in await self.repository.get_jobs_by_ids(job_ids, fields=["id"])
+        }
+
+        # If a job was submitted and deleted during processing, results might still be generated.
+        # In this case, we ignore the results of the deleted job.
+        for job_id in set(job_ids) - valid_jobs:
+            logger.warning(f"Job with id {job_id} not found. Ignoring this result.")
+
+        # Results of archived jobs were removed from the database. Redelivered results of these
+        # jobs are ignored (otherwise they would be stored again and never be cleaned up).
+        if self.config.result_archive_enabled:
+            for job_id in list(valid_jobs):
+                if await self.result_archive.contains(job_id):
+                    logger.info(f"Job with id {job_id} was archived. Ignoring this result.")
+                    valid_jobs.remove(job_id)
+
+        valid_messages = [
+            message.model_dump() for message in messages if message.job_id in valid_jobs
+        ]
 
         # TODO: check if corresponding modules have correct task types
         # (e.g. "derivative_prediction")
 
-        # we cache sources to minimize database lookups
-        source_cache = {}
-
-        async def _get_source(source_id):
-            if source_id in source_cache:
-                return source_cache[source_id]
-            try:
-                source = await self.repository.get_source_by_id(source_id)
-                filename = source.filename
-            except RecordNotFoundError:
-                filename = source_id
-            source_cache[source_id] = filename
-            return filename
+        def _has_source_ids(message):
+            return (
+                "source" in message
+                and message["source"] is not None
+                and not isinstance(message["source"], str)
+            )
+
+        # fetch all referenced sources in a single lookup
+        source_ids = list(
+            {
+                source_id
+                for message in valid_messages
+                if _has_source_ids(message)
+                for source_id in message["source"]
+            }
+        )
+        filenames = {
+            source.id: source.filename
+            for source in await self.repository.get_sources_by_ids(source_ids)
+        }
 
         for message in valid_messages:
             job_id = message["job_id"]
@@ -65,14 +72,11 @@ class SaveResultToDb(ActionWithContext[ResultMessage]):
             #
             # Map sources to original file names
             #
-            if (
-                "source" in message
-                and message["source"] is not None
-                and not isinstance(message["source"], str)
-            ):
-                translated_sources = await asyncio.gather(
-                    *(_get_source(source_id) for source_id in message["source"])
-                )
+            if _has_source_ids(message):
+                # missing sources are kept as is
+                translated_sources = [
+                    filenames.get(source_id, source_id) for source_id in message["source"]
+                ]
                 message["source"] = [s for s in translated_sources if s is not None]
 
             #
@@ -98,8 +102,21 @@ class SaveResultToDb(ActionWithContext[ResultMessage]):
                     id = f"{job_id}-{mol_id}"
                 message["id"] = id
 
-        # save results to database
-        await self.repository.upsert_results([Result(**message) for message in valid_messages])
+        # save results to database (unchanged results, e.g. redelivered messages, are skipped)
+        summary = await self.repository.upsert_results(
+            [Result(**message) for message in valid_messages]
+        )
+        logger.debug(
+            f"Saved results: {summary.num_inserted} inserted, {summary.num_updated} updated, "
+            f"{summary.num_skipped} skipped"
+        )
+
+        # update the progress of the jobs kept in memory
+        mol_ids_by_job: Dict[str, List[int]] = defaultdict(list)
+        for message in valid_messages:
+            mol_ids_by_job[message["job_id"]].append(message["mol_id"])
+        for job_id, mol_ids in mol_ids_by_job.items():
+            self.job_state_store.add_progress(job_id, mol_ids)
 
     def _get_group_name(self):
         return "save-result-to-db"
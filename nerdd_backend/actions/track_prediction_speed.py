@@ -20,16 +20,17 @@ class TrackPredictionSpeed(ActionWithContext[LogMessage]):
     async def _process_message(self, message: LogMessage) -> None:
         job_id = message.job_id
         if message.message_type == "all_checkpoints_processed":
-            # get job
+            # get job (we don't need its progress)
             try:
-                job = await self.repository.get_job_by_id(job_id)
+                job = await self.repository.get_job_internal(job_id)
             except RecordNotFoundError:
                 # the job might not exist anymore, e.g., if it was deleted
                 logger.warning(f"Job {job_id} not found, skipping checkpoint processing")
                 return
 
-            # update all checkpoints with their size
+            # update all checkpoints with their size (in a single operation)
             checkpoints = await self.repository.get_result_checkpoints_by_job_id(job_id)
+            updated_checkpoints = []
             for checkpoint in checkpoints:
                 # compute checkpoint size
                 # * all checkpoints (except the last one) have the same size checkpoint_size
@@ -42,17 +43,17 @@ class TrackPredictionSpeed(ActionWithContext[LogMessage]):
                     job.num_entries_total - checkpoint.checkpoint_id * job.checkpoint_size,
                 )
 
-                try:
-                    await self.repository.update_result_checkpoint(
-                        ResultCheckpoint(
-                            **{
-                                **checkpoint.model_dump(),
-                                "size": size,
-                            }
-                        )
+                updated_checkpoints.append(
+                    ResultCheckpoint(
+                        **{
+                            **checkpoint.model_dump(),
+                            "size": size,
+                        }
                     )
-                except RecordNotFoundError:
-                    continue
+                )
+
+            # (checkpoints that were deleted in the meantime are skipped)
+            await self.repository.update_result_checkpoints(updated_checkpoints)
 
             # get module
             try:
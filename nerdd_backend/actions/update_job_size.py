@@ -37,6 +37,8 @@ class UpdateJobSize(ActionWithContext[LogMessage]):
                 logger.warning(f"Job with ID {message.job_id} not found: {e}")
                 return
 
+            self.job_state_store.apply_update(job)
+
             # check if all checkpoints have been processed
             checkpoints = await self.repository.get_result_checkpoints_by_job_id(job_id)
             if len(checkpoints) == job.num_checkpoints_total:
@@ -34,7 +34,22 @@ class AppConfig:
     page_size_atom_property_prediction: int = 3
     page_size_derivative_property_prediction: int = 2
 
+    # maximum number of pending changes per websocket subscriber
+    subscriber_queue_size: int = 100
+    # minimum time between two progress updates of a job sent to websocket subscribers (status
+    # changes and the final state of a job are sent immediately)
+    job_progress_window_seconds: float = 0.25
+
+    # number of jobs (including their progress) kept in memory to answer status requests and the
+    # maximum age of their last database read
+    job_state_store_size: int = 10_000
+    job_state_max_staleness_seconds: float = 5
+
     media_root: str = "./media"
+
+    # move the results of completed jobs from the database to compressed files in media_root
+    result_archive_enabled: bool = False
+    result_archive_compression_level: int = 6
     mock_infra: bool = False
 
     # note: output_formats: List[str] = ["sdf", "csv"] would raise a ValueError (mutable
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, Optional
 
 
 @dataclass
@@ -8,3 +8,56 @@ class DbConfig:
     host: Optional[str] = None
     port: Optional[int] = None
     database_name: Optional[str] = None
+    # path of the database file (sqlite only)
+    path: Optional[str] = None
+
+    # connection pool (rethinkdb only)
+    pool_min_size: int = 1
+    pool_max_size: int = 10
+    pool_max_idle_seconds: float = 300
+    pool_health_check_interval_seconds: float = 30
+    # maximum number of connections used by changefeeds (e.g. websockets)
+    changefeed_max_connections: int = 100
+
+    # number of shards and replicas per table, e.g. {"results": 4} (rethinkdb only)
+    table_shards: Dict[str, int] = field(default_factory=dict)
+    table_replicas: Dict[str, int] = field(default_factory=dict)
+    # durability ("hard" or "soft") and read mode ("single", "majority" or "outdated") per
+    # repository method, e.g. {"upsert_results": "soft"} (rethinkdb only)
+    durability: Dict[str, str] = field(default_factory=dict)
+    read_mode: Dict[str, str] = field(default_factory=dict)
+
+    # maximum number of pending changes per change subscription (memory and sqlite only)
+    changefeed_queue_size: int = 100_000
+    # store the progress of jobs as a list of intervals or as a compact base64-encoded string
+    # (sqlite only)
+    progress_encoding: str = "intervals"
+
+    # cancel database calls after a timeout per query class ("read", "write", "bulk") or per
+    # repository method and fail fast (503) after failure_threshold consecutive timeouts
+    circuit_breaker_enabled: bool = False
+    timeout_seconds: Dict[str, float] = field(
+        default_factory=lambda: dict(read=5.0, write=10.0, bulk=30.0)
+    )
+    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_reset_seconds: float = 10
+
+    # record latencies of all repository calls (exposed at /metrics/repository) and log slow calls
+    instrumentation_enabled: bool = False
+    slow_query_threshold_seconds: float = 0.5
+
+    # cache for modules and sources
+    cache_enabled: bool = False
+    cache_max_size: int = 1000
+    cache_ttl_seconds: float = 60
+
+    # let concurrent identical reads of a job or result page share one query (and optionally
+    # reuse at most coalescing_max_size results for coalescing_ttl_seconds)
+    coalescing_enabled: bool = False
+    coalescing_ttl_seconds: float = 0
+    coalescing_max_size: int = 10_000
+
+    # persist the memory database in an append-only log (memory only, disabled if None)
+    persistence_path: Optional[str] = None
+    persistence_flush_interval_seconds: float = 0.1
+    persistence_snapshot_interval: int = 100_000
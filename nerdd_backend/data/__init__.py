@@ -1,4 +1,17 @@
+from .caching_repository import *
+from .change_router import *
+from .circuit_breaker_repository import *
+from .coalescing_repository import *
+from .connection_pool import *
+from .delegating_repository import *
 from .exceptions import *
+from .instrumented_repository import *
+from .job_state_store import *
+from .memory_log import *
 from .memory_repository import *
+from .memory_table import *
 from .repository import *
+from .result_archive import *
 from .rethinkdb_repository import *
+from .sqlite_repository import *
+from .subscription_hub import *
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from ..models import ModuleInternal, Source
+from ..util import LruCache
+from .delegating_repository import DelegatingRepository
+from .repository import Repository
+
+__all__ = ["CachingRepository"]
+
+logger = logging.getLogger(__name__)
+
+
+class CachingRepository(DelegatingRepository):
+    """
+    Caches modules and sources of another repository (read-through).
+
+    Modules are invalidated by the module changefeed of the inner repository (so changes made by
+    other processes are picked up as well). While the changefeed is not running, modules are not
+    served from the cache. Sources never change after their creation. They are invalidated on
+    deletion and expire after ttl_seconds (which bounds the staleness if another process deletes a
+    source).
+    """
+
+    def __init__(
+        self,
+        inner: Repository,
+        max_size: int = 1000,
+        ttl_seconds: Optional[float] = 60,
+        retry_interval_seconds: float = 5,
+    ) -> None:
+        super().__init__(inner)
+        self.retry_interval_seconds = retry_interval_seconds
+        self._modules = LruCache[ModuleInternal](max_size, ttl_seconds)
+        self._sources = LruCache[Source](max_size, ttl_seconds)
+        self._module_changes_task: Optional[asyncio.Task] = None
+        self._module_changes_ready = False
+
+        # incremented on every invalidation to detect reads that raced with a modification
+        self._generation = 0
+
+    #
+    # INITIALIZATION
+    #
+    async def initialize(self):
+        await super().initialize()
+        self._module_changes_task = asyncio.create_task(self._watch_module_changes())
+
+    async def close(self) -> None:
+        if self._module_changes_task is not None:
+            self._module_changes_task.cancel()
+            await asyncio.gather(self._module_changes_task, return_exceptions=True)
+            self._module_changes_task = None
+        await super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            **super().get_stats(),
+            cache=dict(modules=self._modules.get_stats(), sources=self._sources.get_stats()),
+        )
+
+    #
+    # MODULES
+    #
+    async def get_module_by_id(self, module_id: str) -> ModuleInternal:
+        if not self._module_changes_ready:
+            return await super().get_module_by_id(module_id)
+
+        module = self._modules.get(module_id)
+        if module is None:
+            generation = self._generation
+            module = await super().get_module_by_id(module_id)
+            # do not cache the module if it was modified (or the changefeed failed) in the meantime
+            if self._module_changes_ready and generation == self._generation:
+                self._modules.put(module_id, module)
+        return module
+
+    async def create_module(self, module: ModuleInternal) -> ModuleInternal:
+        result = await super().create_module(module)
+        self._invalidate_module(module.id)
+        return result
+
+    async def update_module(self, module: ModuleInternal) -> ModuleInternal:
+        result = await super().update_module(module)
+        self._invalidate_module(module.id)
+        return result
+
+    def _invalidate_module(self, module_id: str) -> None:
+        self._generation += 1
+        self._modules.invalidate(module_id)
+
+    async def _watch_module_changes(self) -> None:
+        while True:
+            try:
+                async for old, new in self.inner.get_module_changes():
+                    # the changefeed is running -> the cache can be used
+                    self._module_changes_ready = True
+                    for module in [old, new]:
+                        if module is not None:
+                            self._invalidate_module(module.id)
+                logger.warning("Module changefeed stopped unexpectedly")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Module changefeed failed", exc_info=e)
+            finally:
+                # we might have missed changes -> do not trust the cache anymore
+                self._module_changes_ready = False
+                self._generation += 1
+                self._modules.clear()
+
+            await asyncio.sleep(self.retry_interval_seconds)
+
+    #
+    # SOURCES
+    #
+    async def get_source_by_id(self, source_id: str) -> Source:
+        source = self._sources.get(source_id)
+        if source is None:
+            generation = self._generation
+            source = await super().get_source_by_id(source_id)
+            if generation == self._generation:
+                self._sources.put(source_id, source)
+        return source
+
+    async def delete_source_by_id(self, source_id: str) -> None:
+        self._generation += 1
+        self._sources.invalidate(source_id)
+        await super().delete_source_by_id(source_id)
+
+    async def get_sources_by_ids(self, source_ids: List[str]) -> List[Source]:
+        cached = {}
+        missing = []
+        for source_id in source_ids:
+            source = self._sources.get(source_id)
+            if source is None:
+                missing.append(source_id)
+            else:
+                cached[source_id] = source
+
+        if len(missing) > 0:
+            generation = self._generation
+            sources = await super().get_sources_by_ids(missing)
+            for source in sources:
+                cached[source.id] = source
+                if generation == self._generation:
+                    self._sources.put(source.id, source)
+
+        return [cached[source_id] for source_id in source_ids if source_id in cached]
+
+    async def delete_sources_by_ids(self, source_ids: List[str]) -> None:
+        self._generation += 1
+        for source_id in source_ids:
+            self._sources.invalidate(source_id)
+        await super().delete_sources_by_ids(source_ids)
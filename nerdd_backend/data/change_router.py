@@ -0,0 +1,174 @@
+import asyncio
+import inspect
+import logging
+from typing import (
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from .exceptions import ChangeFeedOverflowError
+
+__all__ = ["ChangeRouter"]
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Change = Tuple[Optional[T], Optional[T]]
+
+# marks the end of a subscription that did not keep up
+_OVERFLOW = object()
+
+
+class _Route:
+    def __init__(
+        self, key: Callable[[Any], Hashable], order: Optional[Callable[[Any], Any]]
+    ) -> None:
+        self.key = key
+        self.order = order
+        self.subscriptions: Dict[Hashable, Set["_Subscription"]] = {}
+
+
+class _Subscription:
+    def __init__(self, queue_size: int, lower: Any, upper: Any) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.lower = lower
+        self.upper = upper
+        self.overflowed = False
+
+    def put(self, change: Change) -> None:
+        if self.overflowed:
+            return
+
+        if self.queue.full():
+            # The subscriber is too slow. Instead of silently skipping changes (the subscriber
+            # would miss them forever), we drop all pending changes and close the subscription.
+            # The subscriber needs to subscribe again (starting with the current state).
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_OVERFLOW)
+            self.overflowed = True
+            return
+
+        self.queue.put_nowait(change)
+
+    def contains(self, order: Any) -> bool:
+        return (self.lower is None or self.lower <= order) and (
+            self.upper is None or order <= self.upper
+        )
+
+
+class ChangeRouter(Generic[T]):
+    """
+    Delivers changes (old, new) of a table only to the subscribers they are relevant for.
+
+    Subscribers register for a key of a route (e.g. all results with job_id "abc") and optionally
+    for a range of order values within that key (e.g. 10 <= mol_id <= 19). Publishing a change
+    only touches the subscribers of the affected keys instead of all subscribers of the table.
+    Subscribers without a route receive all changes.
+
+    Each subscriber has a bounded queue. If a subscriber does not keep up, its subscription is
+    closed with a ChangeFeedOverflowError (similar to SubscriptionHub, which replaces the pending
+    changes of slow subscribers by the current state).
+    """
+
+    def __init__(self, queue_size: int = 100_000) -> None:
+        self.queue_size = queue_size
+        self._routes: Dict[str, _Route] = {}
+        self._all: Set[_Subscription] = set()
+        self._num_overflows = 0
+
+    def add_route(
+        self,
+        name: str,
+        key: Callable[[T], Hashable],
+        order: Optional[Callable[[T], Any]] = None,
+    ) -> None:
+        self._routes[name] = _Route(key, order)
+
+    async def changes(
+        self,
+        route: Optional[str] = None,
+        key: Hashable = None,
+        lower: Any = None,
+        upper: Any = None,
+        initial: Optional[Callable[[], List[T] | Awaitable[List[T]]]] = None,
+    ) -> AsyncIterable[Change]:
+        subscription = _Subscription(self.queue_size, lower, upper)
+        if route is None:
+            subscriptions = self._all
+        else:
+            subscriptions = self._routes[route].subscriptions.setdefault(key, set())
+
+        # register before reading the initial records so that no change gets lost in between
+        subscriptions.add(subscription)
+        try:
+            if initial is not None:
+                records = initial()
+                if inspect.isawaitable(records):
+                    records = await records
+                for record in records:
+                    yield None, record
+
+            while True:
+                change = await subscription.queue.get()
+                if change is _OVERFLOW:
+                    raise ChangeFeedOverflowError(
+                        f"Change subscription did not keep up (more than {self.queue_size} "
+                        f"pending changes)"
+                    )
+                yield change
+        finally:
+            subscriptions.discard(subscription)
+            if route is not None and len(subscriptions) == 0:
+                self._routes[route].subscriptions.pop(key, None)
+
+    def is_active(self) -> bool:
+        # True if there is at least one subscriber (publishing can be skipped otherwise)
+        return len(self._all) > 0 or any(len(r.subscriptions) > 0 for r in self._routes.values())
+
+    def publish(self, change: Change) -> None:
+        receivers = set(self._all)
+        for r in self._routes.values():
+            if len(r.subscriptions) == 0:
+                continue
+            for record in change:
+                if record is None:
+                    continue
+                subscriptions = r.subscriptions.get(r.key(record))
+                if subscriptions is None:
+                    continue
+                if r.order is None:
+                    receivers.update(subscriptions)
+                else:
+                    order = r.order(record)
+                    receivers.update(s for s in subscriptions if s.contains(order))
+
+        for subscription in receivers:
+            if subscription.overflowed:
+                continue
+            subscription.put(change)
+            if subscription.overflowed:
+                self._num_overflows += 1
+                logger.warning("Change subscription is not keeping up, closing it")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            num_subscriptions=len(self._all)
+            + sum(
+                len(subscriptions)
+                for r in self._routes.values()
+                for subscriptions in r.subscriptions.values()
+            ),
+            num_overflows=self._num_overflows,
+        )
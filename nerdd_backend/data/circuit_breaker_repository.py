@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterable, Dict, Optional
+
+from ..util import CircuitBreaker
+from .delegating_repository import DelegatingRepository
+from .exceptions import DatabaseUnavailableError
+from .repository import Repository
+
+__all__ = ["CircuitBreakerRepository"]
+
+logger = logging.getLogger(__name__)
+
+# operations that read or write many records at once (all other operations are classified by
+# their name into "read" and "write")
+BULK_OPERATIONS = {
+    "upsert_results",
+    "get_results_by_job_id",
+    "delete_results_by_job_id",
+    "get_jobs_by_ids",
+    "delete_jobs_by_ids",
+    "get_sources_by_ids",
+    "delete_sources_by_ids",
+    "update_result_checkpoints",
+}
+
+
+def get_query_class(name: str) -> str:
+    if name in BULK_OPERATIONS:
+        return "bulk"
+    if name.startswith("get_") or name.endswith("_exists"):
+        return "read"
+    return "write"
+
+
+class CircuitBreakerRepository(DelegatingRepository):
+    """
+    Bounds the time spent waiting for the database.
+
+    Every call is cancelled after the timeout of its query class ("read", "write" or "bulk") or of
+    the operation itself (e.g. {"upsert_results": 60}). After repeated timeouts, a circuit breaker
+    rejects all calls until a probe call succeeds. Timeouts and rejected calls raise a
+    DatabaseUnavailableError (mapped to 503). Async iterables (e.g. changefeeds) are not timed
+    out, but they are rejected while the circuit breaker is open.
+    """
+
+    def __init__(
+        self,
+        inner: Repository,
+        timeout_seconds: Optional[Dict[str, float]] = None,
+        failure_threshold: int = 5,
+        reset_seconds: float = 10,
+    ) -> None:
+        super().__init__(inner)
+        self.timeout_seconds = dict(timeout_seconds or {})
+        self._breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._num_timeouts = 0
+
+    def _get_timeout(self, name: str) -> Optional[float]:
+        timeout = self.timeout_seconds.get(name)
+        if timeout is None:
+            timeout = self.timeout_seconds.get(get_query_class(name))
+        return timeout
+
+    def _check_breaker(self, name: str) -> None:
+        if not self._breaker.allow():
+            retry_after_seconds = self._breaker.retry_after_seconds()
+            raise DatabaseUnavailableError(
+                f"Database is unavailable, {name} was rejected",
+                retry_after_seconds=retry_after_seconds,
+            )
+
+    async def _call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        self._check_breaker(name)
+
+        timeout = self._get_timeout(name)
+        try:
+            result = await asyncio.wait_for(super()._call(name, *args, **kwargs), timeout)
+        except asyncio.TimeoutError as e:
+            self._num_timeouts += 1
+            self._breaker.record_failure()
+            logger.warning(f"Database call {name} timed out after {timeout} seconds")
+            raise DatabaseUnavailableError(
+                f"Database did not respond in time ({name})",
+                retry_after_seconds=self._breaker.retry_after_seconds(),
+            ) from e
+        except asyncio.CancelledError:
+            self._breaker.release()
+            raise
+        except Exception:
+            # the database responded (e.g. with RecordNotFoundError)
+            self._breaker.record_success()
+            raise
+
+        self._breaker.record_success()
+        return result
+
+    async def _stream(self, name: str, *args: Any, **kwargs: Any) -> AsyncIterable[Any]:
+        self._check_breaker(name)
+        # streams are not timed out -> they do not serve as probes
+        self._breaker.release()
+
+        async with aclosing(super()._stream(name, *args, **kwargs)) as items:
+            async for item in items:
+                yield item
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            **super().get_stats(),
+            circuit_breaker=dict(timeouts=self._num_timeouts, **self._breaker.get_stats()),
+        )
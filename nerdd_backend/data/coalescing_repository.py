@@ -0,0 +1,87 @@
+from typing import Any, Dict, List, Optional
+
+from ..models import JobInternal, JobUpdate, JobWithResults, Result, UpsertSummary
+from ..util import SingleFlight
+from .delegating_repository import DelegatingRepository
+from .repository import Repository
+
+__all__ = ["CoalescingRepository"]
+
+
+class CoalescingRepository(DelegatingRepository):
+    """
+    Lets concurrent identical reads of a job (get_job_by_id) or of a result page
+    (get_results_by_job_id) share a single database query, e.g. if many clients poll the same
+    job. Optionally, results are reused for ttl_seconds (keeping at most max_size results).
+
+    Modifications of a job or its results made through this repository are visible immediately
+    (later reads do not join earlier queries). Modifications by other processes are visible after
+    at most ttl_seconds.
+    """
+
+    def __init__(self, inner: Repository, ttl_seconds: float = 0, max_size: int = 10_000) -> None:
+        super().__init__(inner)
+        # keys are ("job", job_id) or ("results", job_id, start_mol_id, end_mol_id)
+        self._flights = SingleFlight[Any](ttl_seconds, max_size, group_of=lambda key: key[1])
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(**super().get_stats(), coalescing=self._flights.get_stats())
+
+    def _forget_job(self, job_id: str) -> None:
+        self._flights.forget_group(job_id)
+
+    #
+    # JOBS
+    #
+    async def get_job_by_id(self, job_id: str) -> JobWithResults:
+        return await self._flights.do(
+            ("job", job_id), lambda: super(CoalescingRepository, self).get_job_by_id(job_id)
+        )
+
+    async def update_job(self, job_update: JobUpdate) -> JobInternal:
+        try:
+            return await super().update_job(job_update)
+        finally:
+            self._forget_job(job_update.id)
+
+    async def delete_job_by_id(self, job_id: str) -> None:
+        try:
+            return await super().delete_job_by_id(job_id)
+        finally:
+            self._forget_job(job_id)
+
+    async def delete_jobs_by_ids(self, job_ids: List[str]) -> None:
+        try:
+            return await super().delete_jobs_by_ids(job_ids)
+        finally:
+            for job_id in job_ids:
+                self._forget_job(job_id)
+
+    #
+    # RESULTS
+    #
+    async def get_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+    ) -> List[Result]:
+        return await self._flights.do(
+            ("results", job_id, start_mol_id, end_mol_id),
+            lambda: super(CoalescingRepository, self).get_results_by_job_id(
+                job_id, start_mol_id, end_mol_id
+            ),
+        )
+
+    async def upsert_results(self, results: List[Result]) -> UpsertSummary:
+        try:
+            return await super().upsert_results(results)
+        finally:
+            for job_id in {result.job_id for result in results}:
+                self._forget_job(job_id)
+
+    async def delete_results_by_job_id(self, job_id: str) -> None:
+        try:
+            return await super().delete_results_by_job_id(job_id)
+        finally:
+            self._forget_job(job_id)
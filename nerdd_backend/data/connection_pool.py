@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+__all__ = ["ConnectionPool"]
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections.
+
+    Connections are created lazily by the provided connect function (up to max_size) and handed
+    out exclusively via acquire(). Connections must provide the methods is_open() and (async)
+    close() like RethinkDB connections do.
+
+    * Idle connections are closed after max_idle_seconds (but the pool keeps at least min_size
+      connections).
+    * Connections that were idle for more than health_check_interval_seconds are checked with
+      the health_check function before they are handed out.
+    * If reuse is False, connections are closed when they are released. This is useful for
+      long-lived connections (e.g. changefeeds) where the pool only acts as a budget.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[Any]],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle_seconds: float = 300,
+        health_check_interval_seconds: float = 30,
+        health_check: Optional[Callable[[Any], Awaitable[None]]] = None,
+        reuse: bool = True,
+    ) -> None:
+        assert 0 <= min_size <= max_size, "min_size must be between 0 and max_size"
+        assert max_size > 0, "max_size must be positive"
+
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_interval_seconds = health_check_interval_seconds
+        self.health_check = health_check
+        self.reuse = reuse
+
+        self._idle: List[_PooledConnection] = []
+        self._size = 0
+        self._condition = asyncio.Condition()
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # statistics
+        self._num_in_use = 0
+        self._num_waiting = 0
+        self._num_created = 0
+        self._num_closed = 0
+        self._num_acquired = 0
+        self._num_failed_health_checks = 0
+
+    async def start(self) -> None:
+        # create the minimum number of connections
+        for _ in range(self.min_size):
+            async with self._condition:
+                self._size += 1
+            try:
+                entry = await self._create()
+            except Exception:
+                async with self._condition:
+                    self._size -= 1
+                raise
+            self._idle.append(entry)
+
+        if self.reuse and self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintain())
+
+    async def close(self) -> None:
+        self._closed = True
+
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            await asyncio.gather(self._maintenance_task, return_exceptions=True)
+            self._maintenance_task = None
+
+        async with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+
+        for entry in idle:
+            await self._close(entry)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        entry = await self._acquire()
+        try:
+            yield entry.connection
+        finally:
+            await self._release(entry)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            min_size=self.min_size,
+            max_size=self.max_size,
+            size=self._size,
+            idle=len(self._idle),
+            in_use=self._num_in_use,
+            waiting=self._num_waiting,
+            created=self._num_created,
+            closed=self._num_closed,
+            acquired=self._num_acquired,
+            failed_health_checks=self._num_failed_health_checks,
+        )
+
+    async def _acquire(self) -> _PooledConnection:
+        while True:
+            async with self._condition:
+                self._num_waiting += 1
+                try:
+                    while len(self._idle) == 0 and self._size >= self.max_size:
+                        await self._condition.wait()
+                finally:
+                    self._num_waiting -= 1
+
+                if len(self._idle) > 0:
+                    # use the most recently used connection (it is most likely still healthy)
+                    entry: Optional[_PooledConnection] = self._idle.pop()
+                else:
+                    # reserve a slot for a new connection
+                    entry = None
+                    self._size += 1
+
+            # Free the slot if connecting or the health check fails or is cancelled (otherwise
+            # the slot would be lost). The discard itself must not be interrupted.
+            if entry is None:
+                try:
+                    entry = await self._create()
+                except BaseException:
+                    await asyncio.shield(self._discard(None))
+                    raise
+            else:
+                try:
+                    is_healthy = await self._is_healthy(entry)
+                except BaseException:
+                    await asyncio.shield(self._discard(entry))
+                    raise
+                if not is_healthy:
+                    await self._discard(entry)
+                    continue
+
+            self._num_in_use += 1
+            self._num_acquired += 1
+            return entry
+
+    async def _release(self, entry: _PooledConnection) -> None:
+        self._num_in_use -= 1
+
+        if self._closed or not self.reuse or not entry.connection.is_open():
+            await self._discard(entry)
+            return
+
+        entry.last_used_at = time.monotonic()
+        async with self._condition:
+            self._idle.append(entry)
+            self._condition.notify()
+
+    async def _create(self) -> _PooledConnection:
+        connection = await self.connect()
+        self._num_created += 1
+        return _PooledConnection(connection)
+
+    async def _close(self, entry: _PooledConnection) -> None:
+        self._num_closed += 1
+        try:
+            await entry.connection.close()
+        except Exception as e:
+            logger.warning("Failed to close database connection", exc_info=e)
+
+    async def _discard(self, entry: Optional[_PooledConnection]) -> None:
+        # free the slot of a connection (entry is None if the connection could not be created)
+        async with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+        if entry is not None:
+            await self._close(entry)
+
+    async def _is_healthy(self, entry: _PooledConnection) -> bool:
+        if not entry.connection.is_open():
+            return False
+
+        idle_seconds = time.monotonic() - entry.last_used_at
+        if self.health_check is None or idle_seconds < self.health_check_interval_seconds:
+            return True
+
+        try:
+            await self.health_check(entry.connection)
+            return True
+        except Exception as e:
+            self._num_failed_health_checks += 1
+            logger.warning("Database connection failed health check", exc_info=e)
+            return False
+
+    async def _maintain(self) -> None:
+        # periodically close connections that were idle for too long
+        while True:
+            await asyncio.sleep(min(self.max_idle_seconds, self.health_check_interval_seconds))
+
+            now = time.monotonic()
+            async with self._condition:
+                # self._idle is ordered by last usage (oldest first)
+                num_evictable = max(0, self._size - self.min_size)
+                evicted = [
+                    entry
+                    for entry in self._idle[:num_evictable]
+                    if now - entry.last_used_at > self.max_idle_seconds
+                    or not entry.connection.is_open()
+                ]
+                self._idle = [entry for entry in self._idle if entry not in evicted]
+                self._size -= len(evicted)
+                self._condition.notify(len(evicted))
+
+            for entry in evicted:
+                await self._close(entry)
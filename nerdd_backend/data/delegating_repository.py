@@ -0,0 +1,227 @@
+from contextlib import aclosing
+from datetime import datetime
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
+
+from ..models import (
+    AnonymousUser,
+    Challenge,
+    JobInternal,
+    JobStatus,
+    JobUpdate,
+    JobWithResults,
+    ModuleInternal,
+    Result,
+    ResultCheckpoint,
+    Source,
+    UpsertSummary,
+    User,
+)
+from .repository import Repository
+
+__all__ = ["DelegatingRepository"]
+
+
+class DelegatingRepository(Repository):
+    """
+    Base class for repositories that wrap another repository (e.g. to add caching).
+
+    All calls are forwarded to the inner repository via _call (for coroutines) and _stream (for
+    async iterables). Subclasses can override these two methods to add behavior to all operations
+    or override individual methods.
+    """
+
+    def __init__(self, inner: Repository) -> None:
+        self.inner = inner
+
+    async def _call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        return await getattr(self.inner, name)(*args, **kwargs)
+
+    async def _stream(self, name: str, *args: Any, **kwargs: Any) -> AsyncIterable[Any]:
+        # closing this stream (e.g. after a break) also closes the stream of the inner repository
+        async with aclosing(getattr(self.inner, name)(*args, **kwargs)) as items:
+            async for item in items:
+                yield item
+
+    #
+    # INITIALIZATION
+    #
+    async def initialize(self):
+        await self.inner.initialize()
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.inner.get_stats()
+
+    #
+    # MODULES
+    #
+    def get_module_changes(
+        self,
+    ) -> AsyncIterable[Tuple[Optional[ModuleInternal], Optional[ModuleInternal]]]:
+        return self._stream("get_module_changes")
+
+    async def get_all_modules(self) -> List[ModuleInternal]:
+        return await self._call("get_all_modules")
+
+    async def get_module_by_id(self, module_id: str) -> ModuleInternal:
+        return await self._call("get_module_by_id", module_id)
+
+    async def create_module(self, module: ModuleInternal) -> ModuleInternal:
+        return await self._call("create_module", module)
+
+    async def update_module(self, module: ModuleInternal) -> ModuleInternal:
+        return await self._call("update_module", module)
+
+    #
+    # JOBS
+    #
+    def get_job_with_result_changes(
+        self, job_id: str
+    ) -> AsyncIterable[Tuple[Optional[JobWithResults], Optional[JobWithResults]]]:
+        return self._stream("get_job_with_result_changes", job_id)
+
+    def get_job_changes(
+        self, job_id: str
+    ) -> AsyncIterable[Tuple[Optional[JobInternal], Optional[JobInternal]]]:
+        return self._stream("get_job_changes", job_id)
+
+    async def create_job(self, job: JobInternal) -> JobWithResults:
+        return await self._call("create_job", job)
+
+    async def update_job(self, job_update: JobUpdate) -> JobInternal:
+        return await self._call("update_job", job_update)
+
+    async def get_job_by_id(self, job_id: str) -> JobWithResults:
+        return await self._call("get_job_by_id", job_id)
+
+    async def get_job_internal(self, job_id: str) -> JobInternal:
+        return await self._call("get_job_internal", job_id)
+
+    async def get_jobs_by_ids(
+        self, job_ids: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        return await self._call("get_jobs_by_ids", job_ids, fields)
+
+    async def delete_job_by_id(self, job_id: str) -> None:
+        return await self._call("delete_job_by_id", job_id)
+
+    async def delete_jobs_by_ids(self, job_ids: List[str]) -> None:
+        return await self._call("delete_jobs_by_ids", job_ids)
+
+    def get_jobs_by_status(
+        self,
+        module_id: str,
+        status: List[JobStatus] | JobStatus,
+        deadline: Optional[datetime] = None,
+    ) -> AsyncIterable[JobWithResults]:
+        return self._stream("get_jobs_by_status", module_id, status, deadline)
+
+    def get_expired_jobs(self, deadline: datetime) -> AsyncIterable[JobInternal]:
+        return self._stream("get_expired_jobs", deadline)
+
+    #
+    # SOURCES
+    #
+    async def create_source(self, source: Source) -> Source:
+        return await self._call("create_source", source)
+
+    async def get_source_by_id(self, source_id: str) -> Source:
+        return await self._call("get_source_by_id", source_id)
+
+    async def get_sources_by_ids(self, source_ids: List[str]) -> List[Source]:
+        return await self._call("get_sources_by_ids", source_ids)
+
+    async def delete_source_by_id(self, source_id: str) -> None:
+        return await self._call("delete_source_by_id", source_id)
+
+    async def delete_sources_by_ids(self, source_ids: List[str]) -> None:
+        return await self._call("delete_sources_by_ids", source_ids)
+
+    def get_expired_sources(self, deadline: datetime) -> AsyncIterable[Source]:
+        return self._stream("get_expired_sources", deadline)
+
+    #
+    # RESULTS
+    #
+    async def get_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+    ) -> List[Result]:
+        return await self._call("get_results_by_job_id", job_id, start_mol_id, end_mol_id)
+
+    def iter_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterable[List[Result]]:
+        return self._stream("iter_results_by_job_id", job_id, start_mol_id, end_mol_id, batch_size)
+
+    async def upsert_results(self, results: List[Result]) -> UpsertSummary:
+        return await self._call("upsert_results", results)
+
+    def get_result_changes(
+        self,
+        job_id,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+    ) -> AsyncIterable[Tuple[Optional[Result], Optional[Result]]]:
+        return self._stream("get_result_changes", job_id, start_mol_id, end_mol_id)
+
+    async def delete_results_by_job_id(self, job_id: str) -> None:
+        return await self._call("delete_results_by_job_id", job_id)
+
+    #
+    # CHECKPOINTS
+    #
+    async def create_result_checkpoint(self, checkpoint: ResultCheckpoint) -> ResultCheckpoint:
+        return await self._call("create_result_checkpoint", checkpoint)
+
+    async def update_result_checkpoint(self, checkpoint: ResultCheckpoint) -> ResultCheckpoint:
+        return await self._call("update_result_checkpoint", checkpoint)
+
+    async def update_result_checkpoints(
+        self, checkpoints: List[ResultCheckpoint]
+    ) -> List[ResultCheckpoint]:
+        return await self._call("update_result_checkpoints", checkpoints)
+
+    async def get_result_checkpoints_by_job_id(self, job_id: str) -> List[ResultCheckpoint]:
+        return await self._call("get_result_checkpoints_by_job_id", job_id)
+
+    async def get_result_checkpoints_by_module_id(self, module_id: str) -> List[ResultCheckpoint]:
+        return await self._call("get_result_checkpoints_by_module_id", module_id)
+
+    async def delete_result_checkpoints_by_job_id(self, job_id: str) -> None:
+        return await self._call("delete_result_checkpoints_by_job_id", job_id)
+
+    #
+    # USERS
+    #
+    async def get_user_by_ip_address(self, ip_address: str) -> AnonymousUser:
+        return await self._call("get_user_by_ip_address", ip_address)
+
+    async def create_user(self, user: User) -> User:
+        return await self._call("create_user", user)
+
+    async def get_recent_jobs_by_user(self, user: User, num_seconds: int) -> List[JobInternal]:
+        return await self._call("get_recent_jobs_by_user", user, num_seconds)
+
+    #
+    # CHALLENGES (CAPTCHAS)
+    #
+    async def get_challenge_by_salt(self, salt: str) -> Challenge:
+        return await self._call("get_challenge_by_salt", salt)
+
+    async def create_challenge(self, challenge: Challenge) -> Challenge:
+        return await self._call("create_challenge", challenge)
+
+    async def delete_challenge_by_id(self, id: str) -> None:
+        return await self._call("delete_challenge_by_id", id)
+
+    async def delete_expired_challenges(self, deadline: datetime) -> None:
+        return await self._call("delete_expired_challenges", deadline)
@@ -1,4 +1,9 @@
-__all__ = ["RecordNotFoundError", "RecordAlreadyExistsError"]
+__all__ = [
+    "RecordNotFoundError",
+    "RecordAlreadyExistsError",
+    "DatabaseUnavailableError",
+    "ChangeFeedOverflowError",
+]
 
 
 class RecordNotFoundError(Exception):
@@ -13,3 +18,15 @@ class RecordAlreadyExistsError(Exception):
 
     def __init__(self, ModelClass, record_id):
         super().__init__(f"{ModelClass.__name__} with id {record_id} already exists")
+
+
+class DatabaseUnavailableError(Exception):
+    """Exception raised when the database does not respond in time (or is assumed to be down)."""
+
+    def __init__(self, message: str, retry_after_seconds: float = 0):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class ChangeFeedOverflowError(Exception):
+    """Exception raised when a changefeed subscriber does not keep up and misses changes."""
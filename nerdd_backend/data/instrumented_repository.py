@@ -0,0 +1,135 @@
+import logging
+import reprlib
+import time
+from bisect import bisect_left
+from typing import Any, AsyncIterable, Dict, List
+
+from .delegating_repository import DelegatingRepository
+from .repository import Repository
+
+__all__ = ["InstrumentedRepository"]
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the latency buckets in seconds (the last bucket is unbounded)
+LATENCY_BUCKETS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10]
+
+# arguments are shortened in the slow query log (e.g. lists of thousands of results)
+_arguments_repr = reprlib.Repr()
+_arguments_repr.maxlist = 3
+_arguments_repr.maxstring = 100
+_arguments_repr.maxother = 200
+
+
+def _count_rows(value: Any) -> int:
+    if value is None or isinstance(value, bool):
+        return 0
+    if isinstance(value, list):
+        return len(value)
+    return 1
+
+
+class _MethodStats:
+    def __init__(self) -> None:
+        self.num_calls = 0
+        self.num_errors = 0
+        self.num_rows = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record_latency(self, seconds: float) -> None:
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            num_calls=self.num_calls,
+            num_errors=self.num_errors,
+            num_rows=self.num_rows,
+            total_seconds=self.total_seconds,
+            max_seconds=self.max_seconds,
+            latency_histogram={
+                str(bound): count
+                for bound, count in zip([*LATENCY_BUCKETS, "inf"], self.buckets, strict=True)
+            },
+        )
+
+
+class InstrumentedRepository(DelegatingRepository):
+    """
+    Records call counts, latency histograms, returned rows and errors per repository method.
+
+    Calls taking longer than slow_query_threshold_seconds are logged together with their
+    arguments. For async iterables, only the time spent waiting for the inner repository is
+    measured and the latency is recorded when the iterable is exhausted (changefeeds that are
+    closed by the consumer are counted, but do not contribute to the latency histogram).
+    """
+
+    def __init__(self, inner: Repository, slow_query_threshold_seconds: float = 0.5) -> None:
+        super().__init__(inner)
+        self.slow_query_threshold_seconds = slow_query_threshold_seconds
+        self._stats: Dict[str, _MethodStats] = {}
+
+    def _get_method_stats(self, name: str) -> _MethodStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _MethodStats()
+        return stats
+
+    def _check_slow_query(self, name: str, seconds: float, args: Any, kwargs: Any) -> None:
+        if seconds >= self.slow_query_threshold_seconds:
+            arguments = ", ".join(
+                [_arguments_repr.repr(arg) for arg in args]
+                + [f"{key}={_arguments_repr.repr(value)}" for key, value in kwargs.items()]
+            )
+            logger.warning(f"Slow query: {name}({arguments}) took {seconds * 1000:.1f} ms")
+
+    async def _call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        stats = self._get_method_stats(name)
+        stats.num_calls += 1
+        start = time.perf_counter()
+        try:
+            result = await super()._call(name, *args, **kwargs)
+        except Exception:
+            stats.num_errors += 1
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            stats.record_latency(seconds)
+            self._check_slow_query(name, seconds, args, kwargs)
+
+        stats.num_rows += _count_rows(result)
+        return result
+
+    async def _stream(self, name: str, *args: Any, **kwargs: Any) -> AsyncIterable[Any]:
+        stats = self._get_method_stats(name)
+        stats.num_calls += 1
+        iterator = super()._stream(name, *args, **kwargs).__aiter__()
+        seconds = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                stats.num_rows += _count_rows(item)
+                yield item
+        except Exception:
+            stats.num_errors += 1
+            raise
+        finally:
+            await iterator.aclose()
+
+        stats.record_latency(seconds)
+        self._check_slow_query(name, seconds, args, kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            **super().get_stats(),
+            methods={name: stats.get_stats() for name, stats in sorted(self._stats.items())},
+        )
@@ -0,0 +1,159 @@
+import time
+from typing import Any, Dict, Iterable, Tuple
+
+from ..models import JobInternal, JobWithResults
+from ..util import LruCache
+from .exceptions import RecordNotFoundError
+from .repository import Repository
+
+__all__ = ["JobStateStore"]
+
+
+class _PendingLoad:
+    def __init__(self) -> None:
+        self.num_loads = 0
+        # incremented on every modification of the job while it is loaded from the repository
+        self.version = 0
+
+
+class JobStateStore:
+    """
+    Keeps the state of recently requested jobs (including their progress) in memory.
+
+    The store is fed by the actions consuming job events (job size, checkpoints, results,
+    serialization results) and by job changefeeds, so that status reads of active jobs are answered
+    without querying the database. Jobs that are not in the store are read from the repository.
+
+    Events of a job might be consumed by other processes (e.g. if the topics are partitioned among
+    several backend instances). For that reason, local events only modify the stored state, but
+    they do not extend its lifetime: a job is read from the repository again if its last full
+    state is older than max_staleness_seconds.
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        max_size: int = 10_000,
+        max_staleness_seconds: float = 5,
+    ) -> None:
+        self.repository = repository
+        self.max_staleness_seconds = max_staleness_seconds
+
+        # job id -> (time of the last full state, job)
+        self._jobs = LruCache[Tuple[float, JobWithResults]](max_size)
+        self._pending_loads: Dict[str, _PendingLoad] = {}
+
+        # statistics
+        self._num_hits = 0
+        self._num_loads = 0
+        self._num_stale = 0
+        self._num_updates = 0
+
+    async def get_job(self, job_id: str) -> JobWithResults:
+        entry = self._jobs.get(job_id)
+        if entry is not None:
+            refreshed_at, job = entry
+            if time.monotonic() - refreshed_at <= self.max_staleness_seconds:
+                self._num_hits += 1
+                return job
+            self._num_stale += 1
+
+        return await self._load(job_id)
+
+    async def _load(self, job_id: str) -> JobWithResults:
+        self._num_loads += 1
+
+        pending = self._pending_loads.get(job_id)
+        if pending is None:
+            pending = self._pending_loads[job_id] = _PendingLoad()
+        pending.num_loads += 1
+        version = pending.version
+
+        try:
+            job = await self.repository.get_job_by_id(job_id)
+        except RecordNotFoundError:
+            self._jobs.invalidate(job_id)
+            raise
+        finally:
+            pending.num_loads -= 1
+            if pending.num_loads == 0:
+                del self._pending_loads[job_id]
+
+        # do not store the job if it was modified while it was read (the modification might not be
+        # part of the returned state)
+        if pending.version == version:
+            self.put(job)
+
+        return job
+
+    def _touch(self, job_id: str) -> None:
+        self._num_updates += 1
+        pending = self._pending_loads.get(job_id)
+        if pending is not None:
+            pending.version += 1
+
+    #
+    # FEEDING
+    #
+    def put(self, job: JobWithResults) -> None:
+        """Stores the full state of a job, e.g. read from the repository or a changefeed."""
+        self._touch(job.id)
+
+        entry = self._jobs.peek(job.id)
+        if entry is not None:
+            # progress only grows -> keep results that were reported locally in the meantime
+            _, existing = entry
+            job = job.model_copy(
+                update=dict(
+                    entries_processed=job.entries_processed.union(existing.entries_processed)
+                )
+            )
+        self._jobs.put(job.id, (time.monotonic(), job))
+
+    def apply_update(self, job: JobInternal) -> None:
+        """Applies a modified job record (e.g. returned by Repository.update_job)."""
+        self._touch(job.id)
+
+        entry = self._jobs.peek(job.id)
+        if entry is None:
+            return
+
+        refreshed_at, existing = entry
+        updated_job = JobWithResults(
+            **job.model_dump(include=set(JobInternal.model_fields)),
+            entries_processed=existing.entries_processed,
+        )
+        self._jobs.put(job.id, (refreshed_at, updated_job))
+
+    def add_progress(self, job_id: str, mol_ids: Iterable[int]) -> None:
+        """Marks the given molecules of a job as processed."""
+        self._touch(job_id)
+
+        entry = self._jobs.peek(job_id)
+        if entry is None:
+            return
+
+        # the progress of done jobs is not modified anymore (same as in the repositories)
+        refreshed_at, existing = entry
+        if existing.is_done():
+            return
+
+        updated_job = existing.model_copy(
+            update=dict(entries_processed=existing.entries_processed.union(list(mol_ids)))
+        )
+        self._jobs.put(job_id, (refreshed_at, updated_job))
+
+    def invalidate(self, job_id: str) -> None:
+        self._touch(job_id)
+        self._jobs.invalidate(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            size=len(self._jobs),
+            max_size=self._jobs.max_size,
+            hits=self._num_hits,
+            loads=self._num_loads,
+            stale=self._num_stale,
+            updates=self._num_updates,
+            evictions=self._jobs.get_stats()["evictions"],
+        )
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from .memory_table import MemoryTable
+
+__all__ = ["MemoryLog"]
+
+logger = logging.getLogger(__name__)
+
+# (table name, primary key, new record or None if the record was deleted)
+_Entry = Tuple[str, Any, Optional[BaseModel]]
+
+
+class MemoryLog:
+    """
+    Persists the modifications of MemoryTables to an append-only log in a directory.
+
+    * Modifications are buffered in memory and written (and fsynced) by a background task every
+      flush_interval_seconds (group commit). A crash loses at most the modifications of the last
+      interval.
+    * After snapshot_interval entries, a compacted snapshot of all tables is written and the log
+      segments covered by the snapshot are deleted.
+    * On startup, the snapshot and the remaining log segments are replayed. On close, a final
+      snapshot is written.
+
+    Files: snapshot.json and log.<segment>.jsonl (one json object per modification).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval_seconds: float = 0.1,
+        snapshot_interval: int = 100_000,
+    ) -> None:
+        self.path = path
+        self.flush_interval_seconds = flush_interval_seconds
+        self.snapshot_interval = snapshot_interval
+
+        self._tables: Dict[str, Tuple[MemoryTable, Type[BaseModel]]] = {}
+        self._buffer: List[_Entry] = []
+        self._segment = 0
+        self._num_entries_since_snapshot = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def add_table(self, name: str, table: MemoryTable, model: Type[BaseModel]) -> None:
+        self._tables[name] = (table, model)
+
+    async def open(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+
+        # the files are parsed in another thread, but the tables (and their indexes and observers)
+        # are only modified in the event loop
+        segment, snapshot_records, entries = await asyncio.to_thread(self._read)
+        self._apply(snapshot_records, entries)
+        self._segment = segment
+        logger.info(f"Restored {len(snapshot_records) + len(entries)} entries from {self.path}")
+
+        # start a new segment (the last segment might end with a partially written entry)
+        self._segment += 1
+
+        for name, (table, _) in self._tables.items():
+            table.observe(lambda change, name=name, table=table: self._append(name, table, change))
+
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+
+        # write a snapshot, so that the next startup does not need to replay the log
+        await self.flush(snapshot=True)
+
+    def _append(self, name: str, table: MemoryTable, change: Tuple[Any, Any]) -> None:
+        old, new = change
+        record = new if new is not None else old
+        self._buffer.append((name, table.primary_key(record), new))
+
+    #
+    # WRITE
+    #
+    async def flush(self, snapshot: bool = False) -> None:
+        async with self._flush_lock:
+            # Swap the buffer and capture the state of all tables without yielding to the event
+            # loop, i.e. the snapshot contains exactly the modifications up to this point.
+            entries, self._buffer = self._buffer, []
+            self._num_entries_since_snapshot += len(entries)
+
+            state = None
+            segment = self._segment
+            if snapshot or self._num_entries_since_snapshot >= self.snapshot_interval:
+                state = {name: list(table) for name, (table, _) in self._tables.items()}
+                self._segment += 1
+                self._num_entries_since_snapshot = 0
+
+            # Records are not modified after they were stored in a table (they are replaced), so
+            # they can be serialized in another thread.
+            await asyncio.to_thread(self._write, entries, segment, state)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                # a running flush must not be interrupted (e.g. by close)
+                await asyncio.shield(self.flush())
+            except Exception as e:
+                logger.error(f"Failed to write to {self.path}", exc_info=e)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"log.{segment:06d}.jsonl")
+
+    def _list_segments(self) -> List[int]:
+        return sorted(
+            int(filename.split(".")[1])
+            for filename in os.listdir(self.path)
+            if filename.startswith("log.") and filename.endswith(".jsonl")
+        )
+
+    def _write(
+        self,
+        entries: List[_Entry],
+        segment: int,
+        state: Optional[Dict[str, List[BaseModel]]],
+    ) -> None:
+        if len(entries) > 0:
+            lines = [
+                json.dumps(
+                    {
+                        "table": name,
+                        "id": id,
+                        "data": record.model_dump(mode="json") if record is not None else None,
+                    }
+                )
+                + "\n"
+                for name, id, record in entries
+            ]
+            with open(self._segment_path(segment), "a") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+        if state is not None:
+            # the snapshot covers all segments up to (and including) segment
+            snapshot = {
+                "segment": segment + 1,
+                "tables": {
+                    name: [record.model_dump(mode="json") for record in records]
+                    for name, records in state.items()
+                },
+            }
+            snapshot_path = os.path.join(self.path, "snapshot.json")
+            with open(f"{snapshot_path}.tmp", "w") as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{snapshot_path}.tmp", snapshot_path)
+
+            for old_segment in self._list_segments():
+                if old_segment <= segment:
+                    os.remove(self._segment_path(old_segment))
+
+    #
+    # READ
+    #
+    def _read(self) -> Tuple[int, List[Tuple[str, BaseModel]], List[_Entry]]:
+        # returns the last segment, the records of the snapshot and the log entries after the
+        # snapshot (the tables are not modified)
+        snapshot_records: List[Tuple[str, BaseModel]] = []
+        entries: List[_Entry] = []
+
+        snapshot_path = os.path.join(self.path, "snapshot.json")
+        first_segment = 0
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                snapshot = json.load(f)
+            first_segment = snapshot["segment"]
+            for name, records in snapshot["tables"].items():
+                _, model = self._tables[name]
+                snapshot_records.extend((name, model(**record)) for record in records)
+
+        last_segment = first_segment
+        for segment in self._list_segments():
+            last_segment = max(last_segment, segment)
+            if segment < first_segment:
+                continue
+
+            with open(self._segment_path(segment)) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the process might have crashed while writing the last entry
+                        logger.warning(f"Skipping corrupt entry in log segment {segment}")
+                        continue
+
+                    name = entry["table"]
+                    _, model = self._tables[name]
+                    record = model(**entry["data"]) if entry["data"] is not None else None
+                    entries.append((name, entry["id"], record))
+
+        return last_segment, snapshot_records, entries
+
+    def _apply(self, snapshot_records: List[Tuple[str, BaseModel]], entries: List[_Entry]) -> None:
+        for name, record in snapshot_records:
+            table, _ = self._tables[name]
+            table.insert(record)
+
+        for name, id, record in entries:
+            table, _ = self._tables[name]
+            if record is None:
+                if table.get(id) is not None:
+                    table.delete(id)
+            elif table.get(id) is not None:
+                table.replace(record)
+            else:
+                table.insert(record)
@@ -1,9 +1,7 @@
 import time
 from asyncio import Lock
 from datetime import datetime
-from typing import AsyncIterable, List, Optional, Tuple
-
-from nerdd_link.utils import ObservableList
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
 
 from ..models import (
     AnonymousUser,
@@ -17,34 +15,111 @@ from ..models import (
     Result,
     ResultCheckpoint,
     Source,
+    UpsertSummary,
     User,
 )
 from ..util import CompressedSet
 from .exceptions import RecordAlreadyExistsError, RecordNotFoundError
+from .memory_log import MemoryLog
+from .memory_table import MemoryTable
 from .repository import Repository
 
 __all__ = ["MemoryRepository"]
 
 
 class MemoryRepository(Repository):
-    def __init__(self) -> None:
-        pass
+    def __init__(
+        self,
+        changefeed_queue_size: int = 100_000,
+        persistence_path: Optional[str] = None,
+        persistence_flush_interval_seconds: float = 0.1,
+        persistence_snapshot_interval: int = 100_000,
+    ) -> None:
+        # maximum number of pending changes per change subscription
+        self.changefeed_queue_size = changefeed_queue_size
+
+        # optionally, all modifications are persisted in a log (see MemoryLog)
+        self.persistence_path = persistence_path
+        self.persistence_flush_interval_seconds = persistence_flush_interval_seconds
+        self.persistence_snapshot_interval = persistence_snapshot_interval
+        self._log: Optional[MemoryLog] = None
 
     #
     # INITIALIZATION
     #
     async def initialize(self) -> None:
         self.transaction_lock = Lock()
-        self.jobs = ObservableList[JobInternal]()
-        self.modules = ObservableList[ModuleInternal]()
-        self.sources = ObservableList[Source]()
-        self.results = ObservableList[Result]()
-        self.checkpoints = ObservableList[ResultCheckpoint]()
-        self.users = ObservableList[User]()
-        self.challenges = ObservableList[Challenge]()
+
+        self.modules = MemoryTable[ModuleInternal](queue_size=self.changefeed_queue_size)
+
+        # jobs are stored including their progress (entries_processed), which is maintained by
+        # upsert_results
+        self.jobs = MemoryTable[JobWithResults](queue_size=self.changefeed_queue_size)
+        self.jobs.add_index("user_id", lambda job: job.user_id)
+        self.jobs.add_ordered_index(
+            "status_job_type_created_at",
+            group=lambda job: (job.status, job.job_type),
+            order=lambda job: job.created_at,
+        )
+        self.jobs.add_ordered_index(
+            "created_at", group=lambda job: None, order=lambda job: job.created_at
+        )
+
+        self.sources = MemoryTable[Source](queue_size=self.changefeed_queue_size)
+        self.sources.add_ordered_index(
+            "created_at", group=lambda source: None, order=lambda source: source.created_at
+        )
+
+        self.results = MemoryTable[Result](queue_size=self.changefeed_queue_size)
+        self.results.add_ordered_index(
+            "job_id_mol_id",
+            group=lambda result: result.job_id,
+            order=lambda result: result.mol_id,
+        )
+
+        self.checkpoints = MemoryTable[ResultCheckpoint](queue_size=self.changefeed_queue_size)
+        self.checkpoints.add_index("job_id", lambda checkpoint: checkpoint.job_id)
+        self.checkpoints.add_index("job_type", lambda checkpoint: checkpoint.job_type)
+
+        self.users = MemoryTable[User](queue_size=self.changefeed_queue_size)
+        self.users.add_index("ip_address", lambda user: user.ip_address)
+
+        self.challenges = MemoryTable[Challenge](queue_size=self.changefeed_queue_size)
+        self.challenges.add_index("salt", lambda challenge: challenge.salt)
+
+        if self.persistence_path is not None:
+            self._log = MemoryLog(
+                self.persistence_path,
+                flush_interval_seconds=self.persistence_flush_interval_seconds,
+                snapshot_interval=self.persistence_snapshot_interval,
+            )
+            self._log.add_table("modules", self.modules, ModuleInternal)
+            self._log.add_table("jobs", self.jobs, JobWithResults)
+            self._log.add_table("sources", self.sources, Source)
+            self._log.add_table("results", self.results, Result)
+            self._log.add_table("checkpoints", self.checkpoints, ResultCheckpoint)
+            self._log.add_table("users", self.users, AnonymousUser)
+            self._log.add_table("challenges", self.challenges, Challenge)
+            await self._log.open()
 
     async def close(self) -> None:
-        pass
+        if self._log is not None:
+            await self._log.close()
+            self._log = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            name: table.get_stats()
+            for name, table in [
+                ("modules", self.modules),
+                ("jobs", self.jobs),
+                ("sources", self.sources),
+                ("results", self.results),
+                ("checkpoints", self.checkpoints),
+                ("users", self.users),
+                ("challenges", self.challenges),
+            ]
+        }
 
     #
     # MODULES
@@ -52,33 +127,32 @@ class MemoryRepository(Repository):
     async def get_module_changes(
         self,
     ) -> AsyncIterable[Tuple[Optional[ModuleInternal], Optional[ModuleInternal]]]:
-        async for change in self.modules.changes():
+        async for change in self.modules.changes(include_initial=True):
             yield change
 
     async def get_all_modules(self) -> List[ModuleInternal]:
-        return self.modules.get_items()
+        return list(self.modules)
 
     async def create_module(self, module: ModuleInternal) -> ModuleInternal:
         assert module.id is not None
         async with self.transaction_lock:
-            try:
-                await self.get_module_by_id(module.id)
+            if self.modules.get(module.id) is not None:
                 raise RecordAlreadyExistsError(ModuleInternal, module.id)
-            except RecordNotFoundError:
-                self.modules.append(module)
-                return module
+
+            self.modules.insert(module)
+            return module
 
     async def update_module(self, module: ModuleInternal) -> ModuleInternal:
         async with self.transaction_lock:
-            existing_module = await self.get_module_by_id(module.id)
-            self.modules.update(existing_module, module)
-            return await self.get_module_by_id(module.id)
+            await self.get_module_by_id(module.id)
+            self.modules.replace(module)
+            return module
 
     async def get_module_by_id(self, id: str) -> ModuleInternal:
-        try:
-            return next((module for module in self.modules.get_items() if module.id == id))
-        except StopIteration as e:
-            raise RecordNotFoundError(ModuleInternal, id) from e
+        module = self.modules.get(id)
+        if module is None:
+            raise RecordNotFoundError(ModuleInternal, id)
+        return module
 
     #
     # JOBS
@@ -86,33 +160,30 @@ class MemoryRepository(Repository):
     async def get_job_changes(
         self, job_id: str
     ) -> AsyncIterable[Tuple[Optional[JobInternal], Optional[JobInternal]]]:
-        async for old, new in self.jobs.changes():
-            if (old is not None and old.id == job_id) or (new is not None and new.id == job_id):
-                yield (old, new)
+        async for change in self.jobs.changes(key=job_id):
+            yield change
 
     async def create_job(self, job: JobInternal) -> JobWithResults:
         async with self.transaction_lock:
-            try:
-                await self.get_job_by_id(job.id)
+            if self.jobs.get(job.id) is not None:
                 raise RecordAlreadyExistsError(JobInternal, job.id)
-            except RecordNotFoundError:
-                self.jobs.append(job)
-                return JobWithResults(
-                    **job.model_dump(),
-                    entries_processed=CompressedSet(),
-                )
+
+            new_job = JobWithResults(
+                **job.model_dump(),
+                entries_processed=CompressedSet(),
+            )
+            self.jobs.insert(new_job)
+            return new_job
 
     async def update_job(self, job_update: JobUpdate) -> JobInternal:
         async with self.transaction_lock:
             # find job instance
-            existing_job = next(
-                (job for job in self.jobs.get_items() if job.id == job_update.id), None
-            )
+            existing_job = self.jobs.get(job_update.id)
             if existing_job is None:
                 raise RecordNotFoundError(JobInternal, job_update.id)
 
             # create a modified job instance based on the existing one
-            modified_job = JobInternal(**existing_job.model_dump())
+            modified_job = JobWithResults(**existing_job.model_dump())
             if job_update.status is not None:
                 modified_job.status = job_update.status
             if job_update.num_entries_total is not None:
@@ -122,30 +193,39 @@ class MemoryRepository(Repository):
             if job_update.new_output_formats is not None:
                 modified_job.output_formats.extend(job_update.new_output_formats)
 
-            # update the job in the observable list
-            self.jobs.update(existing_job, modified_job)
-            return await self.get_job_by_id(job_update.id)
+            self.jobs.replace(modified_job)
+            return modified_job
 
     async def get_job_by_id(self, id: str) -> JobWithResults:
-        # fetch all corresponding results
-        results = await self.get_results_by_job_id(id)
-        entries_processed = CompressedSet([result.mol_id for result in results]).to_intervals()
-
-        try:
-            return next(
-                (
-                    JobWithResults(**job.model_dump(), entries_processed=entries_processed)
-                    for job in self.jobs.get_items()
-                    if job.id == id
-                )
-            )
-        except StopIteration as e:
-            raise RecordNotFoundError(Job, id) from e
+        job = self.jobs.get(id)
+        if job is None:
+            raise RecordNotFoundError(Job, id)
+        return job
+
+    async def get_job_internal(self, id: str) -> JobInternal:
+        job = await self.get_job_by_id(id)
+        return JobInternal(**job.model_dump(exclude={"entries_processed", "num_entries_processed"}))
+
+    async def get_jobs_by_ids(
+        self, ids: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        include = set(fields) if fields is not None else set(JobInternal.model_fields)
+        return [
+            job.model_dump(include=include)
+            for job in (self.jobs.get(id) for id in ids)
+            if job is not None
+        ]
 
     async def delete_job_by_id(self, id: str) -> None:
         async with self.transaction_lock:
-            job = await self.get_job_by_id(id)
-            self.jobs.remove(job)
+            await self.get_job_by_id(id)
+            self.jobs.delete(id)
+
+    async def delete_jobs_by_ids(self, ids: List[str]) -> None:
+        async with self.transaction_lock:
+            for id in ids:
+                if self.jobs.get(id) is not None:
+                    self.jobs.delete(id)
 
     async def get_jobs_by_status(
         self,
@@ -155,46 +235,62 @@ class MemoryRepository(Repository):
     ) -> AsyncIterable[JobWithResults]:
         if isinstance(status, str):
             status = [status]
-        for job in self.jobs.get_items():
-            if (
-                job.status in status
-                and job.job_type == module_id
-                and (deadline is None or job.created_at <= deadline)
-            ):
-                yield self.get_job_by_id(job.id)
+
+        jobs = [
+            job
+            for s in status
+            for job in self.jobs.between(
+                (s, module_id), upper=deadline, index="status_job_type_created_at"
+            )
+        ]
+
+        # merge the jobs of all statuses by created_at
+        if len(status) > 1:
+            jobs.sort(key=lambda job: job.created_at)
+
+        for job in jobs:
+            yield job
 
     async def get_expired_jobs(self, deadline: datetime) -> AsyncIterable[JobInternal]:
-        for job in self.jobs.get_items():
-            if job.created_at < deadline:
-                yield job
+        for job in self.jobs.between(None, upper=deadline, index="created_at", right_closed=False):
+            yield job
 
     #
     # SOURCES
     #
     async def create_source(self, source: Source) -> Source:
         async with self.transaction_lock:
-            try:
-                await self.get_source_by_id(source.id)
+            if self.sources.get(source.id) is not None:
                 raise RecordAlreadyExistsError(Source, source.id)
-            except RecordNotFoundError:
-                self.sources.append(source)
-                return source
+
+            self.sources.insert(source)
+            return source
 
     async def get_source_by_id(self, id: str) -> Source:
-        try:
-            return next((source for source in self.sources.get_items() if source.id == id))
-        except StopIteration as e:
-            raise RecordNotFoundError(Source, id) from e
+        source = self.sources.get(id)
+        if source is None:
+            raise RecordNotFoundError(Source, id)
+        return source
+
+    async def get_sources_by_ids(self, ids: List[str]) -> List[Source]:
+        return [source for source in (self.sources.get(id) for id in ids) if source is not None]
 
     async def delete_source_by_id(self, id: str) -> None:
         async with self.transaction_lock:
-            source = await self.get_source_by_id(id)
-            self.sources.remove(source)
+            await self.get_source_by_id(id)
+            self.sources.delete(id)
+
+    async def delete_sources_by_ids(self, ids: List[str]) -> None:
+        async with self.transaction_lock:
+            for id in ids:
+                if self.sources.get(id) is not None:
+                    self.sources.delete(id)
 
     async def get_expired_sources(self, deadline: datetime) -> AsyncIterable[Source]:
-        for source in self.sources.get_items():
-            if source.created_at < deadline:
-                yield source
+        for source in self.sources.between(
+            None, upper=deadline, index="created_at", right_closed=False
+        ):
+            yield source
 
     #
     # RESULTS
@@ -205,24 +301,20 @@ class MemoryRepository(Repository):
         start_mol_id: Optional[int] = None,
         end_mol_id: Optional[int] = None,
     ) -> AsyncIterable[Tuple[Optional[Result], Optional[Result]]]:
-        async for change in self.results.changes():
-            old, new = change
-            if (
-                old is not None
-                and old.job_id == job_id
-                and start_mol_id <= old.mol_id <= end_mol_id
-            ) or (
-                new is not None
-                and new.job_id == job_id
-                and start_mol_id <= new.mol_id <= end_mol_id
-            ):
-                yield change
+        async for change in self.results.changes(
+            include_initial=True,
+            key=job_id,
+            index="job_id_mol_id",
+            lower=start_mol_id,
+            upper=end_mol_id,
+        ):
+            yield change
 
     async def get_result_by_id(self, id: str) -> Result:
-        try:
-            return next((result for result in self.results.get_items() if result.id == id))
-        except StopIteration as e:
-            raise RecordNotFoundError(Result, id) from e
+        result = self.results.get(id)
+        if result is None:
+            raise RecordNotFoundError(Result, id)
+        return result
 
     async def get_results_by_job_id(
         self,
@@ -230,144 +322,171 @@ class MemoryRepository(Repository):
         start_mol_id: Optional[int] = None,
         end_mol_id: Optional[int] = None,
     ) -> List[Result]:
-        return [
-            result
-            for result in self.results.get_items()
-            if result.job_id == job_id
-            and (start_mol_id is None or start_mol_id <= result.mol_id)
-            and (end_mol_id is None or result.mol_id <= end_mol_id)
-        ]
+        return self.results.between(job_id, start_mol_id, end_mol_id, index="job_id_mol_id")
 
-    async def upsert_results(self, results: List[Result]) -> None:
+    async def iter_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterable[List[Result]]:
+        results = await self.get_results_by_job_id(job_id, start_mol_id, end_mol_id)
+        for i in range(0, len(results), batch_size):
+            yield results[i : i + batch_size]
+
+    async def upsert_results(self, results: List[Result]) -> UpsertSummary:
+        summary = UpsertSummary()
         async with self.transaction_lock:
             for result in results:
-                try:
-                    existing = await self.get_result_by_id(result.id)
-                    self.results.update(existing, result)
-                except RecordNotFoundError:
-                    self.results.append(result)
+                existing = self.results.get(result.id)
+                if existing is None:
+                    self.results.insert(result)
+                    summary.num_inserted += 1
+                elif existing != result:
+                    self.results.replace(result)
+                    summary.num_updated += 1
+                else:
+                    # unchanged (e.g. redelivered) -> no change notification
+                    summary.num_skipped += 1
+
+            # update the materialized progress of all affected jobs
+            mol_ids_by_job = {}
+            for result in results:
+                mol_ids_by_job.setdefault(result.job_id, []).append(result.mol_id)
+
+            for job_id, mol_ids in mol_ids_by_job.items():
+                job = self.jobs.get(job_id)
+
+                # the job might have been deleted in the meantime or it might be done already
+                # (progress is frozen in that case)
+                if job is None or job.is_done():
+                    continue
+
+                entries_processed = job.entries_processed.union(mol_ids)
+                if entries_processed.count() == job.entries_processed.count():
+                    # all results were processed before
+                    continue
+
+                self.jobs.replace(
+                    JobWithResults(
+                        **job.model_dump(exclude={"entries_processed"}),
+                        entries_processed=entries_processed,
+                    ),
+                )
+
+        return summary
 
     async def get_all_results_by_job_id(self, job_id: str) -> List[Result]:
-        return [result for result in self.results.get_items() if result.job_id == job_id]
+        return await self.get_results_by_job_id(job_id)
 
     async def delete_results_by_job_id(self, job_id) -> None:
         async with self.transaction_lock:
-            results_to_delete = [
-                result for result in self.results.get_items() if result.job_id == job_id
-            ]
-            for result in results_to_delete:
-                self.results.remove(result)
+            for result in await self.get_results_by_job_id(job_id):
+                self.results.delete(result.id)
 
     #
     # CHECKPOINTS
     #
     async def create_result_checkpoint(self, checkpoint: ResultCheckpoint) -> ResultCheckpoint:
         async with self.transaction_lock:
-            try:
-                await self.get_result_checkpoints_by_job_id(checkpoint.job_id)
-                raise RecordAlreadyExistsError(ResultCheckpoint, checkpoint.job_id)
-            except RecordNotFoundError:
-                self.checkpoints.append(checkpoint)
-                return checkpoint
+            if self.checkpoints.get(checkpoint.id) is not None:
+                raise RecordAlreadyExistsError(ResultCheckpoint, checkpoint.id)
+
+            self.checkpoints.insert(checkpoint)
+            return checkpoint
 
     async def update_result_checkpoint(self, checkpoint: ResultCheckpoint) -> ResultCheckpoint:
         async with self.transaction_lock:
-            existing_checkpoint = next(
-                (cp for cp in self.checkpoints.get_items() if cp.id == checkpoint.id), None
-            )
-            if existing_checkpoint is None:
+            if self.checkpoints.get(checkpoint.id) is None:
                 raise RecordNotFoundError(ResultCheckpoint, checkpoint.id)
 
-            self.checkpoints.update(existing_checkpoint, checkpoint)
-            return await self.get_result_checkpoints_by_job_id(checkpoint.job_id)
+            self.checkpoints.replace(checkpoint)
+            return checkpoint
+
+    async def update_result_checkpoints(
+        self, checkpoints: List[ResultCheckpoint]
+    ) -> List[ResultCheckpoint]:
+        async with self.transaction_lock:
+            updated = [c for c in checkpoints if self.checkpoints.get(c.id) is not None]
+            for checkpoint in updated:
+                self.checkpoints.replace(checkpoint)
+            return updated
 
     async def get_result_checkpoints_by_job_id(self, job_id: str) -> List[ResultCheckpoint]:
-        return [
-            checkpoint for checkpoint in self.checkpoints.get_items() if checkpoint.job_id == job_id
-        ]
+        return self.checkpoints.get_all(job_id, index="job_id")
 
     async def get_result_checkpoints_by_module_id(self, module_id):
-        return [
-            checkpoint
-            for checkpoint in self.checkpoints.get_items()
-            if checkpoint.job_type == module_id
-        ]
+        return self.checkpoints.get_all(module_id, index="job_type")
 
     async def delete_result_checkpoints_by_job_id(self, job_id: str) -> None:
         async with self.transaction_lock:
-            checkpoints_to_delete = [
-                checkpoint
-                for checkpoint in self.checkpoints.get_items()
-                if checkpoint.job_id == job_id
-            ]
-            for checkpoint in checkpoints_to_delete:
-                self.checkpoints.remove(checkpoint)
+            for checkpoint in self.checkpoints.get_all(job_id, index="job_id"):
+                self.checkpoints.delete(checkpoint.id)
 
     #
     # USERS
     #
     async def get_user_by_ip_address(self, ip_address: str) -> User:
-        try:
-            return next((user for user in self.users.get_items() if user.ip_address == ip_address))
-        except StopIteration as e:
-            raise RecordNotFoundError(User, ip_address) from e
+        users = self.users.get_all(ip_address, index="ip_address")
+        if len(users) == 0:
+            raise RecordNotFoundError(User, ip_address)
+        return users[0]
 
     # Note: this method is not mandatory for the repository interface.
     async def get_user_by_id(self, id: str) -> User:
-        try:
-            return next((user for user in self.users.get_items() if user.id == id))
-        except StopIteration as e:
-            raise RecordNotFoundError(User, id) from e
+        user = self.users.get(id)
+        if user is None:
+            raise RecordNotFoundError(User, id)
+        return user
 
     async def create_user(self, user: User) -> User:
         async with self.transaction_lock:
-            try:
-                await self.get_user_by_id(user.id)
+            if self.users.get(user.id) is not None:
                 raise RecordAlreadyExistsError(User, user.id)
-            except RecordNotFoundError:
-                result = AnonymousUser(**user.model_dump())
-                self.users.append(result)
-                return result
+
+            result = AnonymousUser(**user.model_dump())
+            self.users.insert(result)
+            return result
 
     async def get_recent_jobs_by_user(self, user, num_seconds):
         return [
             job
-            for job in self.jobs.get_items()
-            if job.user_id == user.id and (job.created_at.timestamp() > (time.time() - num_seconds))
+            for job in self.jobs.get_all(user.id, index="user_id")
+            if job.created_at.timestamp() > (time.time() - num_seconds)
         ]
 
     #
     # CHALLENGES
     #
     async def get_challenge_by_salt(self, salt: str) -> Challenge:
-        try:
-            return next((challenge for challenge in self.challenges if challenge.salt == salt))
-        except StopIteration as e:
-            raise RecordNotFoundError(Challenge, salt) from e
+        challenges = self.challenges.get_all(salt, index="salt")
+        if len(challenges) == 0:
+            raise RecordNotFoundError(Challenge, salt)
+        return challenges[0]
 
     # Note: this method is not mandatory for the repository interface.
-    async def get_challenge_by_id(self, id: str) -> User:
-        try:
-            return next((challenge for challenge in self.challenges if challenge.id == id))
-        except StopIteration as e:
-            raise RecordNotFoundError(Challenge, id) from e
+    async def get_challenge_by_id(self, id: str) -> Challenge:
+        challenge = self.challenges.get(id)
+        if challenge is None:
+            raise RecordNotFoundError(Challenge, id)
+        return challenge
 
     async def create_challenge(self, challenge: Challenge) -> Challenge:
         async with self.transaction_lock:
-            try:
-                await self.get_challenge_by_id(challenge.id)
+            if self.challenges.get(challenge.id) is not None:
                 raise RecordAlreadyExistsError(Challenge, challenge.id)
-            except RecordNotFoundError:
-                self.challenges.append(challenge)
-                return challenge
+
+            self.challenges.insert(challenge)
+            return challenge
 
     async def delete_challenge_by_id(self, id: str) -> None:
         async with self.transaction_lock:
-            existing_challenge = await self.get_challenge_by_id(id)
-            self.challenges.remove(existing_challenge)
+            await self.get_challenge_by_id(id)
+            self.challenges.delete(id)
 
     async def delete_expired_challenges(self, deadline: datetime) -> None:
         async with self.transaction_lock:
             for challenge in self.challenges:
                 if challenge.expires_at < deadline:
-                    self.challenges.remove(challenge)
+                    self.challenges.delete(challenge.id)
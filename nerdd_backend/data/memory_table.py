@@ -0,0 +1,238 @@
+from bisect import bisect_left, bisect_right
+from typing import (
+    Any,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from .change_router import ChangeRouter
+
+__all__ = ["MemoryTable"]
+
+T = TypeVar("T")
+
+
+class _OrderedGroup:
+    # parallel lists sorted by order value (ids are used to locate records with equal order)
+    def __init__(self) -> None:
+        self.orders: List[Any] = []
+        self.ids: List[Hashable] = []
+
+    def insert(self, order: Any, id: Hashable) -> None:
+        i = bisect_right(self.orders, order)
+        self.orders.insert(i, order)
+        self.ids.insert(i, id)
+
+    def remove(self, order: Any, id: Hashable) -> None:
+        i = bisect_left(self.orders, order)
+        j = bisect_right(self.orders, order)
+        i += self.ids[i:j].index(id)
+        del self.orders[i]
+        del self.ids[i]
+
+    def between(self, lower: Any, upper: Any, right_closed: bool) -> List[Hashable]:
+        i = 0 if lower is None else bisect_left(self.orders, lower)
+        if upper is None:
+            j = len(self.orders)
+        elif right_closed:
+            j = bisect_right(self.orders, upper)
+        else:
+            j = bisect_left(self.orders, upper)
+        return self.ids[i:j]
+
+
+class _OrderedIndex:
+    def __init__(self, group: Callable[[Any], Hashable], order: Callable[[Any], Any]) -> None:
+        self.group = group
+        self.order = order
+        self.groups: Dict[Hashable, _OrderedGroup] = {}
+
+    def insert(self, id: Hashable, item: Any) -> None:
+        self.groups.setdefault(self.group(item), _OrderedGroup()).insert(self.order(item), id)
+
+    def remove(self, id: Hashable, item: Any) -> None:
+        key = self.group(item)
+        group = self.groups[key]
+        group.remove(self.order(item), id)
+        if len(group.ids) == 0:
+            del self.groups[key]
+
+
+class MemoryTable(Generic[T]):
+    """
+    An in-memory table of records with a primary key and (optional) secondary indexes.
+
+    * Hash indexes (add_index) map a key to all records with that key.
+    * Ordered indexes (add_ordered_index) partition records into groups and keep each group
+      sorted by an order value, e.g. all results of a job sorted by mol_id.
+
+    All lookups run in (nearly) constant or logarithmic time. Every modification is published as
+    a tuple (old, new) similar to RethinkDB changefeeds. Subscribers of changes() can restrict
+    themselves to a single record or to a key (and order range) of an index. In that case, they
+    only receive the changes of matching records (see ChangeRouter).
+    """
+
+    def __init__(
+        self,
+        primary_key: Callable[[T], Hashable] = lambda item: item.id,
+        queue_size: int = 100_000,
+    ) -> None:
+        self.primary_key = primary_key
+        self._items: Dict[Hashable, T] = {}
+        self._hash_indexes: Dict[str, Tuple[Callable[[T], Hashable], Dict]] = {}
+        self._ordered_indexes: Dict[str, _OrderedIndex] = {}
+        self._router = ChangeRouter[T](queue_size)
+        self._router.add_route("id", primary_key)
+        self._observers: List[Callable[[Tuple[Optional[T], Optional[T]]], None]] = []
+
+    def add_index(self, name: str, key: Callable[[T], Hashable]) -> None:
+        assert len(self._items) == 0, "indexes must be created before inserting records"
+        self._hash_indexes[name] = (key, {})
+        self._router.add_route(name, key)
+
+    def add_ordered_index(
+        self, name: str, group: Callable[[T], Hashable], order: Callable[[T], Any]
+    ) -> None:
+        assert len(self._items) == 0, "indexes must be created before inserting records"
+        self._ordered_indexes[name] = _OrderedIndex(group, order)
+        self._router.add_route(name, group, order)
+
+    #
+    # READ
+    #
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(list(self._items.values()))
+
+    def get(self, id: Hashable) -> Optional[T]:
+        return self._items.get(id)
+
+    def get_all(self, key: Hashable, index: str) -> List[T]:
+        _, buckets = self._hash_indexes[index]
+        return list(buckets.get(key, {}).values())
+
+    def between(
+        self,
+        group: Hashable,
+        lower: Any = None,
+        upper: Any = None,
+        index: str = "",
+        right_closed: bool = True,
+    ) -> List[T]:
+        # return all records in a group with lower <= order <= upper (sorted by order)
+        # (None means unbounded, right_closed=False excludes the upper bound)
+        ordered_group = self._ordered_indexes[index].groups.get(group)
+        if ordered_group is None:
+            return []
+        return [self._items[id] for id in ordered_group.between(lower, upper, right_closed)]
+
+    #
+    # WRITE
+    #
+    def insert(self, item: T) -> None:
+        id = self.primary_key(item)
+        assert id not in self._items, f"record {id} already exists"
+        self._items[id] = item
+        self._index(id, item)
+        self._publish((None, item))
+
+    def replace(self, item: T) -> T:
+        id = self.primary_key(item)
+        old = self._items[id]
+        self._unindex(id, old)
+        self._items[id] = item
+        self._index(id, item)
+        self._publish((old, item))
+        return old
+
+    def delete(self, id: Hashable) -> T:
+        old = self._items.pop(id)
+        self._unindex(id, old)
+        self._publish((old, None))
+        return old
+
+    #
+    # CHANGES
+    #
+    def changes(
+        self,
+        include_initial: bool = False,
+        key: Hashable = None,
+        index: Optional[str] = None,
+        lower: Any = None,
+        upper: Any = None,
+    ) -> AsyncIterable[Tuple[Optional[T], Optional[T]]]:
+        # * index=None, key=None: changes of all records
+        # * index=None, key=...: changes of the record with primary key "key"
+        # * index=...: changes of records with the given key in the index (and lower <= order <=
+        #   upper for ordered indexes)
+        if index is None and key is None:
+            return self._router.changes(
+                initial=(lambda: list(self._items.values())) if include_initial else None
+            )
+
+        if index is None:
+            route = "id"
+
+            def initial() -> List[T]:
+                item = self._items.get(key)
+                return [item] if item is not None else []
+
+        elif index in self._ordered_indexes:
+            route = index
+
+            def initial() -> List[T]:
+                return self.between(key, lower, upper, index=index)
+
+        else:
+            assert lower is None and upper is None, "ranges require an ordered index"
+            route = index
+
+            def initial() -> List[T]:
+                return self.get_all(key, index=index)
+
+        return self._router.changes(
+            route,
+            key,
+            lower,
+            upper,
+            initial=initial if include_initial else None,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(num_records=len(self._items), **self._router.get_stats())
+
+    def observe(self, callback: Callable[[Tuple[Optional[T], Optional[T]]], None]) -> None:
+        # callback is called synchronously on every modification (e.g. to persist the change)
+        self._observers.append(callback)
+
+    def _publish(self, change: Tuple[Optional[T], Optional[T]]) -> None:
+        for callback in self._observers:
+            callback(change)
+        self._router.publish(change)
+
+    def _index(self, id: Hashable, item: T) -> None:
+        for key, buckets in self._hash_indexes.values():
+            buckets.setdefault(key(item), {})[id] = item
+        for index in self._ordered_indexes.values():
+            index.insert(id, item)
+
+    def _unindex(self, id: Hashable, item: T) -> None:
+        for key, buckets in self._hash_indexes.values():
+            k = key(item)
+            bucket = buckets[k]
+            del bucket[id]
+            if len(bucket) == 0:
+                del buckets[k]
+        for index in self._ordered_indexes.values():
+            index.remove(id, item)
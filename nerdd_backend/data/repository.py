@@ -1,7 +1,6 @@
 from abc import ABC, abstractmethod
-from asyncio import Queue, create_task
 from datetime import datetime
-from typing import Any, AsyncIterable, List, Optional, Tuple
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
 
 from ..models import (
     AnonymousUser,
@@ -14,9 +13,9 @@ from ..models import (
     Result,
     ResultCheckpoint,
     Source,
+    UpsertSummary,
     User,
 )
-from ..util import CompressedSet
 
 __all__ = ["Repository"]
 
@@ -33,6 +32,10 @@ class Repository(ABC):
     async def close(self) -> None:
         pass
 
+    def get_stats(self) -> Dict[str, Any]:
+        # statistics for monitoring (e.g. connection pool usage), empty by default
+        return {}
+
     #
     # MODULES
     #
@@ -64,8 +67,8 @@ class Repository(ABC):
     async def get_job_with_result_changes(
         self, job_id: str
     ) -> AsyncIterable[Tuple[Optional[JobWithResults], Optional[JobWithResults]]]:
-        # The main idea of this method is to merge the changes of job and results. For that we
-        # get the current state of the job and update whenever a change occurs.
+        # The progress of a job (entries_processed) is materialized in the job record and kept up to
+        # date by upsert_results. That means we only need to listen to the changes of the job.
         job = await self.get_job_by_id(job_id)
 
         # return the initial state of the job (None indicates that this is the initial state)
@@ -74,64 +77,22 @@ class Repository(ABC):
         if job.is_done():
             return
 
-        # We create two tasks that listen to the changes of job and results and put the changes into
-        # a queue.
-        queue = Queue[Tuple[str, Any]]()
-
-        async def _drain_iterator(aiter: AsyncIterable, event_type: str) -> None:
-            async for item in aiter:
-                await queue.put((event_type, item))
-
-        drain_tasks = [
-            create_task(_drain_iterator(aiter, event_type))
-            for aiter, event_type in [
-                (self.get_job_changes(job_id), "job_change"),
-                (self.get_result_changes(job_id), "results_change"),
-            ]
-        ]
-
-        while True:
-            event_type, (_, new) = await queue.get()
-            if event_type == "job_change":
-                if new is not None:
-                    new_job = JobWithResults(
-                        **new.model_dump(),
-                        entries_processed=job.entries_processed,
-                    )
-                    yield job, new_job
-                    job = new_job
-
-                    if job.is_done():
-                        # job is completed, we can exit the loop
-                        break
-                else:
-                    # job was deleted -> exit the loop
-                    break
-            elif event_type == "results_change":
-                if new is not None:
-                    if new.mol_id in job.entries_processed:
-                        # result already processed, skip
-                        continue
-
-                    old_job_obj = job.model_dump()
-                    old_job_obj["entries_processed"] = CompressedSet(
-                        old_job_obj["entries_processed"]
-                    )
-                    old_job_obj["entries_processed"].add(new.mol_id)
-
-                    new_job = JobWithResults(**old_job_obj)
-
-                    yield job, new_job
-                    job = new_job
-
-                    if job.is_done():
-                        # job is completed, we can exit the loop
-                        break
-                else:
-                    pass
-
-        for task in drain_tasks:
-            task.cancel()
+        async for _, new in self.get_job_changes(job_id):
+            if new is None:
+                # job was deleted -> exit the loop
+                break
+
+            # avoid copying the progress if the repository provides it already
+            if isinstance(new, JobWithResults):
+                new_job = new
+            else:
+                new_job = JobWithResults(**new.model_dump())
+            yield job, new_job
+            job = new_job
+
+            if job.is_done():
+                # job is completed, we can exit the loop
+                break
 
     @abstractmethod
     def get_job_changes(
@@ -151,10 +112,28 @@ class Repository(ABC):
     async def get_job_by_id(self, job_id: str) -> JobWithResults:
         pass
 
+    @abstractmethod
+    async def get_job_internal(self, job_id: str) -> JobInternal:
+        # same as get_job_by_id, but without the progress of the job (entries_processed)
+        pass
+
+    @abstractmethod
+    async def get_jobs_by_ids(
+        self, job_ids: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        # returns the given fields (all fields of JobInternal if fields is None) of all existing
+        # jobs (missing jobs are skipped)
+        pass
+
     @abstractmethod
     async def delete_job_by_id(self, job_id: str) -> None:
         pass
 
+    @abstractmethod
+    async def delete_jobs_by_ids(self, job_ids: List[str]) -> None:
+        # deletes all given jobs in a single operation (missing jobs are skipped)
+        pass
+
     @abstractmethod
     async def get_jobs_by_status(
         self,
@@ -179,10 +158,20 @@ class Repository(ABC):
     async def get_source_by_id(self, source_id: str) -> Source:
         pass
 
+    @abstractmethod
+    async def get_sources_by_ids(self, source_ids: List[str]) -> List[Source]:
+        # missing sources are skipped
+        pass
+
     @abstractmethod
     async def delete_source_by_id(self, source_id: str) -> None:
         pass
 
+    @abstractmethod
+    async def delete_sources_by_ids(self, source_ids: List[str]) -> None:
+        # deletes all given sources in a single operation (missing sources are skipped)
+        pass
+
     @abstractmethod
     async def get_expired_sources(self, deadline: datetime) -> AsyncIterable[Source]:
         pass
@@ -200,7 +189,21 @@ class Repository(ABC):
         pass
 
     @abstractmethod
-    async def upsert_results(self, result: List[Result]) -> None:
+    def iter_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterable[List[Result]]:
+        # streams the results of a job (ordered by mol_id) in batches of at most batch_size
+        # results (use this method instead of get_results_by_job_id for large reads)
+        pass
+
+    @abstractmethod
+    async def upsert_results(self, results: List[Result]) -> UpsertSummary:
+        # Results that are already stored with identical content are skipped, i.e. they are not
+        # written and do not emit a change (e.g. when result messages are redelivered).
         pass
 
     @abstractmethod
@@ -227,6 +230,14 @@ class Repository(ABC):
     async def update_result_checkpoint(self, checkpoint: ResultCheckpoint) -> ResultCheckpoint:
         pass
 
+    @abstractmethod
+    async def update_result_checkpoints(
+        self, checkpoints: List[ResultCheckpoint]
+    ) -> List[ResultCheckpoint]:
+        # updates all given checkpoints in a single operation and returns the updated checkpoints
+        # (missing checkpoints are skipped)
+        pass
+
     @abstractmethod
     async def get_result_checkpoints_by_job_id(self, job_id: str) -> List[ResultCheckpoint]:
         pass
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import zlib
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from ..models import Result
+from ..util import LruCache
+
+__all__ = ["ResultArchive"]
+
+logger = logging.getLogger(__name__)
+
+# An archive file consists of
+#   MAGIC | page | page | ... | index | footer
+# where every page (all results of page_size consecutive molecules) and the index are compressed
+# json documents. The index maps page numbers to (offset, length) of the page in the file and the
+# footer contains the offset and length of the index.
+MAGIC = b"NERDDRA1"
+FOOTER = struct.Struct("<QQ")
+
+
+def _result_order(result: Result) -> Tuple[int, int, int, str]:
+    # numeric order of molecules and of atoms or derivatives (ids are strings, e.g. "job-10")
+    atom_id = getattr(result, "atom_id", None)
+    derivative_id = getattr(result, "derivative_id", None)
+    return (
+        result.mol_id,
+        atom_id if isinstance(atom_id, int) else -1,
+        derivative_id if isinstance(derivative_id, int) else -1,
+        result.id,
+    )
+
+
+class _Index:
+    def __init__(self, page_size: int, pages: Dict[int, List[int]]) -> None:
+        self.page_size = page_size
+        # page number -> [offset, length]
+        self.pages = pages
+
+
+class _ArchiveWriter:
+    # writes an archive to a temporary file first so that readers never see a partially written
+    # archive (all methods are blocking)
+
+    def __init__(self, path: str, tmp_path: str, compression_level: int) -> None:
+        self.path = path
+        self.tmp_path = tmp_path
+        self.compression_level = compression_level
+        # page number -> [offset, length]
+        self.index: Dict[int, List[int]] = {}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.f = open(tmp_path, "wb")
+        self.f.write(MAGIC)
+
+    def write_page(self, page: int, results: List[Result]) -> None:
+        data = self._compress(
+            [result.model_dump() for result in sorted(results, key=_result_order)]
+        )
+        self.index[page] = [self.f.tell(), len(data)]
+        self.f.write(data)
+
+    def commit(self, page_size: int) -> int:
+        index_data = self._compress(dict(page_size=page_size, pages=self.index))
+        index_offset = self.f.tell()
+        self.f.write(index_data)
+        self.f.write(FOOTER.pack(index_offset, len(index_data)))
+
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        num_bytes = self.f.tell()
+        self.f.close()
+
+        os.replace(self.tmp_path, self.path)
+        return num_bytes
+
+    def abort(self) -> None:
+        self.f.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def _compress(self, obj: Any) -> bytes:
+        return zlib.compress(json.dumps(obj).encode("utf-8"), self.compression_level)
+
+
+class ResultArchive:
+    """
+    Stores all results of completed jobs in compressed files (one per job) in root_dir.
+
+    Results are grouped into pages of page_size consecutive molecules and every page is compressed
+    separately. With the page index in memory, reading a page requires a single seek and a single
+    decompression.
+    """
+
+    def __init__(
+        self, root_dir: str, compression_level: int = 6, index_cache_size: int = 1000
+    ) -> None:
+        self.root_dir = root_dir
+        self.compression_level = compression_level
+        self._indexes = LruCache[_Index](index_cache_size)
+
+        # statistics
+        self._num_archived = 0
+        self._num_pages_read = 0
+
+    def get_path(self, job_id: str) -> str:
+        return os.path.join(self.root_dir, f"{job_id}.results")
+
+    async def write(self, job_id: str, page_size: int, batches: AsyncIterable[List[Result]]) -> int:
+        # Results have to be ordered by mol_id (e.g. from Repository.iter_results_by_job_id).
+        # Every page is written as soon as it is complete, i.e. only a single page is kept in
+        # memory.
+        path = self.get_path(job_id)
+        writer = await asyncio.to_thread(
+            _ArchiveWriter, path, f"{path}.{uuid4().hex}.tmp", self.compression_level
+        )
+        try:
+            current_page: Optional[int] = None
+            page_results: List[Result] = []
+            async for batch in batches:
+                for result in batch:
+                    page = result.mol_id // page_size
+                    if current_page is not None and page != current_page:
+                        if page < current_page:
+                            raise ValueError(f"Results of job {job_id} are not ordered by mol_id")
+                        await asyncio.to_thread(writer.write_page, current_page, page_results)
+                        page_results = []
+                    current_page = page
+                    page_results.append(result)
+
+            if current_page is not None:
+                await asyncio.to_thread(writer.write_page, current_page, page_results)
+
+            num_bytes = await asyncio.to_thread(writer.commit, page_size)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+
+        self._indexes.invalidate(job_id)
+        self._num_archived += 1
+        return num_bytes
+
+    async def contains(self, job_id: str) -> bool:
+        if self._indexes.peek(job_id) is not None:
+            return True
+        return await asyncio.to_thread(os.path.exists, self.get_path(job_id))
+
+    async def get_results(
+        self, job_id: str, start_mol_id: Optional[int] = None, end_mol_id: Optional[int] = None
+    ) -> Optional[List[Result]]:
+        # returns None if the results of the job were not archived
+        index = self._indexes.get(job_id)
+        try:
+            index, pages = await asyncio.to_thread(
+                self._read, job_id, index, start_mol_id, end_mol_id
+            )
+        except FileNotFoundError:
+            self._indexes.invalidate(job_id)
+            return None
+
+        # note: the cache is only accessed in the event loop (it is not thread-safe)
+        self._indexes.put(job_id, index)
+        self._num_pages_read += len(pages)
+
+        return [
+            Result(**result)
+            for page in pages
+            for result in page
+            if (start_mol_id is None or result["mol_id"] >= start_mol_id)
+            and (end_mol_id is None or result["mol_id"] <= end_mol_id)
+        ]
+
+    def _read(
+        self,
+        job_id: str,
+        index: Optional[_Index],
+        start_mol_id: Optional[int],
+        end_mol_id: Optional[int],
+    ) -> Tuple[_Index, List[List[Dict[str, Any]]]]:
+        with open(self.get_path(job_id), "rb") as f:
+            if index is None:
+                index = self._read_index(f)
+
+            first_page = (start_mol_id or 0) // index.page_size
+            if end_mol_id is None:
+                last_page = max(index.pages, default=-1)
+            else:
+                last_page = end_mol_id // index.page_size
+
+            pages = []
+            for page in range(first_page, last_page + 1):
+                if page in index.pages:
+                    offset, length = index.pages[page]
+                    f.seek(offset)
+                    pages.append(json.loads(zlib.decompress(f.read(length))))
+
+        return index, pages
+
+    def _read_index(self, f) -> _Index:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"File {f.name} is not a result archive")
+
+        f.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, index_length = FOOTER.unpack(f.read(FOOTER.size))
+        f.seek(index_offset)
+        index = json.loads(zlib.decompress(f.read(index_length)))
+
+        # json object keys are strings
+        return _Index(
+            index["page_size"], {int(page): entry for page, entry in index["pages"].items()}
+        )
+
+    async def delete(self, job_id: str) -> None:
+        self._indexes.invalidate(job_id)
+        try:
+            await asyncio.to_thread(os.remove, self.get_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            archived=self._num_archived,
+            pages_read=self._num_pages_read,
+            index_cache=self._indexes.get_stats(),
+        )
@@ -1,12 +1,11 @@
-import asyncio
-import copy
 import logging
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
 
 from rethinkdb import RethinkDB
 from rethinkdb.errors import ReqlDriverError, ReqlOpFailedError
+from rethinkdb.net import Cursor
 
 from ..models import (
     AnonymousUser,
@@ -20,9 +19,12 @@ from ..models import (
     Result,
     ResultCheckpoint,
     Source,
+    UpsertSummary,
     User,
     UserType,
 )
+from ..util import CompressedSet
+from .connection_pool import ConnectionPool
 from .exceptions import RecordAlreadyExistsError, RecordNotFoundError
 from .repository import Repository
 
@@ -32,70 +34,150 @@ logger = logging.getLogger(__name__)
 
 
 class RethinkDbRepository(Repository):
-    def __init__(self, host: str, port: int, database_name: str) -> None:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        database_name: str,
+        pool_min_size: int = 1,
+        pool_max_size: int = 10,
+        pool_max_idle_seconds: float = 300,
+        pool_health_check_interval_seconds: float = 30,
+        changefeed_max_connections: int = 100,
+        table_shards: Optional[Dict[str, int]] = None,
+        table_replicas: Optional[Dict[str, int]] = None,
+        durability: Optional[Dict[str, str]] = None,
+        read_mode: Optional[Dict[str, str]] = None,
+    ) -> None:
         self.r = RethinkDB()
         self.r.set_loop_type("asyncio")
 
         self.host = host
         self.port = port
         self.database_name = database_name
-        self._connection = None
-        self._connection_lock = asyncio.Lock()
 
-    @asynccontextmanager
-    async def _get_connection(self, use_database: bool = True) -> AsyncIterator:
+        # number of shards and replicas per table (server default if not specified)
+        self.table_shards = dict(table_shards or {})
+        self.table_replicas = dict(table_replicas or {})
+
+        # durability ("hard" or "soft") and read mode ("single", "majority" or "outdated") per
+        # operation (i.e. method name, table default if not specified)
+        self.durability = dict(durability or {})
+        self.read_mode = dict(read_mode or {})
+        for operation, value in self.durability.items():
+            if value not in ["hard", "soft"]:
+                raise ValueError(f"Invalid durability for {operation}: {value}")
+        for operation, value in self.read_mode.items():
+            if value not in ["single", "majority", "outdated"]:
+                raise ValueError(f"Invalid read mode for {operation}: {value}")
+
+        # connections for normal (short-lived) queries
+        self._pool = ConnectionPool(
+            self._connect,
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            max_idle_seconds=pool_max_idle_seconds,
+            health_check_interval_seconds=pool_health_check_interval_seconds,
+            health_check=self._check_connection,
+        )
+
+        # Changefeeds keep their connection open for a long time (e.g. as long as a websocket is
+        # connected). They get their own budget so that they can not starve the normal queries.
+        self._changefeed_pool = ConnectionPool(
+            self._connect,
+            min_size=0,
+            max_size=changefeed_max_connections,
+            reuse=False,
+        )
+
+    async def _connect(self, use_database: bool = True):
         connection = await self.r.connect(self.host, self.port)
         if use_database:
             connection.use(self.database_name)
+        return connection
 
-        try:
+    async def _check_connection(self, connection) -> None:
+        await self.r.expr(1).run(connection)
+
+    @asynccontextmanager
+    async def _get_connection(self) -> AsyncIterator:
+        async with self._changefeed_pool.acquire() as connection:
             yield connection
-        finally:
-            await connection.close()
 
-    async def _run(self, query):
+    def _get_run_options(self, operation: Optional[str]) -> Dict[str, str]:
+        options = {}
+        if operation in self.durability:
+            options["durability"] = self.durability[operation]
+        if operation in self.read_mode:
+            options["read_mode"] = self.read_mode[operation]
+        return options
+
+    async def _run(self, query, operation: Optional[str] = None):
         """
-        Run a RethinkDB query on a shared connection. If the connection is closed, it will be
-        re-established automatically.
+        Run a RethinkDB query on a connection from the pool. If the connection was closed (e.g. by
+        the database server), the query is retried once on another connection. The operation
+        (i.e. the name of the calling method) determines the durability and read mode.
+
+        Sequences are returned as a list: a cursor reads from the connection, so it has to be
+        consumed before the connection is returned to the pool (use _iter for large results).
         """
+        options = self._get_run_options(operation)
 
-        # rethinkdb might close the shared connection -> try a second attempt with a new connection
+        # rethinkdb might close the connection -> try a second attempt with a new connection
         for attempt in range(2):
-            async with self._connection_lock:
-                # establish the shared connection if it doesn't exist yet or is closed
-                if self._connection is None or not self._connection.is_open():
-                    self._connection = await self.r.connect(self.host, self.port)
-                    self._connection.use(self.database_name)
+            async with self._pool.acquire() as connection:
+                try:
+                    result = await query.run(connection, **options)
+                    if isinstance(result, Cursor):
+                        result = [item async for item in result]
+                    return result
+                except ReqlDriverError:
+                    # If the connection is closed and this was the first attempt, try again with a
+                    # new connection (the pool discards closed connections). Otherwise, re-raise
+                    # the exception.
+                    if attempt == 1 or connection.is_open():
+                        raise
+
+    async def _iter(self, query, operation: Optional[str] = None) -> AsyncIterator[Any]:
+        """
+        Like _run, but yields the items of a sequence while they are fetched from the server. The
+        connection stays checked out until the cursor is exhausted or the iteration is stopped.
+        """
+        options = self._get_run_options(operation)
 
-                connection = self._connection
+        for attempt in range(2):
+            async with self._pool.acquire() as connection:
+                try:
+                    cursor = await query.run(connection, **options)
+                except ReqlDriverError:
+                    # retry once if the connection was closed (see _run)
+                    if attempt == 1 or connection.is_open():
+                        raise
+                    continue
 
-            try:
-                return await query.run(connection)
-            except ReqlDriverError:
-                # If the connection is closed and this was the first attempt, try again with a new
-                # connection. Otherwise, re-raise the exception.
-                if attempt == 1 or connection.is_open():
-                    raise
-
-                # In the meantime, the connection might have been re-opened by another coroutine.
-                # -> check if the connection is still the same as the one we used for the query
-                # -> if yes: set it to None and create a new one in the next attempt
-                # -> if no: use the connection created by the other coroutine in the next attempt
-                async with self._connection_lock:
-                    if self._connection is connection:
-                        self._connection = None
+                try:
+                    async for item in cursor:
+                        yield item
+                finally:
+                    await cursor.close()
+                return
 
     async def close(self) -> None:
-        async with self._connection_lock:
-            if self._connection is not None:
-                await self._connection.close()
-                self._connection = None
+        await self._pool.close()
+        await self._changefeed_pool.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            connection_pool=self._pool.get_stats(),
+            changefeed_pool=self._changefeed_pool.get_stats(),
+        )
 
     #
     # INITIALIZATION
     #
     async def initialize(self) -> None:
-        async with self._get_connection(use_database=False) as connection:
+        connection = await self._connect(use_database=False)
+        try:
             dbs = await self.r.db_list().run(connection)
 
             if self.database_name in dbs:
@@ -112,79 +194,100 @@ class RethinkDbRepository(Repository):
             connection.use(self.database_name)
 
             # create tables
-            try:
-                await self.r.table_create("modules", primary_key="id").run(connection)
-            except ReqlOpFailedError:
-                pass
+            for table_name in [
+                "modules",
+                "sources",
+                "jobs",
+                "results",
+                "checkpoints",
+                "users",
+                "challenges",
+            ]:
+                await self._create_table(connection, table_name)
 
-            try:
-                await self.r.table_create("sources", primary_key="id").run(connection)
-            except ReqlOpFailedError:
-                pass
+            # create an index on status in jobs table
+            await self._create_index(connection, "jobs", "status")
+
+            # create a compound index on status, job_type and created_at in jobs table (used for
+            # listing the jobs of a module with a given status, e.g. for queue estimation)
+            await self._create_index(
+                connection,
+                "jobs",
+                "status_job_type_created_at",
+                [self.r.row["status"], self.r.row["job_type"], self.r.row["created_at"]],
+            )
 
-            try:
-                await self.r.table_create("jobs", primary_key="id").run(connection)
-            except ReqlOpFailedError:
-                pass
+            # create a compound index on user_id and created_at in jobs table (used for quota
+            # checks)
+            await self._create_index(
+                connection,
+                "jobs",
+                "user_id_created_at",
+                [self.r.row["user_id"], self.r.row["created_at"]],
+            )
 
-            try:
-                await self.r.table_create("results", primary_key="id").run(connection)
-            except ReqlOpFailedError:
-                pass
+            # create an index on created_at in jobs and sources table (used for finding expired
+            # records)
+            await self._create_index(connection, "jobs", "created_at")
+            await self._create_index(connection, "sources", "created_at")
 
-            try:
-                await self.r.table_create("checkpoints", primary_key="id").run(connection)
-            except ReqlOpFailedError:
-                pass
+            # create an index on job_id in results table
+            await self._create_index(connection, "results", "job_id")
+
+            # create a compound index on job_id and mol_id in results table (used for reading
+            # result pages, i.e. ranges of mol_ids, in the correct order)
+            await self._create_index(
+                connection,
+                "results",
+                "job_id_mol_id",
+                [self.r.row["job_id"], self.r.row["mol_id"]],
+            )
 
-            try:
-                await self.r.table_create("users", primary_key="id").run(connection)
-            except ReqlOpFailedError:
-                pass
+            # create an index on job_id in checkpoints table
+            await self._create_index(connection, "checkpoints", "job_id")
 
-            try:
-                await self.r.table_create("challenges", primary_key="id").run(connection)
-            except ReqlOpFailedError:
-                pass
+            # create an index on ip_address in anonymous_users table
+            await self._create_index(connection, "users", "ip_address")
+        finally:
+            await connection.close()
 
-            # create an index on status in jobs table
-            try:
-                await self.r.table("jobs").index_create("status").run(connection)
-                # wait for index to be ready
-                await self.r.table("jobs").index_wait("status").run(connection)
-            except ReqlOpFailedError as e:
-                if not str(e).startswith("Index `status` already exists"):
-                    logger.exception("Failed to create index", exc_info=e)
+        await self._pool.start()
 
-            # create an index on job_id in results table
-            try:
-                await self.r.table("results").index_create("job_id").run(connection)
+    async def _create_table(self, connection, table_name: str) -> None:
+        options = {}
+        if table_name in self.table_shards:
+            options["shards"] = self.table_shards[table_name]
+        if table_name in self.table_replicas:
+            options["replicas"] = self.table_replicas[table_name]
 
-                # wait for index to be ready
-                await self.r.table("results").index_wait("job_id").run(connection)
-            except ReqlOpFailedError as e:
-                if not str(e).startswith("Index `job_id` already exists"):
-                    logger.exception("Failed to create index", exc_info=e)
+        try:
+            await self.r.table_create(table_name, primary_key="id", **options).run(connection)
+            return
+        except ReqlOpFailedError:
+            # table exists already
+            pass
 
-            # create an index on job_id in checkpoints table
-            try:
-                await self.r.table("checkpoints").index_create("job_id").run(connection)
+        if len(options) == 0:
+            return
 
-                # wait for index to be ready
-                await self.r.table("checkpoints").index_wait("job_id").run(connection)
-            except ReqlOpFailedError as e:
-                if not str(e).startswith("Index `job_id` already exists"):
-                    logger.exception("Failed to create index", exc_info=e)
+        # reconfigure the existing table if the number of shards or replicas changed
+        config = await self.r.table(table_name).config().run(connection)
+        shards = config["shards"]
+        current = dict(shards=len(shards), replicas=len(shards[0]["replicas"]))
+        if any(current[key] != value for key, value in options.items()):
+            logger.info(f"Reconfiguring table {table_name} from {current} to {options}")
+            await self.r.table(table_name).reconfigure(**{**current, **options}).run(connection)
+            await self.r.table(table_name).wait().run(connection)
 
-            # create an index on ip_address in anonymous_users table
-            try:
-                await self.r.table("users").index_create("ip_address").run(connection)
+    async def _create_index(self, connection, table_name: str, index_name: str, *args) -> None:
+        try:
+            await self.r.table(table_name).index_create(index_name, *args).run(connection)
 
-                # wait for index to be ready
-                await self.r.table("users").index_wait("ip_address").run(connection)
-            except ReqlOpFailedError as e:
-                if not str(e).startswith("Index `ip_address` already exists"):
-                    logger.exception("Failed to create index", exc_info=e)
+            # wait for index to be ready
+            await self.r.table(table_name).index_wait(index_name).run(connection)
+        except ReqlOpFailedError as e:
+            if not str(e).startswith(f"Index `{index_name}` already exists"):
+                logger.exception("Failed to create index", exc_info=e)
 
     #
     # MODULES
@@ -209,11 +312,11 @@ class RethinkDbRepository(Repository):
                 yield old_module, new_module
 
     async def get_all_modules(self) -> List[ModuleInternal]:
-        cursor = await self._run(self.r.table("modules"))
-        return [ModuleInternal(**item) async for item in cursor]
+        items = await self._run(self.r.table("modules"), "get_all_modules")
+        return [ModuleInternal(**item) for item in items]
 
     async def get_module_by_id(self, module_id: str) -> ModuleInternal:
-        result = await self._run(self.r.table("modules").get(module_id))
+        result = await self._run(self.r.table("modules").get(module_id), "get_module_by_id")
 
         if result is None:
             raise RecordNotFoundError(ModuleInternal, module_id)
@@ -230,7 +333,8 @@ class RethinkDbRepository(Repository):
         result = await self._run(
             self.r.table("modules").insert(
                 module.model_dump(), conflict="error", return_changes=True
-            )
+            ),
+            "create_module",
         )
 
         if result["errors"] > 0:
@@ -246,7 +350,8 @@ class RethinkDbRepository(Repository):
         result = await self._run(
             self.r.table("modules")
             .get(module.id)
-            .update(module.model_dump(), return_changes="always")
+            .update(module.model_dump(), return_changes="always"),
+            "update_module",
         )
 
         if result["changes"] is None or len(result["changes"]) == 0:
@@ -260,17 +365,13 @@ class RethinkDbRepository(Repository):
     async def get_job_with_result_changes(
         self, job_id: str
     ) -> AsyncIterable[Tuple[Optional[JobWithResults], Optional[JobWithResults]]]:
+        # The progress of a job is materialized in the job document (see upsert_results). That
+        # means it is sufficient to listen to the changes of the job document.
         async with self._get_connection() as connection:
             cursor = (
                 await self.r.table("jobs")
                 .get(job_id)
                 .changes(include_initial=False)
-                .union(
-                    self.r.table("results")
-                    .get_all(job_id, index="job_id")
-                    .pluck("mol_id")
-                    .changes(include_initial=False)
-                )
                 .run(connection)
             )
 
@@ -278,24 +379,20 @@ class RethinkDbRepository(Repository):
 
             yield None, job
 
+            if job.is_done():
+                return
+
             async for change in cursor:
                 if "new_val" not in change or change["new_val"] is None:
                     new_job = None
-                elif "mol_id" in change["new_val"]:
-                    # result entries change
-                    entries_processed = copy.deepcopy(job.entries_processed)
-                    entries_processed.add(change["new_val"]["mol_id"])
-                    new_job = JobWithResults(
-                        **{
-                            **job.model_dump(),
-                            "entries_processed": entries_processed,
-                        }
-                    )
-                else:
-                    # job change (status, num_entries_total, etc.)
+                elif "entries_processed" not in change["new_val"]:
+                    # jobs created before the progress was materialized do not contain the field
+                    # entries_processed -> keep the progress computed in get_job_by_id
                     new_job = JobWithResults(
                         **change["new_val"], entries_processed=job.entries_processed
                     )
+                else:
+                    new_job = JobWithResults(**change["new_val"])
 
                 yield job, new_job
                 job = new_job
@@ -337,8 +434,16 @@ class RethinkDbRepository(Repository):
             pass
 
     async def create_job(self, job: JobInternal) -> JobWithResults:
+        # JobWithResults adds the entries_processed field, which is not part of JobInternal. We
+        # store it in the job document (together with num_entries_processed) and keep it up to date
+        # in upsert_results.
+        new_job = JobWithResults(**job.model_dump())
+
         result = await self._run(
-            self.r.table("jobs").insert(job.model_dump(), conflict="error", return_changes=False)
+            self.r.table("jobs").insert(
+                new_job.model_dump(), conflict="error", return_changes=False
+            ),
+            "create_job",
         )
 
         if result["errors"] > 0:
@@ -348,8 +453,7 @@ class RethinkDbRepository(Repository):
 
             raise Exception(f"Failed to create job: {first_error}")
 
-        # JobWithResults adds the entries_processed field, which is not part of JobInternal.
-        return JobWithResults(**job.model_dump())
+        return new_job
 
     async def update_job(self, job_update: JobUpdate) -> JobInternal:
         # all fields can be updated in a single query
@@ -368,7 +472,8 @@ class RethinkDbRepository(Repository):
 
         # update the job in the database
         changes = await self._run(
-            self.r.table("jobs").get(job_update.id).update(update_set, return_changes="always")
+            self.r.table("jobs").get(job_update.id).update(update_set, return_changes="always"),
+            "update_job",
         )
 
         updated_job = changes["changes"][0]["new_val"] if len(changes["changes"]) > 0 else None
@@ -378,6 +483,66 @@ class RethinkDbRepository(Repository):
 
         return JobInternal(**updated_job)
 
+    def _with_progress(self, job):
+        # Jobs created before the progress was materialized in the job document do not contain
+        # the field entries_processed. For those jobs, we aggregate all processed entries from the
+        # results table.
+        return self.r.branch(
+            job.has_fields("entries_processed"),
+            job,
+            job.merge(
+                {
+                    "entries_processed": self.r.table("results")
+                    .get_all(job["id"], index="job_id")
+                    .pluck("mol_id")
+                    .map(lambda row: row["mol_id"])
+                    .distinct()
+                    .coerce_to("array")
+                }
+            ),
+        )
+
+    def _merge_progress(self, job, intervals):
+        # merge a sorted list of (half-open) intervals into the progress of the job
+        merged = (
+            job["entries_processed"]
+            .union(intervals)
+            .order_by(lambda interval: interval.nth(0))
+            .fold(
+                [],
+                lambda acc, interval: self.r.branch(
+                    acc.is_empty().not_() & (acc.nth(-1).nth(1) >= interval.nth(0)),
+                    acc.slice(0, -1).append(
+                        [
+                            acc.nth(-1).nth(0),
+                            self.r.expr([acc.nth(-1).nth(1), interval.nth(1)]).max(),
+                        ]
+                    ),
+                    acc.append(interval),
+                ),
+            )
+        )
+
+        return self.r.branch(
+            # * skip jobs without materialized progress (see _with_progress)
+            # * the progress is frozen as soon as the job is done (same rule as
+            #   JobWithResults.is_done, i.e. a job without num_entries_total is never done)
+            job.has_fields("entries_processed").not_()
+            | (
+                job["status"].eq("completed")
+                & job["num_entries_processed"].default(0).eq(job["num_entries_total"].default(None))
+            ),
+            {},
+            merged.do(
+                lambda entries_processed: {
+                    "entries_processed": entries_processed,
+                    "num_entries_processed": entries_processed.map(
+                        lambda interval: interval.nth(1) - interval.nth(0)
+                    ).sum(),
+                }
+            ),
+        )
+
     async def get_job_by_id(self, job_id: str) -> JobWithResults:
         result = await self._run(
             self.r.table("jobs")
@@ -386,18 +551,10 @@ class RethinkDbRepository(Repository):
                 lambda job: self.r.branch(
                     job.eq(None),  # check if job exists
                     None,
-                    job.merge(
-                        {
-                            "entries_processed": self.r.table("results")
-                            .get_all(job["id"], index="job_id")
-                            .pluck("mol_id")
-                            .map(lambda row: row["mol_id"])
-                            .distinct()
-                            .coerce_to("array")
-                        }
-                    ),
+                    self._with_progress(job),
                 )
-            )
+            ),
+            "get_job_by_id",
         )
 
         if result is None:
@@ -405,8 +562,48 @@ class RethinkDbRepository(Repository):
 
         return JobWithResults(**result)
 
+    async def get_job_internal(self, job_id: str) -> JobInternal:
+        # do not transfer the progress of the job (which might be large)
+        result = await self._run(
+            self.r.table("jobs")
+            .get(job_id)
+            .do(
+                lambda job: self.r.branch(
+                    job.eq(None),
+                    None,
+                    job.without("entries_processed", "num_entries_processed"),
+                )
+            ),
+            "get_job_internal",
+        )
+
+        if result is None:
+            raise RecordNotFoundError(Job, job_id)
+
+        return JobInternal(**result)
+
+    async def get_jobs_by_ids(
+        self, job_ids: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        if len(job_ids) == 0:
+            return []
+
+        if fields is None:
+            fields = list(JobInternal.model_fields)
+
+        items = await self._run(
+            self.r.table("jobs").get_all(*job_ids).pluck(*fields), "get_jobs_by_ids"
+        )
+        return items
+
     async def delete_job_by_id(self, job_id: str) -> None:
-        await self._run(self.r.table("jobs").get(job_id).delete())
+        await self._run(self.r.table("jobs").get(job_id).delete(), "delete_job_by_id")
+
+    async def delete_jobs_by_ids(self, job_ids: List[str]) -> None:
+        if len(job_ids) == 0:
+            return
+
+        await self._run(self.r.table("jobs").get_all(*job_ids).delete(), "delete_jobs_by_ids")
 
     async def get_jobs_by_status(
         self,
@@ -417,34 +614,37 @@ class RethinkDbRepository(Repository):
         if isinstance(status, str):
             status = [status]
 
-        cursor = await self._run(
+        # there is nothing to merge if no status is requested
+        if len(status) == 0:
+            return
+
+        # one range query per status (ordered by created_at)
+        queries = [
             self.r.table("jobs")
-            .get_all(*status, index="status")
-            .filter(self.r.row["job_type"] == module_id)
-            .filter((self.r.row["created_at"] < deadline) if deadline is not None else True)
-            .map(
-                lambda job: job.merge(
-                    {
-                        "entries_processed": self.r.table("results")
-                        .get_all(job["id"], index="job_id")
-                        .pluck("mol_id")
-                        .map(lambda row: row["mol_id"])
-                        .distinct()
-                        .coerce_to("array")
-                    }
-                )
+            .between(
+                [s, module_id, self.r.minval],
+                [s, module_id, deadline if deadline is not None else self.r.maxval],
+                index="status_job_type_created_at",
             )
-        )
+            .order_by(index="status_job_type_created_at")
+            for s in status
+        ]
 
-        async for item in cursor:
+        # merge the (sorted) results of all queries by created_at
+        query = queries[0]
+        if len(queries) > 1:
+            query = query.union(*queries[1:], interleave="created_at")
+
+        async for item in self._iter(query.map(self._with_progress), "get_jobs_by_status"):
             yield JobWithResults(**item)
 
     async def get_expired_jobs(self, deadline: datetime) -> AsyncIterable[JobInternal]:
-        cursor = await self._run(
-            self.r.table("jobs").filter(lambda job: job["created_at"] < deadline)
-        )
-
-        async for item in cursor:
+        async for item in self._iter(
+            self.r.table("jobs")
+            .between(self.r.minval, deadline, index="created_at")
+            .order_by(index="created_at"),
+            "get_expired_jobs",
+        ):
             yield JobInternal(**item)
 
     #
@@ -460,7 +660,8 @@ class RethinkDbRepository(Repository):
         result = await self._run(
             self.r.table("sources").insert(
                 source.model_dump(), conflict="error", return_changes=True
-            )
+            ),
+            "create_source",
         )
 
         if result["errors"] > 0:
@@ -473,22 +674,43 @@ class RethinkDbRepository(Repository):
         return Source(**result["changes"][0]["new_val"])
 
     async def get_source_by_id(self, source_id: str) -> Source:
-        result = await self._run(self.r.table("sources").get(source_id))
+        result = await self._run(self.r.table("sources").get(source_id), "get_source_by_id")
 
         if result is None:
             raise RecordNotFoundError(Source, source_id)
 
         return Source(**result)
 
+    async def get_sources_by_ids(self, source_ids: List[str]) -> List[Source]:
+        if len(source_ids) == 0:
+            return []
+
+        items = await self._run(self.r.table("sources").get_all(*source_ids), "get_sources_by_ids")
+        return [Source(**item) for item in items]
+
     async def delete_source_by_id(self, source_id: str) -> None:
-        await self._run(self.r.table("sources").get(source_id).delete())
+        result = await self._run(
+            self.r.table("sources").get(source_id).delete(), "delete_source_by_id"
+        )
 
-    async def get_expired_sources(self, deadline: datetime) -> AsyncIterable[Source]:
-        cursor = await self._run(
-            self.r.table("sources").filter(lambda source: source["created_at"] < deadline)
+        if result["deleted"] == 0:
+            raise RecordNotFoundError(Source, source_id)
+
+    async def delete_sources_by_ids(self, source_ids: List[str]) -> None:
+        if len(source_ids) == 0:
+            return
+
+        await self._run(
+            self.r.table("sources").get_all(*source_ids).delete(), "delete_sources_by_ids"
         )
 
-        async for item in cursor:
+    async def get_expired_sources(self, deadline: datetime) -> AsyncIterable[Source]:
+        async for item in self._iter(
+            self.r.table("sources")
+            .between(self.r.minval, deadline, index="created_at")
+            .order_by(index="created_at"),
+            "get_expired_sources",
+        ):
             yield Source(**item)
 
     #
@@ -501,8 +723,17 @@ class RethinkDbRepository(Repository):
             pass
 
     async def get_all_results_by_job_id(self, job_id: str) -> List[Result]:
-        cursor = await self._run(self.r.table("results").get_all(job_id, index="job_id"))
-        return [Result(**item) async for item in cursor]
+        return [result async for batch in self.iter_results_by_job_id(job_id) for result in batch]
+
+    def _results_between(self, job_id: str, start_mol_id: Optional[int], end_mol_id: Optional[int]):
+        # select the results of a job with start_mol_id <= mol_id <= end_mol_id using the compound
+        # index [job_id, mol_id] (only the selected rows are read)
+        return self.r.table("results").between(
+            [job_id, start_mol_id if start_mol_id is not None else self.r.minval],
+            [job_id, end_mol_id if end_mol_id is not None else self.r.maxval],
+            index="job_id_mol_id",
+            right_bound="closed",
+        )
 
     async def get_results_by_job_id(
         self,
@@ -510,51 +741,109 @@ class RethinkDbRepository(Repository):
         start_mol_id: Optional[int] = None,
         end_mol_id: Optional[int] = None,
     ) -> List[Result]:
-        start_condition = (
-            (self.r.row["mol_id"] >= start_mol_id) if start_mol_id is not None else True
+        items = await self._run(
+            self._results_between(job_id, start_mol_id, end_mol_id).order_by(index="job_id_mol_id"),
+            "get_results_by_job_id",
         )
-        end_condition = (self.r.row["mol_id"] <= end_mol_id) if end_mol_id is not None else True
 
-        cursor = await self._run(
-            self.r.table("results")
-            .get_all(job_id, index="job_id")
-            .filter(start_condition & end_condition)
-            .order_by("mol_id")
-        )
-
-        if cursor is None:
-            raise RecordNotFoundError(Result, job_id)
+        return [Result(**item) for item in items]
 
-        return [Result(**item) for item in cursor]
+    async def iter_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterable[List[Result]]:
+        # The cursor fetches the results lazily from the server (at most batch_size rows per
+        # request). The connection is held until the cursor is exhausted. We use a connection of the
+        # changefeed pool so that long reads do not block the pool of short queries.
+        async with self._get_connection() as connection:
+            cursor = await (
+                self._results_between(job_id, start_mol_id, end_mol_id)
+                .order_by(index="job_id_mol_id")
+                .run(
+                    connection,
+                    max_batch_rows=batch_size,
+                    **self._get_run_options("iter_results_by_job_id"),
+                )
+            )
 
-    async def upsert_results(self, results: List[Result]) -> None:
+            try:
+                batch = []
+                async for item in cursor:
+                    batch.append(Result(**item))
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+
+                if len(batch) > 0:
+                    yield batch
+            finally:
+                await cursor.close()
+
+    async def upsert_results(self, results: List[Result]) -> UpsertSummary:
+        # Update the materialized progress of all affected jobs. Each document update is atomic in
+        # RethinkDB, so concurrent batches for the same job can not overwrite each other.
+        mol_ids_by_job = {}
+        for result in results:
+            mol_ids_by_job.setdefault(result.job_id, []).append(result.mol_id)
+
+        progress_updates = [
+            {"job_id": job_id, "intervals": CompressedSet(mol_ids).to_intervals()}
+            for job_id, mol_ids in mol_ids_by_job.items()
+        ]
+
+        # The results are inserted and the progress is updated in a single query (i.e. a client
+        # that fails or is cancelled can not leave one of them undone). Note that RethinkDB has no
+        # transactions across documents: if the server fails in between, the results are stored
+        # without the progress. Redelivered results repair the progress in that case.
         changes = await self._run(
-            self.r.table("results").insert(
+            self.r.table("results")
+            .insert(
                 [result.model_dump() for result in results],
-                conflict="replace",
+                # Keep the stored document if the content is identical (e.g. redelivered results).
+                # In this case, RethinkDB reports the document as unchanged and does not emit a
+                # change.
+                conflict=lambda _, old, new: self.r.branch(old.eq(new), old, new),
                 return_changes=False,
             )
+            .do(
+                lambda changes: self.r.branch(
+                    changes["errors"].eq(0),
+                    self.r.expr(progress_updates)
+                    .for_each(
+                        lambda update: (
+                            self.r.table("jobs")
+                            .get(update["job_id"])
+                            .update(lambda job: self._merge_progress(job, update["intervals"]))
+                        )
+                    )
+                    .do(lambda _: changes),
+                    changes,
+                )
+            ),
+            "upsert_results",
         )
 
         if changes["errors"] > 0:
             raise Exception(f"Failed to upsert results: {changes['first_error']}")
 
+        return UpsertSummary(
+            num_inserted=changes["inserted"],
+            num_updated=changes["replaced"],
+            num_skipped=changes["unchanged"],
+        )
+
     async def get_result_changes(
         self,
         job_id: str,
         start_mol_id: Optional[int] = None,
         end_mol_id: Optional[int] = None,
     ) -> AsyncIterable[Tuple[Optional[Result], Optional[Result]]]:
-        start_condition = (
-            (self.r.row["mol_id"] >= start_mol_id) if start_mol_id is not None else True
-        )
-        end_condition = (self.r.row["mol_id"] <= end_mol_id) if end_mol_id is not None else True
-
         async with self._get_connection() as connection:
             cursor = (
-                await self.r.table("results")
-                .get_all(job_id, index="job_id")
-                .filter(start_condition & end_condition)
+                await self._results_between(job_id, start_mol_id, end_mol_id)
                 .changes(include_initial=True)
                 .run(connection)
             )
@@ -573,7 +862,10 @@ class RethinkDbRepository(Repository):
                 yield old_result, new_result
 
     async def delete_results_by_job_id(self, job_id: str) -> None:
-        await self._run(self.r.table("results").get_all(job_id, index="job_id").delete())
+        await self._run(
+            self.r.table("results").get_all(job_id, index="job_id").delete(),
+            "delete_results_by_job_id",
+        )
 
     #
     # CHECKPOINTS
@@ -588,7 +880,8 @@ class RethinkDbRepository(Repository):
         result = await self._run(
             self.r.table("checkpoints").insert(
                 checkpoint.model_dump(), conflict="error", return_changes=True
-            )
+            ),
+            "create_result_checkpoint",
         )
 
         if result["errors"] > 0:
@@ -604,7 +897,8 @@ class RethinkDbRepository(Repository):
         result = await self._run(
             self.r.table("checkpoints")
             .get(checkpoint.id)
-            .update(checkpoint.model_dump(), return_changes="always")
+            .update(checkpoint.model_dump(), return_changes="always"),
+            "update_result_checkpoint",
         )
 
         if result["changes"] is None or len(result["changes"]) == 0:
@@ -612,18 +906,47 @@ class RethinkDbRepository(Repository):
 
         return ResultCheckpoint(**result["changes"][0]["new_val"])
 
+    async def update_result_checkpoints(
+        self, checkpoints: List[ResultCheckpoint]
+    ) -> List[ResultCheckpoint]:
+        if len(checkpoints) == 0:
+            return []
+
+        # update all checkpoints in one query: each existing checkpoint looks up its new values
+        # in a map from checkpoint id to checkpoint
+        updates = self.r.expr({c.id: c.model_dump() for c in checkpoints})
+        result = await self._run(
+            self.r.table("checkpoints")
+            .get_all(*[c.id for c in checkpoints])
+            .update(lambda checkpoint: updates[checkpoint["id"]], return_changes="always"),
+            "update_result_checkpoints",
+        )
+
+        return [
+            ResultCheckpoint(**change["new_val"])
+            for change in result["changes"]
+            if change.get("new_val") is not None
+        ]
+
     async def get_result_checkpoints_by_job_id(self, job_id: str) -> List[ResultCheckpoint]:
-        cursor = await self._run(self.r.table("checkpoints").get_all(job_id, index="job_id"))
-        return [ResultCheckpoint(**item) async for item in cursor]
+        items = await self._run(
+            self.r.table("checkpoints").get_all(job_id, index="job_id"),
+            "get_result_checkpoints_by_job_id",
+        )
+        return [ResultCheckpoint(**item) for item in items]
 
     async def get_result_checkpoints_by_module_id(self, module_id: str) -> List[ResultCheckpoint]:
-        cursor = await self._run(
-            self.r.table("checkpoints").filter(self.r.row["job_type"] == module_id)
+        items = await self._run(
+            self.r.table("checkpoints").filter(self.r.row["job_type"] == module_id),
+            "get_result_checkpoints_by_module_id",
         )
-        return [ResultCheckpoint(**item) async for item in cursor]
+        return [ResultCheckpoint(**item) for item in items]
 
     async def delete_result_checkpoints_by_job_id(self, job_id: str) -> None:
-        await self._run(self.r.table("checkpoints").get_all(job_id, index="job_id").delete())
+        await self._run(
+            self.r.table("checkpoints").get_all(job_id, index="job_id").delete(),
+            "delete_result_checkpoints_by_job_id",
+        )
 
     #
     # USERS
@@ -635,19 +958,21 @@ class RethinkDbRepository(Repository):
             pass
 
     async def get_user_by_ip_address(self, ip_address: str) -> AnonymousUser:
-        result = await self._run(self.r.table("users").get_all(ip_address, index="ip_address"))
+        result = await self._run(
+            self.r.table("users").get_all(ip_address, index="ip_address"), "get_user_by_ip_address"
+        )
 
         if result is None:
             raise RecordNotFoundError(AnonymousUser, ip_address)
 
-        users = [AnonymousUser(**item) async for item in result]
+        users = [AnonymousUser(**item) for item in result]
         if len(users) == 0:
             raise RecordNotFoundError(AnonymousUser, ip_address)
 
         return users[0]
 
     async def get_user_by_id(self, user_id: str) -> User:
-        result = await self._run(self.r.table("users").get(user_id))
+        result = await self._run(self.r.table("users").get(user_id), "get_user_by_id")
 
         if result is None:
             raise RecordNotFoundError(User, user_id)
@@ -659,7 +984,8 @@ class RethinkDbRepository(Repository):
 
     async def create_user(self, user: User) -> User:
         result = await self._run(
-            self.r.table("users").insert(user.model_dump(), conflict="error", return_changes=True)
+            self.r.table("users").insert(user.model_dump(), conflict="error", return_changes=True),
+            "create_user",
         )
 
         if result["errors"] > 0:
@@ -672,14 +998,17 @@ class RethinkDbRepository(Repository):
         return user
 
     async def get_recent_jobs_by_user(self, user, num_seconds):
-        cursor = await self._run(
-            self.r.table("jobs").filter(
-                (self.r.row["user_id"] == user.id)
-                & (self.r.row["created_at"] > self.r.now().sub(num_seconds))
-            )
+        items = await self._run(
+            self.r.table("jobs").between(
+                [user.id, self.r.now().sub(num_seconds)],
+                [user.id, self.r.maxval],
+                index="user_id_created_at",
+                left_bound="open",
+            ),
+            "get_recent_jobs_by_user",
         )
 
-        return [JobInternal(**item) async for item in cursor]
+        return [JobInternal(**item) for item in items]
 
     #
     # CHALLENGES
@@ -694,7 +1023,8 @@ class RethinkDbRepository(Repository):
         result = await self._run(
             self.r.table("challenges").insert(
                 challenge.model_dump(), conflict="error", return_changes=True
-            )
+            ),
+            "create_challenge",
         )
 
         if result["errors"] > 0:
@@ -708,20 +1038,23 @@ class RethinkDbRepository(Repository):
 
     async def get_challenge_by_salt(self, salt: str) -> Challenge:
         result = await self._run(
-            self.r.table("challenges").filter(lambda challenge: challenge["salt"] == salt)
+            self.r.table("challenges").filter(lambda challenge: challenge["salt"] == salt),
+            "get_challenge_by_salt",
         )
 
         if result is None:
             raise RecordNotFoundError(Challenge, salt)
 
-        challenges = [Challenge(**item) async for item in result]
+        challenges = [Challenge(**item) for item in result]
         if len(challenges) == 0:
             raise RecordNotFoundError(Challenge, salt)
 
         return challenges[0]
 
     async def delete_challenge_by_id(self, id: str) -> None:
-        result = await self._run(self.r.table("challenges").get(id).delete())
+        result = await self._run(
+            self.r.table("challenges").get(id).delete(), "delete_challenge_by_id"
+        )
 
         if result["deleted"] == 0:
             raise RecordNotFoundError(Challenge, id)
@@ -730,5 +1063,6 @@ class RethinkDbRepository(Repository):
         await self._run(
             self.r.table("challenges")
             .filter(lambda challenge: challenge["expires_at"] < deadline)
-            .delete()
+            .delete(),
+            "delete_expired_challenges",
         )
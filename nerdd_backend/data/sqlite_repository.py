@@ -0,0 +1,879 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional, Tuple
+
+from ..models import (
+    AnonymousUser,
+    Challenge,
+    Job,
+    JobInternal,
+    JobStatus,
+    JobUpdate,
+    JobWithResults,
+    ModuleInternal,
+    ProgressEncoding,
+    Result,
+    ResultCheckpoint,
+    Source,
+    UpsertSummary,
+    User,
+    UserType,
+)
+from .change_router import ChangeRouter
+from .exceptions import RecordAlreadyExistsError, RecordNotFoundError
+from .repository import Repository
+
+__all__ = ["SqliteRepository"]
+
+logger = logging.getLogger(__name__)
+
+# Every record is stored as json document (column data). Fields that are used for lookups are
+# duplicated into separate (indexed) columns. Timestamps are stored as seconds since the epoch.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_id TEXT,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_job_type_created_at ON jobs (status, job_type, created_at);
+CREATE INDEX IF NOT EXISTS jobs_user_id_created_at ON jobs (user_id, created_at);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+
+CREATE TABLE IF NOT EXISTS sources (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_created_at ON sources (created_at);
+
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    mol_id INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_job_id_mol_id ON results (job_id, mol_id, id);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    id TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    job_type TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checkpoints_job_id ON checkpoints (job_id);
+CREATE INDEX IF NOT EXISTS checkpoints_job_type ON checkpoints (job_type);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    ip_address TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_ip_address ON users (ip_address);
+
+CREATE TABLE IF NOT EXISTS challenges (
+    id TEXT PRIMARY KEY,
+    salt TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS challenges_salt ON challenges (salt);
+CREATE INDEX IF NOT EXISTS challenges_expires_at ON challenges (expires_at);
+"""
+
+# SQLite limits the number of parameters in a single statement
+_MAX_PARAMETERS = 500
+
+Changes = List[Tuple[ChangeRouter, Tuple[Any, Any]]]
+
+
+def _dump(record) -> str:
+    return json.dumps(record.model_dump(mode="json"))
+
+
+def _chunks(items: List[Any], size: int = _MAX_PARAMETERS):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class SqliteRepository(Repository):
+    """
+    Repository on an embedded SQLite database (in WAL mode) for single-node deployments.
+
+    All writes are executed (each in its own transaction) by a dedicated writer thread, reads are
+    executed concurrently by a small pool of reader threads. Since all writes go through this
+    process, changes are published to in-process subscriptions (see ChangeRouter) after each
+    commit. That means that multiple processes must not share the same database file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        num_readers: int = 4,
+        changefeed_queue_size: int = 100_000,
+        progress_encoding: ProgressEncoding = "intervals",
+    ) -> None:
+        self.path = path
+        self.num_readers = num_readers
+        # both encodings are always readable, this only affects how the progress is written
+        self.progress_encoding = progress_encoding
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+
+        # in-process change notifications
+        self._module_changes = ChangeRouter[ModuleInternal](changefeed_queue_size)
+        self._job_changes = ChangeRouter[JobWithResults](changefeed_queue_size)
+        self._job_changes.add_route("id", lambda job: job.id)
+        self._result_changes = ChangeRouter[Result](changefeed_queue_size)
+        self._result_changes.add_route(
+            "job_id_mol_id", lambda result: result.job_id, lambda result: result.mol_id
+        )
+
+    #
+    # INITIALIZATION
+    #
+    async def initialize(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._readers = ThreadPoolExecutor(
+            max_workers=self.num_readers, thread_name_prefix="sqlite-reader"
+        )
+
+        def _create_schema(connection: sqlite3.Connection) -> None:
+            connection.executescript(_SCHEMA)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, lambda: _create_schema(self._get_connection()))
+
+    async def close(self) -> None:
+        # waiting for running queries (and closing the connections) blocks -> use a thread to keep
+        # the event loop responsive
+        for executor in [self._writer, self._readers]:
+            if executor is not None:
+                await asyncio.to_thread(executor.shutdown, True)
+        self._writer = None
+        self._readers = None
+
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            await asyncio.to_thread(connection.close)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            changefeeds=dict(
+                modules=self._module_changes.get_stats(),
+                jobs=self._job_changes.get_stats(),
+                results=self._result_changes.get_stats(),
+            )
+        )
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # each thread (writer and readers) uses its own connection
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False, timeout=30
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # in WAL mode, synchronous=NORMAL is safe against corruption (a power loss might roll
+            # back the last transactions though)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    async def _read(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, lambda: fn(self._get_connection(), *args))
+
+    async def _write(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # fn receives a list to collect the changes, which are published after the commit
+        loop = asyncio.get_running_loop()
+
+        def _transaction():
+            connection = self._get_connection()
+            changes: Changes = []
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(connection, changes, *args)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+            # Callbacks are executed in the order they were scheduled, i.e. changes are published
+            # in commit order (and before the caller of _write continues).
+            if len(changes) > 0:
+                loop.call_soon_threadsafe(self._publish, changes)
+
+            return result
+
+        return await loop.run_in_executor(self._writer, _transaction)
+
+    def _publish(self, changes: Changes) -> None:
+        for router, change in changes:
+            router.publish(change)
+
+    #
+    # MODULES
+    #
+    def get_module_changes(
+        self,
+    ) -> AsyncIterable[Tuple[Optional[ModuleInternal], Optional[ModuleInternal]]]:
+        return self._module_changes.changes(initial=self.get_all_modules)
+
+    async def get_all_modules(self) -> List[ModuleInternal]:
+        def _get_all_modules(connection):
+            return connection.execute("SELECT data FROM modules").fetchall()
+
+        rows = await self._read(_get_all_modules)
+        return [ModuleInternal(**json.loads(data)) for (data,) in rows]
+
+    async def get_module_by_id(self, module_id: str) -> ModuleInternal:
+        def _get_module(connection):
+            return connection.execute(
+                "SELECT data FROM modules WHERE id = ?", (module_id,)
+            ).fetchone()
+
+        row = await self._read(_get_module)
+        if row is None:
+            raise RecordNotFoundError(ModuleInternal, module_id)
+
+        return ModuleInternal(**json.loads(row[0]))
+
+    async def create_module(self, module: ModuleInternal) -> ModuleInternal:
+        def _create_module(connection, changes):
+            try:
+                connection.execute(
+                    "INSERT INTO modules (id, data) VALUES (?, ?)", (module.id, _dump(module))
+                )
+            except sqlite3.IntegrityError as e:
+                raise RecordAlreadyExistsError(ModuleInternal, module.id) from e
+            changes.append((self._module_changes, (None, module)))
+
+        await self._write(_create_module)
+        return module
+
+    async def update_module(self, module: ModuleInternal) -> ModuleInternal:
+        def _update_module(connection, changes):
+            row = connection.execute(
+                "SELECT data FROM modules WHERE id = ?", (module.id,)
+            ).fetchone()
+            if row is None:
+                raise RecordNotFoundError(ModuleInternal, module.id)
+
+            connection.execute(
+                "UPDATE modules SET data = ? WHERE id = ?", (_dump(module), module.id)
+            )
+            old_module = ModuleInternal(**json.loads(row[0]))
+            changes.append((self._module_changes, (old_module, module)))
+
+        await self._write(_update_module)
+        return module
+
+    #
+    # JOBS
+    #
+    async def get_job_with_result_changes(
+        self, job_id: str
+    ) -> AsyncIterable[Tuple[Optional[JobWithResults], Optional[JobWithResults]]]:
+        # Same as Repository.get_job_with_result_changes, but the job is read *after* subscribing
+        # to its changes (reading the job involves a thread switch and we might miss a change
+        # otherwise).
+        async def _get_job():
+            return [await self.get_job_by_id(job_id)]
+
+        job = None
+        async for _, new_job in self._job_changes.changes("id", job_id, initial=_get_job):
+            if new_job is None:
+                # job was deleted -> exit the loop
+                break
+
+            yield job, new_job
+            job = new_job
+
+            if job.is_done():
+                # job is completed, we can exit the loop
+                break
+
+    def get_job_changes(
+        self, job_id: str
+    ) -> AsyncIterable[Tuple[Optional[JobInternal], Optional[JobInternal]]]:
+        return self._job_changes.changes("id", job_id)
+
+    def _get_job(self, connection, job_id: str) -> Optional[JobWithResults]:
+        row = connection.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return JobWithResults(**json.loads(row[0]))
+
+    def _dump_job(self, job: JobWithResults) -> str:
+        data = job.model_dump(mode="json")
+        if self.progress_encoding == "compact":
+            data["entries_processed"] = job.entries_processed.to_base64()
+        return json.dumps(data)
+
+    def _put_job(self, connection, job: JobWithResults, insert: bool = False) -> None:
+        values = (
+            job.job_type,
+            job.status,
+            job.user_id,
+            job.created_at.timestamp(),
+            self._dump_job(job),
+            job.id,
+        )
+        if insert:
+            connection.execute(
+                "INSERT INTO jobs (job_type, status, user_id, created_at, data, id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                values,
+            )
+        else:
+            connection.execute(
+                "UPDATE jobs SET job_type = ?, status = ?, user_id = ?, created_at = ?, data = ? "
+                "WHERE id = ?",
+                values,
+            )
+
+    async def create_job(self, job: JobInternal) -> JobWithResults:
+        new_job = JobWithResults(**job.model_dump())
+
+        def _create_job(connection, changes):
+            try:
+                self._put_job(connection, new_job, insert=True)
+            except sqlite3.IntegrityError as e:
+                raise RecordAlreadyExistsError(JobInternal, job.id) from e
+            changes.append((self._job_changes, (None, new_job)))
+
+        await self._write(_create_job)
+        return new_job
+
+    async def update_job(self, job_update: JobUpdate) -> JobInternal:
+        def _update_job(connection, changes):
+            existing_job = self._get_job(connection, job_update.id)
+            if existing_job is None:
+                raise RecordNotFoundError(Job, job_update.id)
+
+            modified_job = JobWithResults(**existing_job.model_dump())
+            if job_update.status is not None:
+                modified_job.status = job_update.status
+            if job_update.num_entries_total is not None:
+                modified_job.num_entries_total = job_update.num_entries_total
+            if job_update.num_checkpoints_total is not None:
+                modified_job.num_checkpoints_total = job_update.num_checkpoints_total
+            if job_update.new_output_formats is not None:
+                modified_job.output_formats = list(
+                    dict.fromkeys(modified_job.output_formats + job_update.new_output_formats)
+                )
+
+            self._put_job(connection, modified_job)
+            changes.append((self._job_changes, (existing_job, modified_job)))
+            return modified_job
+
+        return await self._write(_update_job)
+
+    async def get_job_by_id(self, job_id: str) -> JobWithResults:
+        job = await self._read(self._get_job, job_id)
+        if job is None:
+            raise RecordNotFoundError(Job, job_id)
+        return job
+
+    async def get_job_internal(self, job_id: str) -> JobInternal:
+        jobs = await self.get_jobs_by_ids([job_id])
+        if len(jobs) == 0:
+            raise RecordNotFoundError(Job, job_id)
+        return JobInternal(**jobs[0])
+
+    async def get_jobs_by_ids(
+        self, job_ids: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        if fields is None:
+            fields = list(JobInternal.model_fields)
+
+        def _get_jobs(connection):
+            rows = []
+            for chunk in _chunks(job_ids):
+                # do not parse the progress of the job (which might be large)
+                rows.extend(
+                    connection.execute(
+                        "SELECT json_remove(data, '$.entries_processed') FROM jobs "
+                        f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                )
+            return rows
+
+        rows = await self._read(_get_jobs)
+        jobs = [json.loads(data) for (data,) in rows]
+        return [{field: job[field] for field in fields if field in job} for job in jobs]
+
+    async def delete_job_by_id(self, job_id: str) -> None:
+        def _delete_job(connection, changes):
+            job = self._get_job(connection, job_id)
+            if job is not None:
+                connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+                changes.append((self._job_changes, (job, None)))
+
+        await self._write(_delete_job)
+
+    async def delete_jobs_by_ids(self, job_ids: List[str]) -> None:
+        def _delete_jobs(connection, changes):
+            for chunk in _chunks(job_ids):
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT data FROM jobs WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                connection.execute(f"DELETE FROM jobs WHERE id IN ({placeholders})", chunk)
+                for (data,) in rows:
+                    changes.append((self._job_changes, (JobWithResults(**json.loads(data)), None)))
+
+        await self._write(_delete_jobs)
+
+    async def get_jobs_by_status(
+        self,
+        module_id: str,
+        status: List[JobStatus] | JobStatus,
+        deadline: Optional[datetime] = None,
+    ) -> AsyncIterable[JobWithResults]:
+        if isinstance(status, str):
+            status = [status]
+
+        # note: the deadline is an exclusive upper bound (as in RethinkDbRepository)
+        def _get_jobs(connection):
+            return connection.execute(
+                "SELECT data FROM jobs "
+                f"WHERE status IN ({', '.join('?' * len(status))}) AND job_type = ? "
+                "AND created_at < ? ORDER BY created_at",
+                (
+                    *status,
+                    module_id,
+                    deadline.timestamp() if deadline is not None else float("inf"),
+                ),
+            ).fetchall()
+
+        for (data,) in await self._read(_get_jobs):
+            yield JobWithResults(**json.loads(data))
+
+    async def get_expired_jobs(self, deadline: datetime) -> AsyncIterable[JobInternal]:
+        def _get_jobs(connection):
+            return connection.execute(
+                "SELECT data FROM jobs WHERE created_at < ? ORDER BY created_at",
+                (deadline.timestamp(),),
+            ).fetchall()
+
+        for (data,) in await self._read(_get_jobs):
+            yield JobInternal(**json.loads(data))
+
+    #
+    # SOURCES
+    #
+    async def create_source(self, source: Source) -> Source:
+        def _create_source(connection, changes):
+            try:
+                connection.execute(
+                    "INSERT INTO sources (id, created_at, data) VALUES (?, ?, ?)",
+                    (source.id, source.created_at.timestamp(), _dump(source)),
+                )
+            except sqlite3.IntegrityError as e:
+                raise RecordAlreadyExistsError(Source, source.id) from e
+
+        await self._write(_create_source)
+        return source
+
+    async def get_source_by_id(self, source_id: str) -> Source:
+        def _get_source(connection):
+            return connection.execute(
+                "SELECT data FROM sources WHERE id = ?", (source_id,)
+            ).fetchone()
+
+        row = await self._read(_get_source)
+        if row is None:
+            raise RecordNotFoundError(Source, source_id)
+
+        return Source(**json.loads(row[0]))
+
+    async def get_sources_by_ids(self, source_ids: List[str]) -> List[Source]:
+        def _get_sources(connection):
+            rows = []
+            for chunk in _chunks(source_ids):
+                rows.extend(
+                    connection.execute(
+                        f"SELECT data FROM sources WHERE id IN ({', '.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                )
+            return rows
+
+        return [Source(**json.loads(data)) for (data,) in await self._read(_get_sources)]
+
+    async def delete_source_by_id(self, source_id: str) -> None:
+        def _delete_source(connection, changes):
+            cursor = connection.execute("DELETE FROM sources WHERE id = ?", (source_id,))
+            if cursor.rowcount == 0:
+                raise RecordNotFoundError(Source, source_id)
+
+        await self._write(_delete_source)
+
+    async def delete_sources_by_ids(self, source_ids: List[str]) -> None:
+        def _delete_sources(connection, changes):
+            for chunk in _chunks(source_ids):
+                connection.execute(
+                    f"DELETE FROM sources WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+
+        await self._write(_delete_sources)
+
+    async def get_expired_sources(self, deadline: datetime) -> AsyncIterable[Source]:
+        def _get_sources(connection):
+            return connection.execute(
+                "SELECT data FROM sources WHERE created_at < ? ORDER BY created_at",
+                (deadline.timestamp(),),
+            ).fetchall()
+
+        for (data,) in await self._read(_get_sources):
+            yield Source(**json.loads(data))
+
+    #
+    # RESULTS
+    #
+    async def get_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+    ) -> List[Result]:
+        def _get_results(connection):
+            return connection.execute(
+                "SELECT data FROM results WHERE job_id = ? AND mol_id BETWEEN ? AND ? "
+                "ORDER BY mol_id, id",
+                (
+                    job_id,
+                    start_mol_id if start_mol_id is not None else -(2**63),
+                    end_mol_id if end_mol_id is not None else 2**63 - 1,
+                ),
+            ).fetchall()
+
+        return [Result(**json.loads(data)) for (data,) in await self._read(_get_results)]
+
+    async def iter_results_by_job_id(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterable[List[Result]]:
+        # keyset pagination on the index (job_id, mol_id, id), i.e. each batch is a separate
+        # query that continues after the last row of the previous batch
+        def _get_batch(connection, last_mol_id, last_id):
+            return connection.execute(
+                "SELECT mol_id, id, data FROM results "
+                "WHERE job_id = ? AND (mol_id > ? OR (mol_id = ? AND id > ?)) AND mol_id <= ? "
+                "ORDER BY mol_id, id LIMIT ?",
+                (
+                    job_id,
+                    last_mol_id,
+                    last_mol_id,
+                    last_id,
+                    end_mol_id if end_mol_id is not None else 2**63 - 1,
+                    batch_size,
+                ),
+            ).fetchall()
+
+        last_mol_id = start_mol_id - 1 if start_mol_id is not None else -(2**63)
+        last_id = ""
+        while True:
+            rows = await self._read(_get_batch, last_mol_id, last_id)
+            if len(rows) == 0:
+                break
+
+            yield [Result(**json.loads(data)) for (_, _, data) in rows]
+
+            last_mol_id, last_id, _ = rows[-1]
+            if len(rows) < batch_size:
+                break
+
+    async def upsert_results(self, results: List[Result]) -> UpsertSummary:
+        def _upsert_results(connection, changes):
+            # compare with the stored content to skip unchanged (e.g. redelivered) results
+            stored = {}
+            for chunk in _chunks([result.id for result in results]):
+                for id, data in connection.execute(
+                    f"SELECT id, data FROM results WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall():
+                    stored[id] = data
+
+            summary = UpsertSummary()
+            rows = []
+            for result in results:
+                data = _dump(result)
+                old_data = stored.get(result.id)
+                if old_data == data:
+                    summary.num_skipped += 1
+                    continue
+
+                if old_data is None:
+                    summary.num_inserted += 1
+                    old_result = None
+                else:
+                    summary.num_updated += 1
+                    old_result = Result(**json.loads(old_data))
+
+                # the same result might occur multiple times in a batch
+                stored[result.id] = data
+                rows.append((result.id, result.job_id, result.mol_id, data))
+                changes.append((self._result_changes, (old_result, result)))
+
+            connection.executemany(
+                "INSERT INTO results (id, job_id, mol_id, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET "
+                "job_id = excluded.job_id, mol_id = excluded.mol_id, data = excluded.data",
+                rows,
+            )
+
+            # update the materialized progress of all affected jobs (in the same transaction)
+            mol_ids_by_job: Dict[str, List[int]] = {}
+            for result in results:
+                mol_ids_by_job.setdefault(result.job_id, []).append(result.mol_id)
+
+            for job_id, mol_ids in mol_ids_by_job.items():
+                job = self._get_job(connection, job_id)
+
+                # the job might have been deleted in the meantime or it might be done already
+                # (progress is frozen in that case)
+                if job is None or job.is_done():
+                    continue
+
+                entries_processed = job.entries_processed.union(mol_ids)
+                if entries_processed.count() == job.entries_processed.count():
+                    # all results were processed before
+                    continue
+
+                new_job = JobWithResults(
+                    **job.model_dump(exclude={"entries_processed"}),
+                    entries_processed=entries_processed,
+                )
+                self._put_job(connection, new_job)
+                changes.append((self._job_changes, (job, new_job)))
+
+            return summary
+
+        return await self._write(_upsert_results)
+
+    def get_result_changes(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+    ) -> AsyncIterable[Tuple[Optional[Result], Optional[Result]]]:
+        return self._result_changes.changes(
+            "job_id_mol_id",
+            job_id,
+            start_mol_id,
+            end_mol_id,
+            initial=lambda: self.get_results_by_job_id(job_id, start_mol_id, end_mol_id),
+        )
+
+    async def get_all_results_by_job_id(self, job_id: str) -> List[Result]:
+        return await self.get_results_by_job_id(job_id)
+
+    async def delete_results_by_job_id(self, job_id: str) -> None:
+        def _delete_results(connection, changes):
+            if self._result_changes.is_active():
+                for (data,) in connection.execute(
+                    "SELECT data FROM results WHERE job_id = ?", (job_id,)
+                ).fetchall():
+                    changes.append((self._result_changes, (Result(**json.loads(data)), None)))
+
+            connection.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+
+        await self._write(_delete_results)
+
+    #
+    # CHECKPOINTS
+    #
+    async def create_result_checkpoint(self, checkpoint: ResultCheckpoint) -> ResultCheckpoint:
+        def _create_checkpoint(connection, changes):
+            try:
+                connection.execute(
+                    "INSERT INTO checkpoints (id, job_id, job_type, data) VALUES (?, ?, ?, ?)",
+                    (checkpoint.id, checkpoint.job_id, checkpoint.job_type, _dump(checkpoint)),
+                )
+            except sqlite3.IntegrityError as e:
+                raise RecordAlreadyExistsError(ResultCheckpoint, checkpoint.id) from e
+
+        await self._write(_create_checkpoint)
+        return checkpoint
+
+    async def update_result_checkpoint(self, checkpoint: ResultCheckpoint) -> ResultCheckpoint:
+        def _update_checkpoint(connection, changes):
+            cursor = connection.execute(
+                "UPDATE checkpoints SET job_id = ?, job_type = ?, data = ? WHERE id = ?",
+                (checkpoint.job_id, checkpoint.job_type, _dump(checkpoint), checkpoint.id),
+            )
+            if cursor.rowcount == 0:
+                raise RecordNotFoundError(ResultCheckpoint, checkpoint.id)
+
+        await self._write(_update_checkpoint)
+        return checkpoint
+
+    async def update_result_checkpoints(
+        self, checkpoints: List[ResultCheckpoint]
+    ) -> List[ResultCheckpoint]:
+        def _update_checkpoints(connection, changes):
+            updated = []
+            for checkpoint in checkpoints:
+                cursor = connection.execute(
+                    "UPDATE checkpoints SET job_id = ?, job_type = ?, data = ? WHERE id = ?",
+                    (checkpoint.job_id, checkpoint.job_type, _dump(checkpoint), checkpoint.id),
+                )
+                if cursor.rowcount > 0:
+                    updated.append(checkpoint)
+            return updated
+
+        return await self._write(_update_checkpoints)
+
+    async def _get_checkpoints(self, column: str, value: str) -> List[ResultCheckpoint]:
+        def _get_checkpoints(connection):
+            return connection.execute(
+                f"SELECT data FROM checkpoints WHERE {column} = ?", (value,)
+            ).fetchall()
+
+        rows = await self._read(_get_checkpoints)
+        return [ResultCheckpoint(**json.loads(data)) for (data,) in rows]
+
+    async def get_result_checkpoints_by_job_id(self, job_id: str) -> List[ResultCheckpoint]:
+        return await self._get_checkpoints("job_id", job_id)
+
+    async def get_result_checkpoints_by_module_id(self, module_id: str) -> List[ResultCheckpoint]:
+        return await self._get_checkpoints("job_type", module_id)
+
+    async def delete_result_checkpoints_by_job_id(self, job_id: str) -> None:
+        def _delete_checkpoints(connection, changes):
+            connection.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+        await self._write(_delete_checkpoints)
+
+    #
+    # USERS
+    #
+    async def get_user_by_ip_address(self, ip_address: str) -> AnonymousUser:
+        def _get_user(connection):
+            return connection.execute(
+                "SELECT data FROM users WHERE ip_address = ? LIMIT 1", (ip_address,)
+            ).fetchone()
+
+        row = await self._read(_get_user)
+        if row is None:
+            raise RecordNotFoundError(AnonymousUser, ip_address)
+
+        return AnonymousUser(**json.loads(row[0]))
+
+    # Note: this method is not mandatory for the repository interface.
+    async def get_user_by_id(self, user_id: str) -> User:
+        def _get_user(connection):
+            return connection.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+
+        row = await self._read(_get_user)
+        if row is None:
+            raise RecordNotFoundError(User, user_id)
+
+        user = json.loads(row[0])
+        if user["user_type"] == UserType.ANONYMOUS:
+            return AnonymousUser(**user)
+        else:
+            raise ValueError(f"Unknown user type: {user['user_type']}")
+
+    async def create_user(self, user: User) -> User:
+        def _create_user(connection, changes):
+            try:
+                connection.execute(
+                    "INSERT INTO users (id, ip_address, data) VALUES (?, ?, ?)",
+                    (user.id, getattr(user, "ip_address", None), _dump(user)),
+                )
+            except sqlite3.IntegrityError as e:
+                raise RecordAlreadyExistsError(User, user.id) from e
+
+        await self._write(_create_user)
+        return user
+
+    async def get_recent_jobs_by_user(self, user: User, num_seconds: int) -> List[JobInternal]:
+        def _get_jobs(connection):
+            return connection.execute(
+                "SELECT json_remove(data, '$.entries_processed') FROM jobs "
+                "WHERE user_id = ? AND created_at > ?",
+                (user.id, time.time() - num_seconds),
+            ).fetchall()
+
+        return [JobInternal(**json.loads(data)) for (data,) in await self._read(_get_jobs)]
+
+    #
+    # CHALLENGES
+    #
+    async def get_challenge_by_salt(self, salt: str) -> Challenge:
+        def _get_challenge(connection):
+            return connection.execute(
+                "SELECT data FROM challenges WHERE salt = ? LIMIT 1", (salt,)
+            ).fetchone()
+
+        row = await self._read(_get_challenge)
+        if row is None:
+            raise RecordNotFoundError(Challenge, salt)
+
+        return Challenge(**json.loads(row[0]))
+
+    async def create_challenge(self, challenge: Challenge) -> Challenge:
+        def _create_challenge(connection, changes):
+            try:
+                connection.execute(
+                    "INSERT INTO challenges (id, salt, expires_at, data) VALUES (?, ?, ?, ?)",
+                    (
+                        challenge.id,
+                        challenge.salt,
+                        challenge.expires_at.timestamp(),
+                        _dump(challenge),
+                    ),
+                )
+            except sqlite3.IntegrityError as e:
+                raise RecordAlreadyExistsError(Challenge, challenge.id) from e
+
+        await self._write(_create_challenge)
+        return challenge
+
+    async def delete_challenge_by_id(self, id: str) -> None:
+        def _delete_challenge(connection, changes):
+            cursor = connection.execute("DELETE FROM challenges WHERE id = ?", (id,))
+            if cursor.rowcount == 0:
+                raise RecordNotFoundError(Challenge, id)
+
+        await self._write(_delete_challenge)
+
+    async def delete_expired_challenges(self, deadline: datetime) -> None:
+        def _delete_challenges(connection, changes):
+            connection.execute(
+                "DELETE FROM challenges WHERE expires_at < ?", (deadline.timestamp(),)
+            )
+
+        await self._write(_delete_challenges)
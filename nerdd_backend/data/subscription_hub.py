@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from typing import (
+    Any,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from ..models import JobWithResults, Result
+from ..util import coalesce
+from .repository import Repository
+
+__all__ = ["SubscriptionHub"]
+
+logger = logging.getLogger(__name__)
+
+Change = Tuple[Optional[Any], Optional[Any]]
+JobChange = Tuple[Optional[JobWithResults], Optional[JobWithResults]]
+
+# markers that are put into subscriber queues in addition to the actual changes
+_END = object()
+_RESYNC = object()
+
+
+class _Subscriber:
+    def __init__(self, queue_size: int) -> None:
+        # we need space for at least two markers (_RESYNC and _END)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(queue_size, 2))
+        self.num_resyncs = 0
+
+    def put(self, item: Any) -> None:
+        if self.queue.full():
+            # The subscriber is too slow. Instead of buffering an unbounded number of changes, we
+            # drop all pending changes and ask the subscriber to resynchronize with the current
+            # state of the feed. The current state already includes the dropped changes (and the
+            # current one).
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+            self.num_resyncs += 1
+
+            if item is not _END:
+                return
+
+        self.queue.put_nowait(item)
+
+
+class _Feed:
+    def __init__(
+        self,
+        changes: AsyncIterable[Change],
+        get_key: Callable[[Any], Hashable],
+        on_finished: Callable[["_Feed"], None],
+    ) -> None:
+        self.get_key = get_key
+        self.on_finished = on_finished
+        self.subscribers: Set[_Subscriber] = set()
+        self.finished = False
+        self.error: Optional[BaseException] = None
+
+        # latest version of all records in this feed
+        self.state: Dict[Hashable, Any] = {}
+
+        self.task = asyncio.create_task(self._run(changes))
+
+    def snapshot(self) -> List[Change]:
+        return [(None, record) for record in self.state.values()]
+
+    async def _run(self, changes: AsyncIterable[Change]) -> None:
+        try:
+            async for old, new in changes:
+                # update the state before notifying subscribers (see _Subscriber.put)
+                if new is not None:
+                    self.state[self.get_key(new)] = new
+                elif old is not None:
+                    self.state.pop(self.get_key(old), None)
+
+                for subscriber in self.subscribers:
+                    subscriber.put((old, new))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # propagate the error (e.g. RecordNotFoundError) to all subscribers
+            self.error = e
+        finally:
+            self.finished = True
+            for subscriber in self.subscribers:
+                subscriber.put(_END)
+            self.on_finished(self)
+
+
+def _is_urgent_job_change(change: JobChange) -> bool:
+    # the initial state, status changes, deletions and the final state are sent immediately
+    old, new = change
+    return old is None or new is None or old.status != new.status or new.is_done()
+
+
+def _merge_job_changes(older: JobChange, newer: JobChange) -> JobChange:
+    return older[0], newer[1]
+
+
+class SubscriptionHub:
+    """
+    Shares changefeeds among all subscribers within this process.
+
+    For each watched job (or page of results), the hub keeps a single changefeed of the repository
+    and fans out all changes to its subscribers. Each subscriber has a bounded queue. If a
+    subscriber can not keep up, its pending changes are replaced by the current state of the feed.
+    The changefeed is closed as soon as the last subscriber leaves.
+
+    Job changes (e.g. progress updates for every single result) are coalesced: within
+    job_changes_window_seconds, only the latest state of a job is forwarded to subscribers. Status
+    changes and the final state of a job are forwarded immediately.
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        queue_size: int = 100,
+        job_changes_window_seconds: float = 0,
+    ) -> None:
+        self.repository = repository
+        self.queue_size = queue_size
+        self.job_changes_window_seconds = job_changes_window_seconds
+        self._feeds: Dict[Hashable, _Feed] = {}
+
+    def get_job_with_result_changes(self, job_id: str) -> AsyncIterable[JobChange]:
+        return self._subscribe(
+            ("job", job_id),
+            lambda: coalesce(
+                self.repository.get_job_with_result_changes(job_id),
+                self.job_changes_window_seconds,
+                is_urgent=_is_urgent_job_change,
+                merge=_merge_job_changes,
+            ),
+            # there is only a single record in this feed
+            get_key=lambda job: job.id,
+        )
+
+    def get_result_changes(
+        self,
+        job_id: str,
+        start_mol_id: Optional[int] = None,
+        end_mol_id: Optional[int] = None,
+    ) -> AsyncIterable[Tuple[Optional[Result], Optional[Result]]]:
+        return self._subscribe(
+            ("results", job_id, start_mol_id, end_mol_id),
+            lambda: self.repository.get_result_changes(job_id, start_mol_id, end_mol_id),
+            get_key=lambda result: result.id,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            num_feeds=len(self._feeds),
+            num_subscribers=sum(len(feed.subscribers) for feed in self._feeds.values()),
+        )
+
+    async def close(self) -> None:
+        feeds = list(self._feeds.values())
+        for feed in feeds:
+            feed.task.cancel()
+        await asyncio.gather(*[feed.task for feed in feeds], return_exceptions=True)
+        self._feeds.clear()
+
+    def _remove_feed(self, key: Hashable, feed: _Feed) -> None:
+        if self._feeds.get(key) is feed:
+            del self._feeds[key]
+
+    async def _subscribe(
+        self,
+        key: Hashable,
+        changes_factory: Callable[[], AsyncIterable[Change]],
+        get_key: Callable[[Any], Hashable],
+    ) -> AsyncIterable[Change]:
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = _Feed(
+                changes_factory(),
+                get_key=get_key,
+                on_finished=lambda f: self._remove_feed(key, f),
+            )
+            self._feeds[key] = feed
+
+        subscriber = _Subscriber(self.queue_size)
+        feed.subscribers.add(subscriber)
+
+        # subscribers joining a running feed start with its current state
+        initial_changes: Iterable[Change] = feed.snapshot()
+
+        try:
+            for change in initial_changes:
+                yield change
+
+            while True:
+                item = await subscriber.queue.get()
+                if item is _END:
+                    if feed.error is not None:
+                        raise feed.error
+                    break
+                elif item is _RESYNC:
+                    for change in feed.snapshot():
+                        yield change
+                else:
+                    yield item
+        finally:
+            feed.subscribers.discard(subscriber)
+            if len(feed.subscribers) == 0 and not feed.finished:
+                # the last subscriber left -> close the changefeed
+                feed.task.cancel()
+                self._remove_feed(key, feed)
@@ -1,14 +1,16 @@
 import asyncio
 import logging
+import math
 import os
 from contextlib import asynccontextmanager
 from typing import List
 
 import hydra
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from hydra.core.config_store import ConfigStore
 from nerdd_link import Channel, FileSystem, ModuleMessage
 from nerdd_link.utils import async_to_sync
@@ -26,13 +28,27 @@ from .actions import (
     UpdateJobSize,
 )
 from .config import AppConfig, ChannelConfig, DbConfig
-from .data import MemoryRepository, RethinkDbRepository
+from .data import (
+    CachingRepository,
+    CircuitBreakerRepository,
+    CoalescingRepository,
+    DatabaseUnavailableError,
+    InstrumentedRepository,
+    JobStateStore,
+    MemoryRepository,
+    Repository,
+    ResultArchive,
+    RethinkDbRepository,
+    SqliteRepository,
+    SubscriptionHub,
+)
 from .lifespan import AbstractLifespan, ActionLifespan, CreateModuleLifespan
 from .routers import (
     challenges_router,
     files_router,
     get_dynamic_router,
     jobs_router,
+    metrics_router,
     modules_router,
     results_router,
     sources_router,
@@ -56,14 +72,69 @@ def get_channel(config: ChannelConfig):
     )
 
 
-def get_repository(config: DbConfig):
+def get_repository(config: DbConfig) -> Repository:
+    repository: Repository
     if config.name == "rethinkdb":
-        return RethinkDbRepository(config.host, config.port, config.database_name)
+        repository = RethinkDbRepository(
+            config.host,
+            config.port,
+            config.database_name,
+            pool_min_size=config.pool_min_size,
+            pool_max_size=config.pool_max_size,
+            pool_max_idle_seconds=config.pool_max_idle_seconds,
+            pool_health_check_interval_seconds=config.pool_health_check_interval_seconds,
+            changefeed_max_connections=config.changefeed_max_connections,
+            table_shards=config.table_shards,
+            table_replicas=config.table_replicas,
+            durability=config.durability,
+            read_mode=config.read_mode,
+        )
+    elif config.name == "sqlite":
+        repository = SqliteRepository(
+            config.path,
+            changefeed_queue_size=config.changefeed_queue_size,
+            progress_encoding=config.progress_encoding,
+        )
     elif config.name == "memory":
-        return MemoryRepository()
+        repository = MemoryRepository(
+            changefeed_queue_size=config.changefeed_queue_size,
+            persistence_path=config.persistence_path,
+            persistence_flush_interval_seconds=config.persistence_flush_interval_seconds,
+            persistence_snapshot_interval=config.persistence_snapshot_interval,
+        )
     else:
         raise ValueError(f"Unsupported database: {config.name}")
 
+    if config.circuit_breaker_enabled:
+        repository = CircuitBreakerRepository(
+            repository,
+            timeout_seconds=config.timeout_seconds,
+            failure_threshold=config.circuit_breaker_failure_threshold,
+            reset_seconds=config.circuit_breaker_reset_seconds,
+        )
+
+    # instrument the database itself (i.e. cache hits are not recorded)
+    if config.instrumentation_enabled:
+        repository = InstrumentedRepository(
+            repository, slow_query_threshold_seconds=config.slow_query_threshold_seconds
+        )
+
+    if config.cache_enabled:
+        repository = CachingRepository(
+            repository,
+            max_size=config.cache_max_size,
+            ttl_seconds=config.cache_ttl_seconds,
+        )
+
+    if config.coalescing_enabled:
+        repository = CoalescingRepository(
+            repository,
+            ttl_seconds=config.coalescing_ttl_seconds,
+            max_size=config.coalescing_max_size,
+        )
+
+    return repository
+
 
 def _get_lifespan_label(lifespan: AbstractLifespan):
     action = getattr(lifespan, "action", None)
@@ -155,12 +226,27 @@ async def create_app(cfg: AppConfig):
 
             await asyncio.gather(*run_tasks, return_exceptions=True)
             logger.info("Tasks successfully cancelled")
+            await subscription_hub.close()
             await repository.close()
 
     app = FastAPI(lifespan=global_lifespan, root_path=cfg.root_path)
     app.state.repository = repository = get_repository(cfg.db)
+    app.state.subscription_hub = subscription_hub = SubscriptionHub(
+        repository,
+        queue_size=cfg.subscriber_queue_size,
+        job_changes_window_seconds=cfg.job_progress_window_seconds,
+    )
+    app.state.job_state_store = JobStateStore(
+        repository,
+        max_size=cfg.job_state_store_size,
+        max_staleness_seconds=cfg.job_state_max_staleness_seconds,
+    )
     app.state.channel = channel = get_channel(cfg.channel)
     app.state.filesystem = FileSystem(cfg.media_root)
+    app.state.result_archive = ResultArchive(
+        os.path.join(cfg.media_root, "archives"),
+        compression_level=cfg.result_archive_compression_level,
+    )
     app.state.config = cfg
 
     await channel.start()
@@ -229,6 +315,14 @@ async def create_app(cfg: AppConfig):
 
     app.add_middleware(GZipMiddleware)
 
+    @app.exception_handler(DatabaseUnavailableError)
+    async def database_unavailable_handler(request: Request, exc: DatabaseUnavailableError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(exc), "code": "database_unavailable"},
+            headers={"Retry-After": str(math.ceil(exc.retry_after_seconds))},
+        )
+
 
     #
     # Routers
@@ -240,6 +334,7 @@ async def create_app(cfg: AppConfig):
     app.include_router(websockets_router)
     app.include_router(files_router)
     app.include_router(challenges_router)
+    app.include_router(metrics_router)
 
     for module in await repository.get_all_modules():
         app.include_router(get_dynamic_router(module))
@@ -6,4 +6,5 @@ from .queue_stats import *
 from .result import *
 from .result_checkpoint import *
 from .source import *
+from .upsert_summary import *
 from .user import *
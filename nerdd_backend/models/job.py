@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field, computed_field
+from pydantic import BaseModel, Field, computed_field, field_serializer
 
 from ..util import CompressedSet
 
@@ -14,6 +14,7 @@ __all__ = [
     "JobInternal",
     "JobWithResults",
     "OutputFile",
+    "ProgressEncoding",
 ]
 
 # Purpose of the different Job models:
@@ -32,6 +33,10 @@ class OutputFile(BaseModel):
 
 JobStatus = Literal["created", "processing", "serializing", "completed", "failed"]
 
+# serialization of entries_processed: a list of [start, end) intervals or a compact base64-encoded
+# string (see CompressedSet.to_base64)
+ProgressEncoding = Literal["intervals", "compact"]
+
 
 class Job(BaseModel):
     id: str
@@ -78,12 +83,21 @@ class JobPublic(Job):
     output_files: List[OutputFile]
     job_url: str
     results_url: str
+    progress_encoding: ProgressEncoding = "intervals"
 
     @computed_field
     @property
     def num_entries_processed(self) -> int:
         return self.entries_processed.count()
 
+    @field_serializer("entries_processed")
+    def serialize_entries_processed(
+        self, entries_processed: CompressedSet
+    ) -> Union[List[Tuple[int, int]], str]:
+        if self.progress_encoding == "compact":
+            return entries_processed.to_base64()
+        return entries_processed.to_intervals()
+
 
 class JobUpdate(BaseModel):
     id: str
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+__all__ = ["UpsertSummary"]
+
+
+class UpsertSummary(BaseModel):
+    num_inserted: int = 0
+    num_updated: int = 0
+    # records that were already stored with identical content
+    num_skipped: int = 0
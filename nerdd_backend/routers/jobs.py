@@ -1,6 +1,7 @@
 import logging
 import math
 import os
+from contextlib import aclosing
 from typing import AsyncGenerator, Optional
 from uuid import uuid4
 
@@ -10,7 +11,7 @@ from fastapi.responses import StreamingResponse
 from nerdd_link import Channel, FileSystem, JobMessage, Tombstone
 
 from ..config import AppConfig
-from ..data import RecordNotFoundError, Repository
+from ..data import JobStateStore, RecordNotFoundError, Repository
 from ..models import (
     BaseSuccessResponse,
     JobCreate,
@@ -18,6 +19,7 @@ from ..models import (
     JobPublic,
     JobWithResults,
     OutputFile,
+    ProgressEncoding,
     QueueStats,
 )
 from .modules import augment_module
@@ -30,7 +32,9 @@ logger = logging.getLogger(__name__)
 jobs_router = APIRouter(prefix="/jobs")
 
 
-async def augment_job(job: JobWithResults, request: Request) -> JobPublic:
+async def augment_job(
+    job: JobWithResults, request: Request, progress_encoding: ProgressEncoding = "intervals"
+) -> JobPublic:
     # The number of processed pages is only valid if the computation has not finished yet. We adapt
     # this number in the if statement below.
     num_pages_processed = job.num_entries_processed // job.page_size
@@ -70,6 +74,7 @@ async def augment_job(job: JobWithResults, request: Request) -> JobPublic:
         num_pages_processed=num_pages_processed,
         num_pages_total=num_pages_total,
         output_files=output_files,
+        progress_encoding=progress_encoding,
     )
 
 
@@ -183,6 +188,9 @@ async def create_job(
             detail="Failed to send job to processing queue. Please try again later.",
         ) from e
 
+    job_state_store: JobStateStore = app.state.job_state_store
+    job_state_store.put(job_with_results)
+
     # return the response
     return await augment_job(job_with_results, request)
 
@@ -194,12 +202,14 @@ async def delete_job(job_id: str, request: Request) -> BaseSuccessResponse:
     channel: Channel = app.state.channel
 
     try:
-        job = await repository.get_job_by_id(job_id)
+        job = await repository.get_job_internal(job_id)
     except RecordNotFoundError as e:
         raise HTTPException(status_code=404, detail="Job not found") from e
 
     # delete only the job instance to prevent future access
     await repository.delete_job_by_id(job_id)
+    job_state_store: JobStateStore = app.state.job_state_store
+    job_state_store.invalidate(job_id)
 
     # send tombstone message on jobs topic (DeleteJob action will take care of the rest)
     await channel.jobs_topic().send(Tombstone(JobMessage, id=job_id, job_type=job.job_type))
@@ -215,7 +225,7 @@ async def get_output_file(job_id: str, format: str, request: Request) -> Streami
     filesystem: FileSystem = app.state.filesystem
 
     try:
-        job = await repository.get_job_by_id(job_id)
+        job = await repository.get_job_internal(job_id)
     except RecordNotFoundError as e:
         raise HTTPException(status_code=404, detail="Job not found") from e
 
@@ -263,25 +273,29 @@ async def get_output_file(job_id: str, format: str, request: Request) -> Streami
 
 
 @jobs_router.get("/{job_id}")
-async def get_job(job_id: str, request: Request) -> JobPublic:
+async def get_job(
+    job_id: str, request: Request, progress_encoding: ProgressEncoding = "intervals"
+) -> JobPublic:
     app = request.app
-    repository = app.state.repository
+    job_state_store: JobStateStore = app.state.job_state_store
 
     try:
-        job = await repository.get_job_by_id(job_id)
+        # active jobs are served from memory
+        job = await job_state_store.get_job(job_id)
     except RecordNotFoundError as e:
         raise HTTPException(status_code=404, detail="Job not found") from e
 
-    return await augment_job(job, request)
+    return await augment_job(job, request, progress_encoding)
 
 
 @jobs_router.get("/{job_id}/queue")
 async def get_job_queue(job_id: str, request: Request) -> QueueStats:
     app = request.app
     repository: Repository = app.state.repository
+    job_state_store: JobStateStore = app.state.job_state_store
 
     try:
-        job = await repository.get_job_by_id(job_id)
+        job = await job_state_store.get_job(job_id)
     except RecordNotFoundError as e:
         raise HTTPException(status_code=404, detail="Job not found") from e
 
@@ -300,18 +314,20 @@ async def get_job_queue(job_id: str, request: Request) -> QueueStats:
     horizon = 100
     job_sizes = []
     estimate = "upper_bound"
-    async for earlier_job in repository.get_jobs_by_status(
-        module_id, ["created", "processing"], deadline=job.created_at
-    ):
-        job_sizes.append(
-            max(earlier_job.num_entries_total - earlier_job.num_entries_processed, 0)
-            if earlier_job.num_entries_total is not None
-            else 10
-        )
+    # close the query when leaving the loop early (it might hold a database connection)
+    async with aclosing(
+        repository.get_jobs_by_status(module_id, ["created", "processing"], deadline=job.created_at)
+    ) as earlier_jobs:
+        async for earlier_job in earlier_jobs:
+            job_sizes.append(
+                max(earlier_job.num_entries_total - earlier_job.num_entries_processed, 0)
+                if earlier_job.num_entries_total is not None
+                else 10
+            )
 
-        if len(job_sizes) >= horizon:
-            estimate = "lower_bound"
-            break
+            if len(job_sizes) >= horizon:
+                estimate = "lower_bound"
+                break
 
     # the waiting time is still an approximation, because it doesn't consider the number of
     # available workers
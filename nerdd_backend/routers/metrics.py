@@ -0,0 +1,41 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Request
+
+from ..data import JobStateStore, Repository, ResultArchive, SubscriptionHub
+
+__all__ = ["metrics_router"]
+
+metrics_router = APIRouter(prefix="/metrics")
+
+
+@metrics_router.get("/repository", include_in_schema=False)
+async def get_repository_metrics(request: Request) -> Dict[str, Any]:
+    app = request.app
+    repository: Repository = app.state.repository
+
+    return repository.get_stats()
+
+
+@metrics_router.get("/subscriptions", include_in_schema=False)
+async def get_subscription_metrics(request: Request) -> Dict[str, Any]:
+    app = request.app
+    subscription_hub: SubscriptionHub = app.state.subscription_hub
+
+    return subscription_hub.get_stats()
+
+
+@metrics_router.get("/job-states", include_in_schema=False)
+async def get_job_state_metrics(request: Request) -> Dict[str, Any]:
+    app = request.app
+    job_state_store: JobStateStore = app.state.job_state_store
+
+    return job_state_store.get_stats()
+
+
+@metrics_router.get("/result-archive", include_in_schema=False)
+async def get_result_archive_metrics(request: Request) -> Dict[str, Any]:
+    app = request.app
+    result_archive: ResultArchive = app.state.result_archive
+
+    return result_archive.get_stats()
@@ -1,6 +1,7 @@
 import base64
 import io
 import math
+from contextlib import aclosing
 from typing import List
 
 from fastapi import APIRouter, HTTPException, Request
@@ -263,18 +264,20 @@ async def get_module_queue(module_id: str, request: Request) -> QueueStats:
     horizon = 100
     job_sizes = []
     estimate = "upper_bound"
-    async for job in repository.get_jobs_by_status(
-        module_id, ["created", "processing"]
-    ):
-        job_sizes.append(
-            max(job.num_entries_total - job.num_entries_processed, 0)
-            if job.num_entries_total is not None
-            else 10
-        )
-
-        if len(job_sizes) >= horizon:
-            estimate = "lower_bound"
-            break
+    # close the query when leaving the loop early (it might hold a database connection)
+    async with aclosing(
+        repository.get_jobs_by_status(module_id, ["created", "processing"])
+    ) as jobs:
+        async for job in jobs:
+            job_sizes.append(
+                max(job.num_entries_total - job.num_entries_processed, 0)
+                if job.num_entries_total is not None
+                else 10
+            )
+
+            if len(job_sizes) >= horizon:
+                estimate = "lower_bound"
+                break
 
     # the waiting time is still an approximation, because it doesn't consider the number of
     # available workers
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Request
 
-from ..data import RecordNotFoundError, Repository
+from ..data import JobStateStore, RecordNotFoundError, Repository, ResultArchive
 from ..models import Pagination, ResultSet
+from ..util import CompressedSet
 from .jobs import augment_job
 
 __all__ = ["results_router"]
@@ -15,11 +16,21 @@ async def get_results(
 ) -> ResultSet:
     app = request.app
     repository: Repository = app.state.repository
+    job_state_store: JobStateStore = app.state.job_state_store
+    result_archive: ResultArchive = app.state.result_archive
 
     page_zero_based = page - 1
 
+    # the results of completed jobs might have been moved to the archive (the job state in the
+    # store might be outdated by a few seconds, i.e. we check the archive itself)
+    is_archived = await result_archive.contains(job_id)
+
     try:
-        job = await repository.get_job_by_id(job_id)
+        job = await job_state_store.get_job(job_id)
+        if is_archived and not job.is_done():
+            # the stored state is outdated (jobs are archived after they were completed)
+            job_state_store.invalidate(job_id)
+            job = await job_state_store.get_job(job_id)
     except RecordNotFoundError as e:
         raise HTTPException(status_code=404, detail="Job not found") from e
 
@@ -38,8 +49,19 @@ async def get_results(
 
     first_mol_id = page_zero_based * page_size
     last_mol_id = min(first_mol_id + page_size, num_entries) - 1
-    results = await repository.get_results_by_job_id(job_id, first_mol_id, last_mol_id)
-    is_incomplete = len(results) < last_mol_id - first_mol_id + 1
+
+    results = None
+    if is_archived:
+        results = await result_archive.get_results(job_id, first_mol_id, last_mol_id)
+    if results is None:
+        # not archived (or the archive was deleted in the meantime)
+        results = await repository.get_results_by_job_id(job_id, first_mol_id, last_mol_id)
+
+    # atom and derivative property predictions have several results per molecule
+    # -> count the molecules with results
+    mol_ids = CompressedSet([result.mol_id for result in results])
+    num_mols_on_page = last_mol_id - first_mol_id + 1
+    is_incomplete = mol_ids.coverage(first_mol_id, last_mol_id + 1) < num_mols_on_page
 
     # if return_incomplete is not set, then we need to have all results on that page
     if not return_incomplete and is_incomplete:
@@ -1,33 +1,111 @@
+from typing import Any, Dict, Literal, Optional
+
 from fastapi import APIRouter, Query, WebSocketException, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.websockets import WebSocket, WebSocketDisconnect, WebSocketState
 from websockets.exceptions import ConnectionClosed
 
-from ..data import RecordNotFoundError, Repository
+from ..data import JobStateStore, RecordNotFoundError, ResultArchive, SubscriptionHub
+from ..models import JobPublic, ProgressEncoding
+from ..util import CompressedSet
 from .jobs import augment_job
 
-__all__ = ["get_job_ws", "get_results_ws", "websockets_router"]
+__all__ = ["JobDeltaEncoder", "get_job_ws", "get_results_ws", "websockets_router"]
 
 websockets_router = APIRouter(prefix="/websocket")
 
 
+class JobDeltaEncoder:
+    """
+    Encodes the states of a job as frames of the "delta" protocol of the job websocket:
+
+    * {"type": "snapshot", "seq": 0, "job": {...}} contains the full job (as in the "full"
+      protocol). It is sent first and whenever the job can not be expressed as a delta (e.g. if
+      processed entries were removed).
+    * {"type": "delta", "seq": n, "fields": {...}, "added_entries": [[start, end], ...]} contains
+      all changed fields (except entries_processed) and the intervals of newly processed entries.
+      Like entries_processed in snapshots, added_entries is a base64 string if the job uses the
+      "compact" progress encoding.
+
+    States without changes do not produce a frame.
+    """
+
+    def __init__(self) -> None:
+        self._seq = 0
+        self._fields: Optional[Dict[str, Any]] = None
+        self._entries_processed = CompressedSet()
+
+    def encode(self, job: JobPublic) -> Optional[Dict[str, Any]]:
+        fields = jsonable_encoder(job, exclude={"entries_processed"})
+        entries_processed = job.entries_processed
+
+        if (
+            self._fields is None
+            or self._entries_processed.difference(entries_processed).count() > 0
+        ):
+            frame = dict(type="snapshot", seq=self._seq, job=jsonable_encoder(job))
+        else:
+            changed_fields = {
+                key: value for key, value in fields.items() if self._fields.get(key) != value
+            }
+            added_entries = entries_processed.difference(self._entries_processed)
+            if len(changed_fields) == 0 and added_entries.count() == 0:
+                return None
+
+            frame = dict(
+                type="delta",
+                seq=self._seq,
+                fields=changed_fields,
+                added_entries=(
+                    added_entries.to_base64()
+                    if job.progress_encoding == "compact"
+                    else added_entries.to_intervals()
+                ),
+            )
+
+        self._seq += 1
+        self._fields = fields
+        self._entries_processed = entries_processed
+        return frame
+
+
 # Note: we need the slash-less and slash version of the routes, because fastapi does not redirect
 # from the slash-less version to the slash version (as in normal routes).
 @websockets_router.websocket("/jobs/{job_id}")
 @websockets_router.websocket("/jobs/{job_id}/")
-async def get_job_ws(websocket: WebSocket, job_id: str):
+async def get_job_ws(
+    websocket: WebSocket,
+    job_id: str,
+    progress_encoding: ProgressEncoding = "intervals",
+    protocol: Literal["full", "delta"] = "full",
+):
+    # protocol "full" sends the full job on every change, "delta" sends a snapshot followed by
+    # changes only (see JobDeltaEncoder)
     app = websocket.app
-    repository: Repository = app.state.repository
+    subscription_hub: SubscriptionHub = app.state.subscription_hub
+    job_state_store: JobStateStore = app.state.job_state_store
+
+    delta_encoder = JobDeltaEncoder() if protocol == "delta" else None
 
     try:
         await websocket.accept()
 
-        async for _, internal_job in repository.get_job_with_result_changes(job_id):
+        # The changefeed is shared by all subscribers of this process. It also keeps the job state
+        # store up to date (the events of this job might be consumed by another process).
+        async for _, internal_job in subscription_hub.get_job_with_result_changes(job_id):
             if internal_job is None:
+                job_state_store.invalidate(job_id)
                 break
 
-            job = await augment_job(internal_job, websocket)
-            await websocket.send_json(jsonable_encoder(job))
+            job_state_store.put(internal_job)
+
+            job = await augment_job(internal_job, websocket, progress_encoding)
+            if delta_encoder is None:
+                await websocket.send_json(jsonable_encoder(job))
+            else:
+                frame = delta_encoder.encode(job)
+                if frame is not None:
+                    await websocket.send_json(frame)
 
         if websocket.application_state != WebSocketState.DISCONNECTED:
             await websocket.close(code=status.WS_1000_NORMAL_CLOSURE)
@@ -46,13 +124,24 @@ async def get_job_ws(websocket: WebSocket, job_id: str):
 @websockets_router.websocket("/jobs/{job_id}/results/")
 async def get_results_ws(websocket: WebSocket, job_id: str, page: int = Query()):
     app = websocket.app
-    repository: Repository = app.state.repository
+    job_state_store: JobStateStore = app.state.job_state_store
+    subscription_hub: SubscriptionHub = app.state.subscription_hub
+    result_archive: ResultArchive = app.state.result_archive
 
     try:
         await websocket.accept()
 
+        # the results of completed jobs might have been moved to the archive (they do not change
+        # anymore, i.e. there is no need for a changefeed). The job state in the store might be
+        # outdated by a few seconds, i.e. we check the archive itself.
+        is_archived = await result_archive.contains(job_id)
+
         try:
-            job = await repository.get_job_by_id(job_id)
+            job = await job_state_store.get_job(job_id)
+            if is_archived and not job.is_done():
+                # the stored state is outdated (jobs are archived after they were completed)
+                job_state_store.invalidate(job_id)
+                job = await job_state_store.get_job(job_id)
         except RecordNotFoundError as e:
             raise WebSocketException(
                 code=status.WS_1008_POLICY_VIOLATION, reason="Job not found"
@@ -78,7 +167,18 @@ async def get_results_ws(websocket: WebSocket, job_id: str, page: int = Query())
         first_mol_id = page_zero_based * page_size
         last_mol_id = min(first_mol_id + page_size, num_entries) - 1
 
-        async for _, new in repository.get_result_changes(job_id, first_mol_id, last_mol_id):
+        archived_results = None
+        if is_archived:
+            archived_results = await result_archive.get_results(job_id, first_mol_id, last_mol_id)
+
+        if archived_results is not None:
+            for result in archived_results:
+                await websocket.send_json(jsonable_encoder(result))
+
+            await websocket.close(code=status.WS_1000_NORMAL_CLOSURE)
+            return
+
+        async for _, new in subscription_hub.get_result_changes(job_id, first_mol_id, last_mol_id):
             if new is not None:
                 await websocket.send_json(jsonable_encoder(new))
 
@@ -1,5 +1,10 @@
+from .circuit_breaker import *
 from .clamp import *
+from .coalesce import *
 from .compressed_set import *
 from .log_requests_middleware import *
+from .lru_cache import *
 from .maintenance_middleware import *
 from .mol_weight_model import *
+from .single_flight import *
+from .varint import *
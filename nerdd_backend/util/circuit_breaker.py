@@ -0,0 +1,104 @@
+import logging
+import time
+from typing import Any, Dict, Literal
+
+__all__ = ["CircuitBreaker"]
+
+logger = logging.getLogger(__name__)
+
+State = Literal["closed", "open", "half_open"]
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated failures of a dependency (e.g. database timeouts).
+
+    * closed: all calls are allowed. After failure_threshold consecutive failures, the breaker
+      opens.
+    * open: all calls are rejected. After reset_seconds, the breaker becomes half-open.
+    * half_open: a single probe call is allowed (all other calls are rejected). If the probe
+      succeeds, the breaker closes. Otherwise, it opens again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 10) -> None:
+        assert failure_threshold > 0, "failure_threshold must be positive"
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._state: State = "closed"
+        self._state_since = time.monotonic()
+        self._num_failures = 0
+        self._probe_in_flight = False
+
+        # statistics
+        self._seconds_in_state: Dict[State, float] = dict(closed=0.0, open=0.0, half_open=0.0)
+        self._num_trips = 0
+        self._num_rejected = 0
+
+    @property
+    def state(self) -> State:
+        self._update_state()
+        return self._state
+
+    def _set_state(self, state: State, now: float) -> None:
+        self._seconds_in_state[self._state] += now - self._state_since
+        self._state = state
+        self._state_since = now
+
+    def _update_state(self) -> None:
+        # the open state ends exactly reset_seconds after the breaker opened
+        if self._state == "open":
+            reset_at = self._state_since + self.reset_seconds
+            if reset_at <= time.monotonic():
+                self._set_state("half_open", reset_at)
+
+    def allow(self) -> bool:
+        self._update_state()
+        if self._state == "closed":
+            return True
+
+        if self._state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+
+        self._num_rejected += 1
+        return False
+
+    def retry_after_seconds(self) -> float:
+        self._update_state()
+        if self._state == "open":
+            return max(0.0, self._state_since + self.reset_seconds - time.monotonic())
+        return 0.0
+
+    def record_success(self) -> None:
+        self._probe_in_flight = False
+        self._num_failures = 0
+        if self._state != "closed":
+            logger.info("Circuit breaker closed")
+            self._set_state("closed", time.monotonic())
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self._num_failures += 1
+        if self._state == "half_open" or (
+            self._state == "closed" and self._num_failures >= self.failure_threshold
+        ):
+            logger.warning(f"Circuit breaker opened after {self._num_failures} failures")
+            self._num_trips += 1
+            self._set_state("open", time.monotonic())
+
+    def release(self) -> None:
+        # the call ended without a result (e.g. it was cancelled)
+        self._probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._update_state()
+        seconds_in_state = dict(self._seconds_in_state)
+        seconds_in_state[self._state] += time.monotonic() - self._state_since
+        return dict(
+            state=self._state,
+            trips=self._num_trips,
+            rejected=self._num_rejected,
+            seconds_open=seconds_in_state["open"],
+            seconds_half_open=seconds_in_state["half_open"],
+        )
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import AsyncIterable, AsyncIterator, Callable, Optional, TypeVar
+
+__all__ = ["coalesce"]
+
+T = TypeVar("T")
+
+_NOTHING = object()
+
+
+async def coalesce(
+    items: AsyncIterable[T],
+    window_seconds: float,
+    is_urgent: Callable[[T], bool] = lambda item: False,
+    merge: Callable[[T, T], T] = lambda older, newer: newer,
+) -> AsyncIterator[T]:
+    """
+    Yields at most one item per window_seconds. Items arriving within a window are combined with
+    merge (by default, only the latest item is kept) and yielded at the end of the window. Urgent
+    items (e.g. the final state of a record) are yielded immediately, together with all pending
+    items.
+
+    Items are read from the source while the consumer is busy, i.e. a slow consumer receives merged
+    items instead of building up a backlog.
+    """
+    if window_seconds <= 0:
+        async for item in items:
+            yield item
+        return
+
+    iterator = items.__aiter__()
+    next_item: Optional[asyncio.Future] = None
+    pending = _NOTHING
+    last_yield_at = float("-inf")
+
+    try:
+        while True:
+            if next_item is None:
+                next_item = asyncio.ensure_future(iterator.__anext__())
+
+            if pending is _NOTHING:
+                timeout = None
+            else:
+                timeout = max(0, last_yield_at + window_seconds - time.monotonic())
+
+            done, _ = await asyncio.wait({next_item}, timeout=timeout)
+            if len(done) == 0:
+                # the window is over
+                item, pending = pending, _NOTHING
+                last_yield_at = time.monotonic()
+                yield item
+                continue
+
+            try:
+                item = next_item.result()
+            except StopAsyncIteration:
+                if pending is not _NOTHING:
+                    yield pending
+                return
+            finally:
+                next_item = None
+
+            pending = item if pending is _NOTHING else merge(pending, item)
+
+            if is_urgent(item) or time.monotonic() >= last_yield_at + window_seconds:
+                item, pending = pending, _NOTHING
+                last_yield_at = time.monotonic()
+                yield item
+    finally:
+        if next_item is not None:
+            next_item.cancel()
+            try:
+                await next_item
+            except (asyncio.CancelledError, Exception):
+                # StopAsyncIteration or an error of the source (not relevant anymore)
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-import copy
+import base64
+from bisect import bisect_left, bisect_right
 from collections.abc import Sequence
-from typing import List, Tuple, Union
+from heapq import merge
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
 
+import numpy as np
 from pydantic import GetCoreSchemaHandler
 from pydantic_core.core_schema import (
     ValidationInfo,
@@ -11,152 +14,345 @@ from pydantic_core.core_schema import (
     with_info_plain_validator_function,
 )
 
+from .varint import decode_varints, encode_varints, read_varint
+
 __all__ = ["CompressedSet"]
 
+# below this number of entries (or intervals), plain Python is faster than the overhead of NumPy
+_VECTORIZE_MIN_SIZE = 64
+
+# first byte of the binary encodings (see CompressedSet.to_bytes)
+_INTERVAL_ENCODING = 1
+_BITMAP_ENCODING = 2
+# upper bound for the size of the bitmap header (tag and two varints)
+_BITMAP_HEADER_SIZE = 21
+
+
+def _intervals_from_sorted_array(entries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # runs of consecutive entries (duplicates allowed) form an interval
+    if len(entries) == 0:
+        return entries, entries
+    breaks = np.flatnonzero(np.diff(entries) > 1)
+    starts = np.concatenate((entries[:1], entries[breaks + 1]))
+    ends = np.concatenate((entries[breaks], entries[-1:])) + 1
+    return starts, ends
+
+
+def _sweep(
+    a: CompressedSet, b: CompressedSet, predicate: Callable[[np.ndarray], np.ndarray]
+) -> CompressedSet:
+    # Sweep over all interval bounds of a (weight 1) and b (weight 2). Between two consecutive
+    # bounds, the sum of weights is 0 (in neither set), 1 (only in a), 2 (only in b) or 3 (in
+    # both sets). The result contains all segments with predicate(weight) == True.
+    num_a = len(a._starts)
+    num_b = len(b._starts)
+    if num_a + num_b == 0:
+        return CompressedSet()
+
+    positions = np.array(a._starts + a._ends + b._starts + b._ends, dtype=np.int64)
+    deltas = np.repeat(np.array([1, -1, 2, -2], dtype=np.int64), [num_a, num_a, num_b, num_b])
+
+    order = np.argsort(positions, kind="stable")
+    positions = positions[order]
+    weights = np.cumsum(deltas[order])
 
-def _merge_intervals(intervals, i) -> None:
-    if i < 0 or i >= len(intervals) - 1:
-        return False
+    # weight after all bounds at the same position
+    is_last = np.append(positions[1:] != positions[:-1], True)
+    positions = positions[is_last]
+    inside = predicate(weights[is_last]).astype(np.int8)
 
-    # merge intervals[i] with intervals[i + 1] if they are adjacent / overlapping
-    if intervals[i][1] >= intervals[i + 1][0]:
-        start = min(intervals[i][0], intervals[i + 1][0])
-        end = max(intervals[i][1], intervals[i + 1][1])
-        intervals[i] = (start, end)
-        intervals.pop(i + 1)
-        return True
+    # the last weight is always 0 -> every segment start is followed by a segment end
+    changes = np.diff(inside, prepend=0)
 
-    return False
+    result = CompressedSet()
+    result._starts = positions[changes == 1].tolist()
+    result._ends = positions[changes == -1].tolist()
+    return result
 
 
 class CompressedSet:
+    """
+    A set of integers stored as sorted, disjoint and non-adjacent half-open intervals
+    [start, end). The interval bounds are kept in two parallel sorted lists, so that add and
+    contains find the relevant interval by binary search. Bulk construction and set algebra on
+    large sets are vectorized with NumPy.
+    """
+
     def __init__(
         self,
         intervals_or_entries: Union[List[Tuple[int, int]], List[int], CompressedSet, None] = None,
     ):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+
         if intervals_or_entries is None:
-            self.intervals = []
+            pass
         elif isinstance(intervals_or_entries, CompressedSet):
             # copy the intervals from another CompressedSet
-            self.intervals = list(intervals_or_entries.intervals)
+            self._starts = list(intervals_or_entries._starts)
+            self._ends = list(intervals_or_entries._ends)
+        elif len(intervals_or_entries) == 0:
+            pass
+        elif isinstance(intervals_or_entries[0], int):
+            self._set_entries(intervals_or_entries)
+        elif isinstance(intervals_or_entries[0], Sequence) and len(intervals_or_entries[0]) == 2:
+            self._set_intervals(intervals_or_entries)
         else:
-            if len(intervals_or_entries) == 0:
-                self.intervals = []
-            elif isinstance(intervals_or_entries[0], int):
-                # convert list of entries to list of intervals
-                entries = sorted(set(intervals_or_entries))
-                intervals = []
-                start = entries[0]
-                for i in range(1, len(entries)):
-                    if entries[i] == entries[i - 1]:
-                        # skip duplicates
-                        continue
-                    if entries[i] != entries[i - 1] + 1:
-                        intervals.append((start, entries[i - 1] + 1))
-                        start = entries[i]
-                intervals.append((start, entries[-1] + 1))
-                self.intervals = intervals
-            elif (
-                isinstance(intervals_or_entries[0], Sequence) and len(intervals_or_entries[0]) == 2
-            ):
-                # copy the list of intervals
-                self.intervals = list(intervals_or_entries)
+            raise ValueError(
+                f"Invalid input: must be a list of intervals or entries, got "
+                f"{intervals_or_entries} of type {type(intervals_or_entries)}"
+            )
+
+    @classmethod
+    def from_sorted_array(cls, entries: Union[np.ndarray, Iterable[int]]) -> CompressedSet:
+        """Creates a set from sorted entries (duplicates are allowed)."""
+        starts, ends = _intervals_from_sorted_array(np.asarray(entries, dtype=np.int64))
+        result = cls()
+        result._starts = starts.tolist()
+        result._ends = ends.tolist()
+        return result
+
+    def _set_entries(self, entries: List[int]) -> None:
+        if len(entries) >= _VECTORIZE_MIN_SIZE:
+            other = CompressedSet.from_sorted_array(np.unique(np.asarray(entries, dtype=np.int64)))
+            self._starts = other._starts
+            self._ends = other._ends
+            return
+
+        # convert list of entries to list of intervals (duplicates are skipped by set)
+        for entry in sorted(set(entries)):
+            if len(self._ends) > 0 and self._ends[-1] == entry:
+                self._ends[-1] = entry + 1
             else:
-                raise ValueError(
-                    f"Invalid input: must be a list of intervals or entries, got "
-                    f"{intervals_or_entries} of type {type(intervals_or_entries)}"
-                )
+                self._starts.append(entry)
+                self._ends.append(entry + 1)
+
+    def _set_intervals(self, intervals: List[Tuple[int, int]]) -> None:
+        # intervals are usually sorted and disjoint already (sorting is cheap in that case)
+        for start, end in sorted(intervals, key=lambda interval: interval[0]):
+            if start >= end:
+                continue
+            if len(self._ends) > 0 and self._ends[-1] >= start:
+                # merge adjacent / overlapping intervals
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
 
     def add(self, x: int) -> None:
-        # search for the position to insert x
-        i = 0
-        while i < len(self.intervals) and self.intervals[i][0] <= x:
-            i += 1
-        i = max(0, i - 1)  # the previous interval might contain x
+        starts = self._starts
+        ends = self._ends
 
-        if i >= len(self.intervals):
-            # x is greater than all existing intervals
-            # -> append a new interval
-            self.intervals.append((x, x + 1))
-        else:
-            left, right = self.intervals[i]
-            if left <= x < right:
+        # the interval i - 1 is the last interval starting at or before x
+        i = bisect_right(starts, x)
+
+        if i > 0 and ends[i - 1] >= x:
+            if ends[i - 1] > x:
                 # x is already in the set
                 return
-            elif x < left:
-                self.intervals.insert(i, (x, x + 1))
-            else:
-                self.intervals.insert(i + 1, (x, x + 1))
-                i += 1
 
-        # merge intervals if necessary
-        merged = _merge_intervals(self.intervals, i - 1)
-        if merged:
-            _merge_intervals(self.intervals, i - 1)
+            # x extends the interval i - 1 (and closes the gap to the interval i)
+            if i < len(starts) and starts[i] == x + 1:
+                ends[i - 1] = ends[i]
+                del starts[i]
+                del ends[i]
+            else:
+                ends[i - 1] = x + 1
+        elif i < len(starts) and starts[i] == x + 1:
+            # x extends the interval i to the left
+            starts[i] = x
         else:
-            _merge_intervals(self.intervals, i)
+            starts.insert(i, x)
+            ends.insert(i, x + 1)
 
-    def union(self, other: Union[CompressedSet, List[int], List[Tuple[int, int]]]) -> CompressedSet:
-        if isinstance(other, CompressedSet):
-            other_intervals = other.intervals
-        elif isinstance(other, list):
-            if len(other) == 0:
-                return CompressedSet(self.intervals)
-
-            first = other[0]
-            if isinstance(first, int):
-                other_intervals = CompressedSet(other).intervals
-            elif isinstance(first, tuple) and len(first) == 2:
-                other_intervals = other
-            else:
+    def add_many(self, entries: Iterable[int]) -> None:
+        entries = list(entries)
+        if len(entries) < _VECTORIZE_MIN_SIZE:
+            for entry in entries:
+                self.add(entry)
+            return
+
+        other = self.union(CompressedSet.from_sorted_array(np.unique(np.asarray(entries))))
+        self._starts = other._starts
+        self._ends = other._ends
+
+    def _coerce(
+        self, other: Union[CompressedSet, List[int], List[Tuple[int, int]]]
+    ) -> CompressedSet:
+        if not isinstance(other, CompressedSet):
+            if not isinstance(other, list):
+                raise ValueError(
+                    f"Invalid input: must be a CompressedSet or a list of integers, got {other}"
+                )
+            if len(other) > 0 and not isinstance(other[0], (int, Sequence)):
                 raise ValueError(
                     f"Invalid input: must be a CompressedSet or a list of integers or intervals, "
                     f"got {other}"
                 )
-        else:
-            raise ValueError(
-                f"Invalid input: must be a CompressedSet or a list of integers, got {other}"
-            )
+            other = CompressedSet(other)
+        return other
+
+    def union(self, other: Union[CompressedSet, List[int], List[Tuple[int, int]]]) -> CompressedSet:
+        other = self._coerce(other)
+
+        if len(self._starts) + len(other._starts) >= _VECTORIZE_MIN_SIZE:
+            return _sweep(self, other, lambda weights: weights > 0)
 
-        # merge the intervals from both sets
-        i = 0
-        j = 0
-        merged_intervals = []
-        while i < len(self.intervals) or j < len(other_intervals):
-            if i < len(self.intervals) and (
-                j == len(other_intervals) or (self.intervals[i][0] <= other_intervals[j][0])
-            ):
-                merged_intervals.append(tuple(self.intervals[i]))
-                i += 1
+        # merge the (sorted) intervals from both sets
+        result = CompressedSet()
+        starts = result._starts
+        ends = result._ends
+        for start, end in merge(
+            zip(self._starts, self._ends, strict=True), zip(other._starts, other._ends, strict=True)
+        ):
+            if len(ends) > 0 and ends[-1] >= start:
+                ends[-1] = max(ends[-1], end)
             else:
-                merged_intervals.append(tuple(other_intervals[j]))
-                j += 1
-            _merge_intervals(merged_intervals, len(merged_intervals) - 2)
+                starts.append(start)
+                ends.append(end)
 
-        return CompressedSet(merged_intervals)
+        return result
 
-    def contains(self, x: int) -> bool:
-        i = 0
-        while i < len(self.intervals) and self.intervals[i][0] <= x:
-            if x < self.intervals[i][1]:
-                return True
+    def intersection(
+        self, other: Union[CompressedSet, List[int], List[Tuple[int, int]]]
+    ) -> CompressedSet:
+        return _sweep(self, self._coerce(other), lambda weights: weights == 3)
+
+    def difference(
+        self, other: Union[CompressedSet, List[int], List[Tuple[int, int]]]
+    ) -> CompressedSet:
+        return _sweep(self, self._coerce(other), lambda weights: weights == 1)
+
+    def complement_in_range(self, start: int, end: int) -> CompressedSet:
+        """Returns all entries in [start, end) that are not in this set."""
+        # intervals overlapping [start, end)
+        i = bisect_right(self._ends, start)
+        j = bisect_left(self._starts, end)
+
+        result = CompressedSet()
+        if j - i < _VECTORIZE_MIN_SIZE:
+            for gap_start, gap_end in self.iter_missing_ranges(start, end):
+                result._starts.append(gap_start)
+                result._ends.append(gap_end)
+            return result
+
+        # the gaps are between the end of an interval and the start of the next interval
+        gap_starts = np.maximum(np.array([start] + self._ends[i:j], dtype=np.int64), start)
+        gap_ends = np.minimum(np.array(self._starts[i:j] + [end], dtype=np.int64), end)
+        is_gap = gap_starts < gap_ends
+        result._starts = gap_starts[is_gap].tolist()
+        result._ends = gap_ends[is_gap].tolist()
+        return result
+
+    def iter_missing_ranges(self, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Yields all maximal intervals [s, e) within [start, end) that are not in this set."""
+        # skip all intervals ending before start
+        i = bisect_right(self._ends, start)
+        position = start
+        while i < len(self._starts) and self._starts[i] < end:
+            if position < self._starts[i]:
+                yield position, self._starts[i]
+            position = max(position, self._ends[i])
             i += 1
-        return False
+        if position < end:
+            yield position, end
+
+    def coverage(self, start: int, end: int) -> int:
+        """Returns the number of entries in [start, end)."""
+        i = bisect_right(self._ends, start)
+        j = bisect_left(self._starts, end)
+        return sum(min(self._ends[k], end) - max(self._starts[k], start) for k in range(i, j))
+
+    def contains(self, x: int) -> bool:
+        i = bisect_right(self._starts, x) - 1
+        return i >= 0 and x < self._ends[i]
 
     def __contains__(self, x: int) -> bool:
         return self.contains(x)
 
     def count(self) -> int:
-        return sum(j - i for i, j in self.intervals)
+        return sum(self._ends) - sum(self._starts)
 
     def to_intervals(self) -> List[Tuple[int, int]]:
-        return self.intervals
+        return list(zip(self._starts, self._ends, strict=True))
+
+    #
+    # ENCODING
+    #
+    def to_bytes(self) -> bytes:
+        """
+        Encodes the set compactly: the interval bounds are stored as varints of the differences
+        between consecutive bounds. If the set is highly fragmented and a bitmap over all entries
+        from the smallest to the largest entry is smaller, the bitmap is used instead.
+        """
+        if len(self._starts) > 0 and self._starts[0] < 0:
+            raise ValueError("Only sets of non-negative integers can be encoded")
+
+        bounds = np.empty(2 * len(self._starts), dtype=np.int64)
+        bounds[0::2] = self._starts
+        bounds[1::2] = self._ends
+        encoded = bytes([_INTERVAL_ENCODING]) + encode_varints(np.diff(bounds, prepend=0))
+
+        if len(self._starts) > 0:
+            offset = self._starts[0]
+            num_bits = self._ends[-1] - offset
+            if _BITMAP_HEADER_SIZE + (num_bits + 7) // 8 < len(encoded):
+                return self._to_bitmap(offset, num_bits)
+
+        return encoded
+
+    def _to_bitmap(self, offset: int, num_bits: int) -> bytes:
+        # mark interval bounds (+1 at starts, -1 at ends) and fill the intervals by cumsum
+        marks = np.zeros(num_bits + 1, dtype=np.int8)
+        marks[np.array(self._starts, dtype=np.int64) - offset] = 1
+        marks[np.array(self._ends, dtype=np.int64) - offset] = -1
+        bits = np.cumsum(marks[:-1]) > 0
+
+        header = bytes([_BITMAP_ENCODING]) + encode_varints(np.array([offset, num_bits]))
+        return header + np.packbits(bits, bitorder="little").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> CompressedSet:
+        if len(data) == 0:
+            raise ValueError("Invalid encoding: empty data")
+
+        result = cls()
+        encoding = data[0]
+        if encoding == _INTERVAL_ENCODING:
+            bounds = np.cumsum(decode_varints(data[1:]))
+            if len(bounds) % 2 != 0:
+                raise ValueError("Invalid encoding: odd number of interval bounds")
+            result._starts = bounds[0::2].tolist()
+            result._ends = bounds[1::2].tolist()
+        elif encoding == _BITMAP_ENCODING:
+            offset, position = read_varint(data, 1)
+            num_bits, position = read_varint(data, position)
+            bits = np.unpackbits(
+                np.frombuffer(data, dtype=np.uint8, offset=position),
+                count=num_bits,
+                bitorder="little",
+            )
+            edges = np.diff(bits.astype(np.int8), prepend=0, append=0)
+            result._starts = (np.flatnonzero(edges == 1) + offset).tolist()
+            result._ends = (np.flatnonzero(edges == -1) + offset).tolist()
+        else:
+            raise ValueError(f"Invalid encoding: unknown type {encoding}")
+
+        return result
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.to_bytes()).decode("ascii")
+
+    @classmethod
+    def from_base64(cls, data: str) -> CompressedSet:
+        return cls.from_bytes(base64.b64decode(data, validate=True))
 
     def __deepcopy__(self, memo=None) -> CompressedSet:
-        return CompressedSet(copy.deepcopy(self.intervals, memo))
+        # the interval bounds are immutable integers -> a shallow copy of the lists suffices
+        return CompressedSet(self)
 
     def __repr__(self) -> str:
-        return f"CompressedSet({self.intervals})"
+        return f"CompressedSet({self.to_intervals()})"
 
     @classmethod
     def __get_pydantic_core_schema__(cls, source, handler: GetCoreSchemaHandler):
@@ -168,7 +364,12 @@ class CompressedSet:
                 return v
             if isinstance(v, list):
                 return cls(v)
-            raise TypeError(f"Expected a CompressedSet or a list of intervals, got {type(v)}")
+            if isinstance(v, str):
+                # compact encoding (see to_base64)
+                return cls.from_base64(v)
+            raise TypeError(
+                f"Expected a CompressedSet, a list of intervals or an encoded set, got {type(v)}"
+            )
 
         return with_info_plain_validator_function(
             _validate,
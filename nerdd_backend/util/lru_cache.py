@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+__all__ = ["LruCache"]
+
+T = TypeVar("T")
+
+
+class LruCache(Generic[T]):
+    """
+    A bounded cache that evicts the least recently used entry if it is full. If ttl_seconds is
+    given, entries expire after that many seconds. If on_evict is given, it is called with the key
+    of every entry that is evicted or removed after its expiration (but not with invalidated keys).
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable], None]] = None,
+    ) -> None:
+        assert max_size > 0, "max_size must be positive"
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._on_evict = on_evict
+
+        # key -> (expiration time, value)
+        self._entries: OrderedDict[Hashable, Tuple[float, T]] = OrderedDict()
+
+        # statistics
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_evictions = 0
+        self._num_expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[T]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._num_misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._num_expirations += 1
+            self._num_misses += 1
+            if self._on_evict is not None:
+                self._on_evict(key)
+            return None
+
+        self._entries.move_to_end(key)
+        self._num_hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[T]:
+        # like get, but without updating the order of entries or the statistics
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, key: Hashable, value: T) -> None:
+        expires_at = (
+            time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else float("inf")
+        )
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._num_evictions += 1
+            if self._on_evict is not None:
+                self._on_evict(evicted_key)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            size=len(self._entries),
+            max_size=self.max_size,
+            hits=self._num_hits,
+            misses=self._num_misses,
+            evictions=self._num_evictions,
+            expirations=self._num_expirations,
+        )
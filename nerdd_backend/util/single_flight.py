@@ -0,0 +1,105 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Set, Tuple, TypeVar
+
+from .lru_cache import LruCache
+
+__all__ = ["SingleFlight"]
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls with the same key: only the first call runs, all other calls wait
+    for its result (or exception). If ttl_seconds > 0, the result is also returned to calls that
+    arrive within ttl_seconds after the first call completed (at most max_size results are kept).
+
+    The shared call runs in its own task, i.e. it is not cancelled if one of the waiting callers
+    is cancelled.
+
+    If group_of is given, it maps each key to a group (e.g. the job that a query reads) and
+    forget_group drops all running calls and results of a group.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 0,
+        max_size: int = 10_000,
+        group_of: Optional[Callable[[Hashable], Hashable]] = None,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._group_of = group_of
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        # results are wrapped in a tuple to distinguish a cached None from a missing entry
+        self._results = LruCache[Tuple[T]](max_size, ttl_seconds, on_evict=self._remove_from_group)
+        # group -> keys of running calls and kept results (avoids scanning all keys on forget)
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+
+        # statistics
+        self._num_calls = 0
+        self._num_shared = 0
+        self._num_cached = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self._num_calls += 1
+
+        if self.ttl_seconds > 0:
+            entry = self._results.get(key)
+            if entry is not None:
+                self._num_cached += 1
+                return entry[0]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, fn))
+            self._in_flight[key] = task
+            self._add_to_group(key)
+        else:
+            self._num_shared += 1
+
+        return await asyncio.shield(task)
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = asyncio.current_task()
+        try:
+            result = await fn()
+            # the key might have been forgotten in the meantime (e.g. after a modification)
+            if self.ttl_seconds > 0 and self._in_flight.get(key) is task:
+                self._results.put(key, (result,))
+            return result
+        finally:
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+                self._remove_from_group(key)
+
+    def forget_group(self, group: Hashable) -> None:
+        # later calls with keys of the group start a new call (running calls are not cancelled)
+        for key in self._groups.pop(group, ()):
+            self._in_flight.pop(key, None)
+            self._results.invalidate(key)
+
+    def _add_to_group(self, key: Hashable) -> None:
+        if self._group_of is not None:
+            self._groups.setdefault(self._group_of(key), set()).add(key)
+
+    def _remove_from_group(self, key: Hashable) -> None:
+        # the key stays in its group as long as a call is running or its result is kept
+        if self._group_of is None or key in self._in_flight or self._results.peek(key) is not None:
+            return
+
+        group = self._group_of(key)
+        keys = self._groups.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._groups[group]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            calls=self._num_calls,
+            shared=self._num_shared,
+            cached=self._num_cached,
+            in_flight=len(self._in_flight),
+            results=len(self._results),
+            groups=len(self._groups),
+        )
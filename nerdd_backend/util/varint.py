@@ -0,0 +1,70 @@
+from typing import Tuple, Union
+
+import numpy as np
+
+__all__ = ["decode_varints", "encode_varints", "read_varint"]
+
+# a 64-bit integer needs at most 10 groups of 7 bits
+_MAX_VARINT_BYTES = 10
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """
+    Encodes non-negative integers as LEB128 varints, i.e. 7 bits per byte and the highest bit
+    indicates that another byte follows.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b""
+
+    # number of bytes per value
+    num_bytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, _MAX_VARINT_BYTES):
+        num_bytes += values >= np.uint64(1 << (7 * k))
+
+    offsets = np.cumsum(num_bytes) - num_bytes
+    result = np.zeros(int(num_bytes.sum()), dtype=np.uint8)
+    for k in range(int(num_bytes.max())):
+        selected = num_bytes > k
+        groups = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        continuation = np.where(num_bytes[selected] > k + 1, 0x80, 0).astype(np.uint64)
+        result[offsets[selected] + k] = groups | continuation
+
+    return result.tobytes()
+
+
+def decode_varints(data: Union[bytes, memoryview]) -> np.ndarray:
+    """Decodes a sequence of varints (see encode_varints)."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if len(buffer) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if buffer[-1] & 0x80:
+        raise ValueError("Truncated varint")
+
+    # every byte without continuation bit terminates a value
+    is_last = (buffer & 0x80) == 0
+    ends = np.flatnonzero(is_last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # position of every byte within its value
+    value_index = np.cumsum(is_last) - is_last
+    positions = np.arange(len(buffer)) - starts[value_index]
+    if positions.max() >= _MAX_VARINT_BYTES:
+        raise ValueError("Varint is too long")
+
+    groups = (buffer & 0x7F).astype(np.uint64) << (np.uint64(7) * positions.astype(np.uint64))
+    return np.add.reduceat(groups, starts).astype(np.int64)
+
+
+def read_varint(data: Union[bytes, memoryview], position: int = 0) -> Tuple[int, int]:
+    """Reads a single varint at the given position and returns its value and the next position."""
+    value = 0
+    for k in range(_MAX_VARINT_BYTES):
+        if position >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << (7 * k)
+        if byte & 0x80 == 0:
+            return value, position
+    raise ValueError("Varint is too long")
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from nerdd_backend.data import MemoryRepository, SqliteRepository
+from nerdd_backend.models import JobInternal, Result, ResultCheckpoint, Source
+
+
+def create_repository(name, tmp_path):
+    if name == "memory":
+        return MemoryRepository()
+    elif name == "sqlite":
+        return SqliteRepository(str(tmp_path / "db.sqlite"))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+async def test_bulk_operations(backend, tmp_path):
+    repository = create_repository(backend, tmp_path)
+    await repository.initialize()
+
+    #
+    # checkpoints
+    #
+    for i in range(3):
+        await repository.create_result_checkpoint(
+            ResultCheckpoint(id=f"job-{i}", job_id="job", job_type="mol-scale", checkpoint_id=i)
+        )
+    updated = await repository.update_result_checkpoints(
+        [
+            ResultCheckpoint(
+                id=f"job-{i}", job_id="job", job_type="mol-scale", checkpoint_id=i, size=10
+            )
+            for i in range(4)
+        ]
+    )
+    assert sorted(c.id for c in updated) == ["job-0", "job-1", "job-2"]
+    checkpoints = await repository.get_result_checkpoints_by_job_id("job")
+    assert len(checkpoints) == 3
+    assert all(c.size == 10 for c in checkpoints)
+
+    #
+    # sources
+    #
+    for i in range(3):
+        await repository.create_source(Source(id=f"source-{i}", filename=f"{i}.smi"))
+    sources = await repository.get_sources_by_ids(["source-0", "source-2", "missing"])
+    assert sorted(s.filename for s in sources) == ["0.smi", "2.smi"]
+    assert await repository.get_sources_by_ids([]) == []
+
+    await repository.delete_sources_by_ids(["source-0", "source-1", "missing"])
+    sources = await repository.get_sources_by_ids(["source-0", "source-1", "source-2"])
+    assert [s.id for s in sources] == ["source-2"]
+
+    #
+    # jobs
+    #
+    for i in range(3):
+        await repository.create_job(
+            JobInternal(id=f"job-{i}", job_type="mol-scale", source_id="source", params={})
+        )
+    await repository.delete_jobs_by_ids(["job-0", "job-1", "missing"])
+    jobs = await repository.get_jobs_by_ids(["job-0", "job-1", "job-2"], fields=["id"])
+    assert jobs == [{"id": "job-2"}]
+
+    await repository.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+async def test_upsert_skips_unchanged_results(backend, tmp_path):
+    repository = create_repository(backend, tmp_path)
+    await repository.initialize()
+
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={})
+    )
+    results = [Result(id=f"job-{i}", job_id="job", mol_id=i, value=i) for i in range(3)]
+
+    summary = await repository.upsert_results(results)
+    assert (summary.num_inserted, summary.num_updated, summary.num_skipped) == (3, 0, 0)
+
+    changes = []
+
+    async def _collect_changes():
+        async for change in repository.get_result_changes("job"):
+            changes.append(change)
+
+    task = asyncio.create_task(_collect_changes())
+    await asyncio.sleep(0.1)
+    num_initial_changes = len(changes)
+
+    # redelivery of the same results (and one modified result)
+    summary = await repository.upsert_results(
+        results[:2] + [Result(id="job-2", job_id="job", mol_id=2, value=20)]
+    )
+    assert (summary.num_inserted, summary.num_updated, summary.num_skipped) == (0, 1, 2)
+
+    await asyncio.sleep(0.1)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    # only the modified result emitted a change
+    assert [new.value for _, new in changes[num_initial_changes:]] == [20]
+
+    await repository.close()
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from nerdd_backend.data import CachingRepository, MemoryRepository, RecordNotFoundError
+from nerdd_backend.models import ModuleInternal, Source
+
+
+async def create_repository():
+    repository = CachingRepository(MemoryRepository(), max_size=2, ttl_seconds=60)
+    await repository.initialize()
+    await repository.create_module(ModuleInternal(id="mol-scale", name="mol-scale", rank=1))
+
+    # wait until the module changefeed is running
+    for _ in range(100):
+        if repository._module_changes_ready:
+            break
+        await asyncio.sleep(0.01)
+
+    return repository
+
+
+@pytest.mark.asyncio
+async def test_module_cache():
+    repository = await create_repository()
+
+    await repository.get_module_by_id("mol-scale")
+    module = await repository.get_module_by_id("mol-scale")
+    assert module.name == "mol-scale"
+
+    stats = repository.get_stats()["cache"]["modules"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+    # a modification of the underlying repository (e.g. by another process) is picked up via the
+    # changefeed
+    await repository.inner.update_module(
+        ModuleInternal(id="mol-scale", name="mol-scale", rank=1, seconds_per_molecule=1)
+    )
+    await asyncio.sleep(0.01)
+    module = await repository.get_module_by_id("mol-scale")
+    assert module.seconds_per_molecule == 1
+
+    await repository.close()
+
+
+@pytest.mark.asyncio
+async def test_source_cache():
+    repository = await create_repository()
+
+    for i in range(3):
+        await repository.create_source(Source(id=f"source-{i}"))
+        await repository.get_source_by_id(f"source-{i}")
+
+    # the least recently used source was evicted
+    stats = repository.get_stats()["cache"]["sources"]
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+
+    await repository.get_source_by_id("source-2")
+    assert repository.get_stats()["cache"]["sources"]["hits"] == 1
+
+    # deleted sources are removed from the cache
+    await repository.delete_source_by_id("source-2")
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_source_by_id("source-2")
+
+    await repository.close()
@@ -0,0 +1,90 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+from nerdd_backend.data import (
+    CircuitBreakerRepository,
+    DatabaseUnavailableError,
+    MemoryRepository,
+    RecordNotFoundError,
+)
+
+
+class SlowMemoryRepository(MemoryRepository):
+    def __init__(self) -> None:
+        super().__init__()
+        self.delay_seconds = 0.0
+
+    async def get_source_by_id(self, id):
+        await asyncio.sleep(self.delay_seconds)
+        return await super().get_source_by_id(id)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker():
+    inner = SlowMemoryRepository()
+    repository = CircuitBreakerRepository(
+        inner, timeout_seconds=dict(read=0.05), failure_threshold=2, reset_seconds=0.2
+    )
+    await repository.initialize()
+
+    # errors of the database do not count as failures
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_source_by_id("missing")
+
+    # timeouts open the circuit breaker after failure_threshold attempts
+    inner.delay_seconds = 1
+    for _ in range(2):
+        with pytest.raises(DatabaseUnavailableError):
+            await repository.get_source_by_id("missing")
+    assert repository.get_stats()["circuit_breaker"]["state"] == "open"
+
+    # fail fast
+    inner.delay_seconds = 0
+    with pytest.raises(DatabaseUnavailableError) as e:
+        await repository.get_source_by_id("missing")
+    assert e.value.retry_after_seconds > 0
+
+    # a successful probe closes the circuit breaker again
+    await asyncio.sleep(0.2)
+    assert repository.get_stats()["circuit_breaker"]["state"] == "half_open"
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_source_by_id("missing")
+
+    stats = repository.get_stats()["circuit_breaker"]
+    assert stats["state"] == "closed"
+    assert stats["timeouts"] == 2
+    assert stats["trips"] == 1
+    assert stats["rejected"] == 1
+    assert stats["seconds_open"] == pytest.approx(0.2)
+    assert stats["seconds_half_open"] > 0
+
+
+class StreamingMemoryRepository(MemoryRepository):
+    def __init__(self) -> None:
+        super().__init__()
+        self.num_open_streams = 0
+
+    async def get_expired_jobs(self, deadline):
+        # simulates a query that holds a database connection while it is iterated
+        self.num_open_streams += 1
+        try:
+            for i in range(10):
+                yield i
+        finally:
+            self.num_open_streams -= 1
+
+
+@pytest.mark.asyncio
+async def test_closing_a_stream_closes_the_inner_stream():
+    inner = StreamingMemoryRepository()
+    repository = CircuitBreakerRepository(inner)
+    await repository.initialize()
+
+    async with aclosing(repository.get_expired_jobs(None)) as items:
+        async for _ in items:
+            assert inner.num_open_streams == 1
+            break
+
+    assert inner.num_open_streams == 0
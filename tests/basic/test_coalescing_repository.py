@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from nerdd_backend.data import CoalescingRepository, MemoryRepository, RecordNotFoundError
+from nerdd_backend.models import JobInternal, JobUpdate
+
+
+class CountingMemoryRepository(MemoryRepository):
+    def __init__(self) -> None:
+        super().__init__()
+        self.num_calls = 0
+
+    async def get_job_by_id(self, id):
+        self.num_calls += 1
+        await asyncio.sleep(0.05)
+        return await super().get_job_by_id(id)
+
+
+@pytest.mark.asyncio
+async def test_single_flight():
+    inner = CountingMemoryRepository()
+    repository = CoalescingRepository(inner)
+    await repository.initialize()
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={})
+    )
+
+    # concurrent reads share one query
+    jobs = await asyncio.gather(*[repository.get_job_by_id("job") for _ in range(10)])
+    assert all(job.id == "job" for job in jobs)
+    assert inner.num_calls == 1
+
+    # without ttl, later reads run a new query
+    await repository.get_job_by_id("job")
+    assert inner.num_calls == 2
+
+    # exceptions are shared as well
+    results = await asyncio.gather(
+        *[repository.get_job_by_id("missing") for _ in range(3)], return_exceptions=True
+    )
+    assert all(isinstance(result, RecordNotFoundError) for result in results)
+    assert inner.num_calls == 3
+
+    # a cancelled caller does not cancel the shared query
+    first = asyncio.create_task(repository.get_job_by_id("job"))
+    second = asyncio.create_task(repository.get_job_by_id("job"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert (await second).id == "job"
+    assert inner.num_calls == 4
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_modifications():
+    inner = CountingMemoryRepository()
+    repository = CoalescingRepository(inner, ttl_seconds=60)
+    await repository.initialize()
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={})
+    )
+
+    await repository.get_job_by_id("job")
+    job = await repository.get_job_by_id("job")
+    assert inner.num_calls == 1
+    assert job.status == "created"
+
+    # modifications are visible immediately
+    await repository.update_job(JobUpdate(id="job", status="processing"))
+    job = await repository.get_job_by_id("job")
+    assert inner.num_calls == 2
+    assert job.status == "processing"
+
+    stats = repository.get_stats()["coalescing"]
+    assert stats["calls"] == 3
+    assert stats["cached"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_results_are_bounded():
+    inner = CountingMemoryRepository()
+    repository = CoalescingRepository(inner, ttl_seconds=60, max_size=2)
+    await repository.initialize()
+    for job_id in ["a", "b", "c"]:
+        await repository.create_job(
+            JobInternal(id=job_id, job_type="mol-scale", source_id="source", params={})
+        )
+
+    for job_id in ["a", "b", "c"]:
+        await repository.get_job_by_id(job_id)
+    assert repository.get_stats()["coalescing"]["results"] == 2
+
+    # the least recently used result was evicted
+    await repository.get_job_by_id("c")
+    assert inner.num_calls == 3
+    await repository.get_job_by_id("a")
+    assert inner.num_calls == 4
+
+
+@pytest.mark.asyncio
+async def test_modifications_forget_only_the_modified_job():
+    inner = CountingMemoryRepository()
+    repository = CoalescingRepository(inner, ttl_seconds=60, max_size=3)
+    await repository.initialize()
+    for job_id in ["a", "b", "c"]:
+        await repository.create_job(
+            JobInternal(id=job_id, job_type="mol-scale", source_id="source", params={})
+        )
+
+    await repository.get_job_by_id("a")
+    await repository.get_results_by_job_id("a", 0, 9)
+    await repository.get_job_by_id("b")
+    assert repository.get_stats()["coalescing"]["groups"] == 2
+
+    await repository.update_job(JobUpdate(id="a", status="processing"))
+    stats = repository.get_stats()["coalescing"]
+    assert stats["results"] == 1
+    assert stats["groups"] == 1
+
+    # the result of the other job is still used
+    await repository.get_job_by_id("b")
+    assert inner.num_calls == 2
+
+    # evicted results are removed from the index
+    for job_id in ["a", "c", "a", "c"]:
+        await repository.get_job_by_id(job_id)
+    await repository.get_results_by_job_id("c", 0, 9)
+    stats = repository.get_stats()["coalescing"]
+    assert stats["results"] == 3
+    assert stats["groups"] == 2
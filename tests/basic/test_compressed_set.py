@@ -1,5 +1,9 @@
 import random
 
+import numpy as np
+import pytest
+
+from nerdd_backend.models import JobPublic
 from nerdd_backend.util import CompressedSet
 
 
@@ -133,4 +137,139 @@ def test_union_with_compressed_set():
     set2 = CompressedSet([(3, 6), (8, 10)])
     union_set = set1.union(set2)
     assert union_set.to_intervals() == [(2, 7), (8, 10)]
-    assert union_set.count() == 7
\ No newline at end of file
+    assert union_set.count() == 7
+
+def test_random_operations():
+    # compare with a python set
+    entries = set()
+    compressed_set = CompressedSet()
+    for _ in range(2_000):
+        entry = random.randrange(500)
+        assert (entry in compressed_set) == (entry in entries)
+        compressed_set.add(entry)
+        entries.add(entry)
+
+    assert compressed_set.to_intervals() == CompressedSet(list(entries)).to_intervals()
+    assert compressed_set.count() == len(entries)
+    for entry in range(-1, 501):
+        assert (entry in compressed_set) == (entry in entries)
+
+
+def test_constructor_with_unsorted_intervals():
+    compressed_set = CompressedSet([[5, 7], (2, 4), (3, 5), (9, 9)])
+    assert compressed_set.to_intervals() == [(2, 7)]
+    assert compressed_set.count() == 5
+
+
+@pytest.mark.parametrize("size", [20, 2_000])
+def test_set_algebra(size):
+    # small sets are processed in Python, large sets with NumPy
+    entries1 = set(random.sample(range(size), size // 2))
+    entries2 = set(random.sample(range(size), size // 2))
+    set1 = CompressedSet(list(entries1))
+    set2 = CompressedSet(list(entries2))
+
+    def to_entries(compressed_set):
+        return {i for start, end in compressed_set.to_intervals() for i in range(start, end)}
+
+    assert to_entries(set1.union(set2)) == entries1 | entries2
+    assert to_entries(set1.intersection(set2)) == entries1 & entries2
+    assert to_entries(set1.difference(set2)) == entries1 - entries2
+    complement = set1.complement_in_range(10, size - 10)
+    assert to_entries(complement) == set(range(10, size - 10)) - entries1
+
+    # results are normalized (no adjacent intervals)
+    for result in [set1.union(set2), set1.difference(set2), set1.complement_in_range(0, size)]:
+        intervals = result.to_intervals()
+        bounds = zip(intervals[:-1], intervals[1:], strict=True)
+        assert all(end < start for (_, end), (start, _) in bounds)
+
+    assert set1.coverage(10, size - 10) == len([i for i in entries1 if 10 <= i < size - 10])
+
+    set1.add_many(entries2)
+    assert to_entries(set1) == entries1 | entries2
+
+
+def test_set_algebra_with_empty_sets():
+    empty = CompressedSet()
+    non_empty = CompressedSet([(2, 4), (5, 7)])
+
+    assert empty.union(CompressedSet()).to_intervals() == []
+    assert empty.intersection(CompressedSet()).to_intervals() == []
+    assert empty.difference([]).to_intervals() == []
+
+    assert empty.intersection(non_empty).to_intervals() == []
+    assert non_empty.intersection(empty).to_intervals() == []
+    assert empty.difference(non_empty).to_intervals() == []
+    assert non_empty.difference(empty).to_intervals() == [(2, 4), (5, 7)]
+    assert empty.complement_in_range(0, 3).to_intervals() == [(0, 3)]
+
+
+def test_from_sorted_array():
+    compressed_set = CompressedSet.from_sorted_array(np.array([1, 2, 2, 3, 7, 9, 10]))
+    assert compressed_set.to_intervals() == [(1, 4), (7, 8), (9, 11)]
+    assert CompressedSet.from_sorted_array([]).to_intervals() == []
+
+
+def test_missing_ranges_and_coverage():
+    compressed_set = CompressedSet([(2, 4), (5, 7)])
+    assert list(compressed_set.iter_missing_ranges(0, 10)) == [(0, 2), (4, 5), (7, 10)]
+    assert list(compressed_set.iter_missing_ranges(3, 6)) == [(4, 5)]
+    assert list(compressed_set.iter_missing_ranges(2, 4)) == []
+    assert compressed_set.complement_in_range(0, 10).to_intervals() == [(0, 2), (4, 5), (7, 10)]
+
+    assert compressed_set.coverage(0, 10) == 4
+    assert compressed_set.coverage(3, 6) == 2
+    assert compressed_set.coverage(7, 10) == 0
+
+
+@pytest.mark.parametrize("num_entries", [0, 1, 10, 10_000])
+def test_encoding(num_entries):
+    # sparse sets use the interval encoding, fragmented sets a bitmap
+    for size in [num_entries * 1000, num_entries * 2]:
+        entries = random.sample(range(size + 1), num_entries)
+        compressed_set = CompressedSet(entries)
+
+        data = compressed_set.to_bytes()
+        assert CompressedSet.from_bytes(data).to_intervals() == compressed_set.to_intervals()
+        assert len(data) <= len(str(compressed_set.to_intervals()))
+
+        encoded = compressed_set.to_base64()
+        assert CompressedSet.from_base64(encoded).to_intervals() == compressed_set.to_intervals()
+
+
+def test_encoding_in_models():
+    entries_processed = CompressedSet(list(range(0, 1000, 2)))
+    job = JobPublic(
+        id="job",
+        job_type="mol-scale",
+        source_id="source",
+        params={},
+        entries_processed=entries_processed,
+        num_pages_total=None,
+        num_pages_processed=0,
+        output_files=[],
+        job_url="",
+        results_url="",
+    )
+
+    # intervals by default
+    assert job.model_dump(mode="json")["entries_processed"][:2] == [[0, 1], [2, 3]]
+
+    # compact encoding on request (a bitmap in this case)
+    job.progress_encoding = "compact"
+    data = job.model_dump(mode="json")
+    assert isinstance(data["entries_processed"], str)
+    assert len(data["entries_processed"]) < len(str(entries_processed.to_intervals())) / 10
+
+    # both encodings are accepted when parsing
+    assert JobPublic(**data).entries_processed.to_intervals() == entries_processed.to_intervals()
+
+
+def test_invalid_encoding():
+    with pytest.raises(ValueError):
+        CompressedSet([(-2, 3)]).to_bytes()
+    with pytest.raises(ValueError):
+        CompressedSet.from_bytes(b"\x07")
+    with pytest.raises(ValueError):
+        CompressedSet.from_bytes(b"\x01\x80")
@@ -0,0 +1,78 @@
+import logging
+import random
+import time
+
+import pytest
+
+from nerdd_backend.util import CompressedSet
+
+logger = logging.getLogger(__name__)
+
+
+def measure(num_entries):
+    # every other entry is missing -> num_entries intervals (worst case fragmentation)
+    entries = list(range(0, 2 * num_entries, 2))
+    gaps = list(range(1, 2 * num_entries, 2))
+    random.shuffle(entries)
+    random.shuffle(gaps)
+
+    compressed_set = CompressedSet()
+
+    #
+    # add (fragmented)
+    #
+    start = time.perf_counter()
+    for entry in entries:
+        compressed_set.add(entry)
+    add_seconds = (time.perf_counter() - start) / num_entries
+    assert len(compressed_set.to_intervals()) == num_entries
+
+    #
+    # contains
+    #
+    start = time.perf_counter()
+    for entry in entries:
+        assert entry in compressed_set
+    for gap in gaps:
+        assert gap not in compressed_set
+    contains_seconds = (time.perf_counter() - start) / (2 * num_entries)
+
+    #
+    # add (merging intervals)
+    #
+    start = time.perf_counter()
+    for gap in gaps:
+        compressed_set.add(gap)
+    merge_seconds = (time.perf_counter() - start) / num_entries
+    assert compressed_set.to_intervals() == [(0, 2 * num_entries)]
+
+    #
+    # construction and set algebra (vectorized)
+    #
+    start = time.perf_counter()
+    fragmented_set = CompressedSet(entries)
+    gap_set = CompressedSet(gaps)
+    assert fragmented_set.union(gap_set).to_intervals() == [(0, 2 * num_entries)]
+    assert fragmented_set.intersection(gap_set).count() == 0
+    assert fragmented_set.complement_in_range(0, 2 * num_entries).count() == num_entries
+    algebra_seconds = time.perf_counter() - start
+
+    logger.warning(
+        f"{num_entries:,} fragmented entries: add {add_seconds * 1e6:.2f} us, "
+        f"contains {contains_seconds * 1e6:.2f} us, merging add {merge_seconds * 1e6:.2f} us, "
+        f"construction and set algebra {algebra_seconds * 1e3:.2f} ms"
+    )
+
+    return dict(add=add_seconds, contains=contains_seconds, merge=merge_seconds)
+
+
+@pytest.mark.benchmark
+def test_compressed_set_benchmark():
+    small = measure(10_000)
+    large = measure(100_000)
+
+    # contains is a binary search (logarithmic), add and merge insert into or delete from a list
+    # (at most linear per operation, i.e. far below 100x for 10x as many intervals)
+    assert large["contains"] < 3 * small["contains"]
+    assert large["add"] < 20 * small["add"]
+    assert large["merge"] < 20 * small["merge"]
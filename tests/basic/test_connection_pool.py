@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from nerdd_backend.data import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.open = True
+
+    def is_open(self):
+        return self.open
+
+    async def close(self):
+        self.open = False
+
+
+async def connect():
+    return FakeConnection()
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections():
+    pool = ConnectionPool(connect, min_size=1, max_size=2)
+    await pool.start()
+
+    async with pool.acquire() as connection1:
+        pass
+    async with pool.acquire() as connection2:
+        pass
+
+    assert connection1 is connection2
+    assert pool.get_stats()["created"] == 1
+
+    await pool.close()
+    assert not connection1.is_open()
+
+
+@pytest.mark.asyncio
+async def test_pool_is_bounded():
+    pool = ConnectionPool(connect, min_size=0, max_size=2)
+    await pool.start()
+
+    release = asyncio.Event()
+
+    async def use_connection():
+        async with pool.acquire():
+            await release.wait()
+
+    tasks = [asyncio.create_task(use_connection()) for _ in range(3)]
+    await asyncio.sleep(0.01)
+
+    stats = pool.get_stats()
+    assert stats["in_use"] == 2
+    assert stats["waiting"] == 1
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    stats = pool.get_stats()
+    assert stats["in_use"] == 0
+    assert stats["created"] == 2
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_connect_frees_slot():
+    connecting = asyncio.Event()
+
+    async def slow_connect():
+        connecting.set()
+        await asyncio.sleep(60)
+
+    pool = ConnectionPool(slow_connect, min_size=0, max_size=1)
+    await pool.start()
+
+    task = asyncio.create_task(pool.acquire().__aenter__())
+    await connecting.wait()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert pool.get_stats()["size"] == 0
+
+    # the slot can be used again
+    pool.connect = connect
+
+    async def use_connection():
+        async with pool.acquire() as connection:
+            return connection.is_open()
+
+    assert await asyncio.wait_for(use_connection(), timeout=1)
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_discards_closed_connections():
+    pool = ConnectionPool(connect, min_size=0, max_size=1)
+
+    async with pool.acquire() as connection:
+        await connection.close()
+
+    async with pool.acquire() as new_connection:
+        assert new_connection is not connection
+        assert new_connection.is_open()
+
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_without_reuse():
+    pool = ConnectionPool(connect, min_size=0, max_size=1, reuse=False)
+
+    async with pool.acquire() as connection:
+        pass
+
+    assert not connection.is_open()
+    assert pool.get_stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_evicts_idle_connections():
+    pool = ConnectionPool(
+        connect, min_size=1, max_size=3, max_idle_seconds=0.01, health_check_interval_seconds=0.01
+    )
+    await pool.start()
+
+    async def use_connection():
+        async with pool.acquire():
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[use_connection() for _ in range(3)])
+    assert pool.get_stats()["size"] == 3
+
+    await asyncio.sleep(0.1)
+    assert pool.get_stats()["size"] == 1
+
+    await pool.close()
@@ -0,0 +1,37 @@
+import logging
+
+import pytest
+
+from nerdd_backend.data import InstrumentedRepository, MemoryRepository, RecordNotFoundError
+from nerdd_backend.models import JobInternal, Result
+
+
+@pytest.mark.asyncio
+async def test_instrumented_repository(caplog):
+    repository = InstrumentedRepository(MemoryRepository(), slow_query_threshold_seconds=0)
+    await repository.initialize()
+
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={})
+    )
+    await repository.upsert_results(
+        [Result(id=f"job-{i}", job_id="job", mol_id=i) for i in range(5)]
+    )
+    with caplog.at_level(logging.WARNING):
+        results = await repository.get_results_by_job_id("job", 0, 2)
+    assert len(results) == 3
+    assert "Slow query: get_results_by_job_id('job', 0, 2)" in caplog.text
+
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_job_by_id("missing")
+
+    batches = [batch async for batch in repository.iter_results_by_job_id("job", batch_size=2)]
+    assert len(batches) == 3
+
+    stats = repository.get_stats()["methods"]
+    assert stats["get_results_by_job_id"]["num_calls"] == 1
+    assert stats["get_results_by_job_id"]["num_rows"] == 3
+    assert sum(stats["get_results_by_job_id"]["latency_histogram"].values()) == 1
+    assert stats["get_job_by_id"]["num_errors"] == 1
+    assert stats["iter_results_by_job_id"]["num_rows"] == 5
+    assert sum(stats["iter_results_by_job_id"]["latency_histogram"].values()) == 1
@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+from nerdd_backend.models import JobPublic
+from nerdd_backend.routers import JobDeltaEncoder
+from nerdd_backend.util import CompressedSet
+
+
+def make_job(entries_processed, **kwargs):
+    return JobPublic(
+        **{
+            "id": "job",
+            "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+            "job_type": "mol-scale",
+            "source_id": "source",
+            "params": {"a": 1},
+            "status": "processing",
+            "num_entries_total": 100,
+            "entries_processed": CompressedSet(entries_processed),
+            "num_pages_total": 10,
+            "num_pages_processed": 0,
+            "output_files": [],
+            "job_url": "http://localhost/jobs/job",
+            "results_url": "http://localhost/jobs/job/results",
+            **kwargs,
+        }
+    )
+
+
+def test_snapshot_and_deltas():
+    encoder = JobDeltaEncoder()
+
+    # full snapshot first
+    frame = encoder.encode(make_job([(0, 5)]))
+    assert frame["type"] == "snapshot"
+    assert frame["seq"] == 0
+    assert frame["job"]["entries_processed"] == [[0, 5]]
+    assert frame["job"]["params"] == {"a": 1}
+
+    # only new intervals and changed fields
+    frame = encoder.encode(make_job([(0, 5), (20, 22)]))
+    assert frame == {
+        "type": "delta",
+        "seq": 1,
+        "fields": {"num_entries_processed": 7},
+        "added_entries": [(20, 22)],
+    }
+
+    frame = encoder.encode(make_job([(0, 22)], num_pages_processed=2))
+    assert frame["seq"] == 2
+    assert frame["fields"] == {"num_pages_processed": 2, "num_entries_processed": 22}
+    assert frame["added_entries"] == [(5, 20)]
+
+    # no changes -> no frame
+    assert encoder.encode(make_job([(0, 22)], num_pages_processed=2)) is None
+
+    frame = encoder.encode(make_job([(0, 22)], num_pages_processed=2, status="completed"))
+    assert frame["seq"] == 3
+    assert frame["fields"] == {"status": "completed"}
+    assert frame["added_entries"] == []
+
+    # removed entries can not be expressed as delta
+    frame = encoder.encode(make_job([(0, 10)]))
+    assert frame["type"] == "snapshot"
+    assert frame["seq"] == 4
+
+
+def test_job_without_processed_entries():
+    encoder = JobDeltaEncoder()
+
+    frame = encoder.encode(make_job([], status="created", num_pages_total=None))
+    assert frame["type"] == "snapshot"
+    assert frame["job"]["entries_processed"] == []
+
+    frame = encoder.encode(make_job([], status="processing", num_pages_total=None))
+    assert frame == {
+        "type": "delta",
+        "seq": 1,
+        "fields": {"status": "processing"},
+        "added_entries": [],
+    }
+
+    frame = encoder.encode(make_job([]))
+    assert frame["type"] == "delta"
+    assert frame["fields"] == {"num_pages_total": 10}
+
+
+def test_compact_progress_encoding():
+    encoder = JobDeltaEncoder()
+
+    frame = encoder.encode(make_job([(0, 5)], progress_encoding="compact"))
+    assert CompressedSet.from_base64(frame["job"]["entries_processed"]).to_intervals() == [(0, 5)]
+
+    frame = encoder.encode(make_job([(0, 5), (20, 22)], progress_encoding="compact"))
+    assert frame["type"] == "delta"
+    assert CompressedSet.from_base64(frame["added_entries"]).to_intervals() == [(20, 22)]
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from nerdd_backend.data import JobStateStore, MemoryRepository, RecordNotFoundError
+from nerdd_backend.models import JobInternal, JobUpdate
+
+
+class CountingMemoryRepository(MemoryRepository):
+    def __init__(self) -> None:
+        super().__init__()
+        self.num_reads = 0
+        self.delay_seconds = 0.0
+
+    async def get_job_by_id(self, id):
+        self.num_reads += 1
+        job = await super().get_job_by_id(id)
+        await asyncio.sleep(self.delay_seconds)
+        return job
+
+
+async def create_repository(job_ids):
+    repository = CountingMemoryRepository()
+    await repository.initialize()
+    for job_id in job_ids:
+        await repository.create_job(
+            JobInternal(id=job_id, job_type="mol-scale", source_id="source", params={})
+        )
+    return repository
+
+
+@pytest.mark.asyncio
+async def test_status_reads_from_memory():
+    repository = await create_repository(["job"])
+    store = JobStateStore(repository, max_staleness_seconds=60)
+
+    job = await store.get_job("job")
+    assert job.status == "created"
+    assert repository.num_reads == 1
+
+    # events update the stored state without reading from the database
+    store.apply_update(
+        await repository.update_job(JobUpdate(id="job", status="processing", num_entries_total=4))
+    )
+    store.add_progress("job", [0, 1])
+    store.add_progress("job", [1, 3])
+
+    job = await store.get_job("job")
+    assert job.status == "processing"
+    assert job.num_entries_total == 4
+    assert job.entries_processed.to_intervals() == [(0, 2), (3, 4)]
+    assert repository.num_reads == 1
+
+    # a full state (e.g. from a changefeed) keeps the progress reported locally
+    store.put(await repository.get_job_by_id("job"))
+    job = await store.get_job("job")
+    assert job.num_entries_processed == 3
+
+    # the progress of done jobs is frozen
+    store.add_progress("job", [2])
+    store.apply_update(await repository.update_job(JobUpdate(id="job", status="completed")))
+    assert (await store.get_job("job")).is_done()
+    store.add_progress("job", [4, 5])
+    job = await store.get_job("job")
+    assert job.entries_processed.to_intervals() == [(0, 4)]
+
+    # deleted jobs are read from the database again
+    store.invalidate("job")
+    await repository.delete_job_by_id("job")
+    with pytest.raises(RecordNotFoundError):
+        await store.get_job("job")
+
+    stats = store.get_stats()
+    assert stats["hits"] == 4
+    assert stats["loads"] == 2
+
+
+@pytest.mark.asyncio
+async def test_staleness_and_eviction():
+    repository = await create_repository(["a", "b"])
+    store = JobStateStore(repository, max_size=1, max_staleness_seconds=0.05)
+
+    await store.get_job("a")
+    await store.get_job("a")
+    assert repository.num_reads == 1
+
+    # local events do not extend the lifetime of a job
+    await asyncio.sleep(0.1)
+    store.add_progress("a", [0])
+    await store.get_job("a")
+    assert repository.num_reads == 2
+    assert store.get_stats()["stale"] == 1
+
+    # the least recently used job is evicted
+    await store.get_job("b")
+    await store.get_job("a")
+    assert repository.num_reads == 4
+    assert store.get_stats()["evictions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_modification_during_load():
+    repository = await create_repository(["job"])
+    store = JobStateStore(repository, max_staleness_seconds=60)
+
+    # the job is modified while it is read from the database
+    repository.delay_seconds = 0.05
+    load = asyncio.create_task(store.get_job("job"))
+    await asyncio.sleep(0.01)
+    store.apply_update(await repository.update_job(JobUpdate(id="job", status="processing")))
+    assert (await load).status == "created"
+
+    # the outdated state was not stored
+    repository.delay_seconds = 0
+    assert (await store.get_job("job")).status == "processing"
+    assert repository.num_reads == 2
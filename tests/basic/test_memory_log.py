@@ -0,0 +1,116 @@
+import os
+import threading
+
+import pytest
+
+from nerdd_backend.data import MemoryLog, MemoryRepository, MemoryTable, RecordNotFoundError
+from nerdd_backend.models import JobInternal, Result, Source
+
+
+async def create_repository(path, **kwargs):
+    repository = MemoryRepository(persistence_path=str(path), **kwargs)
+    await repository.initialize()
+    return repository
+
+
+@pytest.mark.asyncio
+async def test_restore_from_log(tmp_path):
+    repository = await create_repository(tmp_path, persistence_flush_interval_seconds=60)
+
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={})
+    )
+    await repository.create_source(Source(id="source", filename="input.smi"))
+    await repository.upsert_results(
+        [Result(id=f"job-{i}", job_id="job", mol_id=i, value=i) for i in range(5)]
+    )
+    await repository.delete_source_by_id("source")
+
+    # write the log (without snapshot) and simulate a crash (no close)
+    await repository._log.flush()
+    repository._log._flush_task.cancel()
+    assert not os.path.exists(tmp_path / "snapshot.json")
+
+    repository = await create_repository(tmp_path)
+    job = await repository.get_job_by_id("job")
+    assert job.num_entries_processed == 5
+    results = await repository.get_results_by_job_id("job")
+    assert [result.value for result in results] == list(range(5))
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_source_by_id("source")
+
+    # modifications after restoring are appended to a new segment
+    await repository.upsert_results([Result(id="job-5", job_id="job", mol_id=5, value=5)])
+    await repository.close()
+
+    # closing writes a snapshot and removes the log segments
+    assert os.path.exists(tmp_path / "snapshot.json")
+    assert not any(filename.startswith("log.") for filename in os.listdir(tmp_path))
+
+    repository = await create_repository(tmp_path)
+    job = await repository.get_job_by_id("job")
+    assert job.num_entries_processed == 6
+    await repository.close()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_and_log(tmp_path):
+    repository = await create_repository(
+        tmp_path, persistence_flush_interval_seconds=60, persistence_snapshot_interval=3
+    )
+
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={})
+    )
+    await repository.upsert_results(
+        [Result(id=f"job-{i}", job_id="job", mol_id=i, value=i) for i in range(3)]
+    )
+    # more entries than snapshot_interval -> snapshot
+    await repository._log.flush()
+    assert os.path.exists(tmp_path / "snapshot.json")
+
+    # entries after the snapshot are only in the log
+    await repository.upsert_results([Result(id="job-0", job_id="job", mol_id=0, value=10)])
+    await repository._log.flush()
+    repository._log._flush_task.cancel()
+
+    # a partially written entry at the end of the log is skipped
+    (segment,) = [f for f in os.listdir(tmp_path) if f.startswith("log.")]
+    with open(tmp_path / segment, "a") as f:
+        f.write('{"table": "results", "id": "job-')
+
+    repository = await create_repository(tmp_path)
+    results = await repository.get_results_by_job_id("job")
+    assert [result.value for result in results] == [10, 1, 2]
+    await repository.close()
+
+
+@pytest.mark.asyncio
+async def test_tables_are_restored_in_event_loop(tmp_path):
+    async def open_log(table):
+        log = MemoryLog(str(tmp_path), flush_interval_seconds=60)
+        log.add_table("sources", table, Source)
+        await log.open()
+        return log
+
+    # snapshot with two sources and a log segment with a third source
+    table = MemoryTable[Source]()
+    log = await open_log(table)
+    table.insert(Source(id="a"))
+    table.insert(Source(id="b"))
+    await log.close()
+
+    table = MemoryTable[Source]()
+    log = await open_log(table)
+    table.insert(Source(id="c"))
+    await log.flush()
+    log._flush_task.cancel()
+
+    # all modifications (and therefore all observers) run in the thread of the event loop
+    table = MemoryTable[Source]()
+    threads = []
+    table.observe(lambda change: threads.append(threading.current_thread()))
+    log = await open_log(table)
+    assert sorted(source.id for source in table) == ["a", "b", "c"]
+    assert threads == [threading.current_thread()] * 3
+    await log.close()
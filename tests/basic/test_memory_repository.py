@@ -0,0 +1,47 @@
+import pytest
+
+from nerdd_backend.data import MemoryRepository, RecordNotFoundError
+from nerdd_backend.models import JobInternal, JobWithResults, Result
+
+
+@pytest.mark.asyncio
+async def test_job_projections():
+    repository = MemoryRepository()
+    await repository.initialize()
+
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={}, page_size=3)
+    )
+    await repository.upsert_results([Result(id="job-0", job_id="job", mol_id=0)])
+
+    job = await repository.get_job_internal("job")
+    assert type(job) is JobInternal
+    assert job.page_size == 3
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_job_internal("missing")
+
+    jobs = await repository.get_jobs_by_ids(["job", "missing"], fields=["id", "page_size"])
+    assert jobs == [{"id": "job", "page_size": 3}]
+
+    (job,) = await repository.get_jobs_by_ids(["job"])
+    assert "entries_processed" not in job
+    assert JobWithResults(**job).job_type == "mol-scale"
+
+
+@pytest.mark.asyncio
+async def test_iter_results_by_job_id():
+    repository = MemoryRepository()
+    await repository.initialize()
+
+    await repository.create_job(
+        JobInternal(id="job", job_type="mol-scale", source_id="source", params={})
+    )
+    await repository.upsert_results(
+        [Result(id=f"job-{i}", job_id="job", mol_id=i) for i in reversed(range(5))]
+    )
+
+    batches = [
+        [result.mol_id for result in batch]
+        async for batch in repository.iter_results_by_job_id("job", 1, None, batch_size=2)
+    ]
+    assert batches == [[1, 2], [3, 4]]
@@ -0,0 +1,141 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from nerdd_backend.data import ChangeFeedOverflowError, MemoryTable
+
+
+def make_table():
+    table = MemoryTable()
+    table.add_index("job_id", lambda item: item.job_id)
+    table.add_ordered_index(
+        "job_id_mol_id", group=lambda item: item.job_id, order=lambda item: item.mol_id
+    )
+    return table
+
+
+def make_item(job_id, mol_id, value=0):
+    return SimpleNamespace(id=f"{job_id}-{mol_id}", job_id=job_id, mol_id=mol_id, value=value)
+
+
+def test_indexes():
+    table = make_table()
+    for mol_id in [5, 1, 3, 2, 4]:
+        table.insert(make_item("a", mol_id))
+    table.insert(make_item("b", 1))
+
+    assert len(table) == 6
+    assert table.get("a-3").mol_id == 3
+    assert table.get("c-1") is None
+    assert len(table.get_all("a", index="job_id")) == 5
+    assert table.get_all("c", index="job_id") == []
+
+    assert [item.mol_id for item in table.between("a", index="job_id_mol_id")] == [1, 2, 3, 4, 5]
+    assert [item.mol_id for item in table.between("a", 2, 4, index="job_id_mol_id")] == [2, 3, 4]
+    assert [
+        item.mol_id for item in table.between("a", 2, 4, index="job_id_mol_id", right_closed=False)
+    ] == [2, 3]
+    assert table.between("c", index="job_id_mol_id") == []
+
+    # replace moves the record within the indexes
+    table.replace(SimpleNamespace(id="a-3", job_id="b", mol_id=0, value=1))
+    assert [item.mol_id for item in table.between("a", index="job_id_mol_id")] == [1, 2, 4, 5]
+    assert [item.id for item in table.between("b", index="job_id_mol_id")] == ["a-3", "b-1"]
+
+    table.delete("b-1")
+    assert [item.id for item in table.get_all("b", index="job_id")] == ["a-3"]
+
+
+@pytest.mark.asyncio
+async def test_changes():
+    table = make_table()
+    table.insert(make_item("a", 1))
+
+    changes = table.changes(include_initial=True)
+    assert await changes.__anext__() == (None, table.get("a-1"))
+
+    new_item = make_item("a", 1, value=1)
+    old_item = table.replace(new_item)
+    assert await asyncio.wait_for(changes.__anext__(), 1) == (old_item, new_item)
+
+    table.delete("a-1")
+    assert await asyncio.wait_for(changes.__anext__(), 1) == (new_item, None)
+
+    await changes.aclose()
+    assert table.get_stats()["num_subscriptions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_keyed_changes():
+    table = make_table()
+    table.insert(make_item("a", 1))
+
+    by_id = table.changes(key="a-2")
+    by_key = table.changes(include_initial=True, key="a", index="job_id")
+    by_range = table.changes(key="a", index="job_id_mol_id", lower=2, upper=3)
+
+    assert await by_key.__anext__() == (None, table.get("a-1"))
+    # start the other subscriptions (async generators are lazy)
+    tasks = [asyncio.create_task(changes.__anext__()) for changes in [by_id, by_range]]
+    await asyncio.sleep(0)
+    assert table.get_stats()["num_subscriptions"] == 3
+
+    # irrelevant changes are not delivered to any of the subscriptions
+    table.insert(make_item("b", 2))
+    table.insert(make_item("a", 4))
+    item = make_item("a", 2)
+    table.insert(item)
+
+    assert await asyncio.wait_for(tasks[0], 1) == (None, item)
+    assert await asyncio.wait_for(tasks[1], 1) == (None, item)
+    assert await asyncio.wait_for(by_key.__anext__(), 1) == (None, table.get("a-4"))
+    assert await asyncio.wait_for(by_key.__anext__(), 1) == (None, item)
+
+    for changes in [by_id, by_key, by_range]:
+        await changes.aclose()
+    assert table.get_stats()["num_subscriptions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_bounded_changes():
+    table = MemoryTable(queue_size=2)
+    table.insert(make_item("a", 0))
+    changes = table.changes(include_initial=True)
+    assert (await changes.__anext__())[1].mol_id == 0
+
+    for mol_id in range(1, 6):
+        table.insert(make_item("a", mol_id))
+
+    # the subscription is closed as soon as its queue overflows (instead of silently skipping
+    # changes), pending changes are dropped
+    with pytest.raises(ChangeFeedOverflowError):
+        await changes.__anext__()
+    assert table.get_stats()["num_overflows"] == 1
+    assert table.get_stats()["num_subscriptions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_overflow_does_not_affect_other_subscriptions():
+    table = MemoryTable(queue_size=2)
+    slow = table.changes()
+    fast = table.changes()
+    # start both subscriptions
+    slow_next = asyncio.create_task(slow.__anext__())
+    await asyncio.sleep(0)
+
+    received = []
+    for mol_id in range(5):
+        fast_next = asyncio.create_task(fast.__anext__())
+        await asyncio.sleep(0)
+        table.insert(make_item("a", mol_id))
+        received.append((await fast_next)[1].mol_id)
+
+    # the fast subscriber received all changes, the slow one is closed after the first change
+    assert received == list(range(5))
+    assert (await slow_next)[1].mol_id == 0
+    with pytest.raises(ChangeFeedOverflowError):
+        await slow.__anext__()
+    assert table.get_stats()["num_subscriptions"] == 1
+
+    await fast.aclose()
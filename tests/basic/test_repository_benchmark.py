@@ -0,0 +1,98 @@
+import logging
+import os
+import time
+
+import pytest
+
+from nerdd_backend.data import MemoryRepository, RethinkDbRepository, SqliteRepository
+from nerdd_backend.models import JobInternal, Result
+
+logger = logging.getLogger(__name__)
+
+NUM_RESULTS = 2_000
+BATCH_SIZE = 200
+PAGE_SIZE = 10
+
+
+def create_repository(name, tmp_path):
+    if name == "memory":
+        return MemoryRepository()
+    elif name == "sqlite":
+        return SqliteRepository(str(tmp_path / "benchmark.sqlite"))
+    elif name == "rethinkdb":
+        # only run against a RethinkDB server if one is configured explicitly
+        host = os.environ.get("RETHINKDB_HOST")
+        if host is None:
+            pytest.skip("RETHINKDB_HOST is not set")
+        return RethinkDbRepository(
+            host, int(os.environ.get("RETHINKDB_PORT", 28015)), "nerdd_benchmark"
+        )
+
+
+async def measure_page_latency(repository, job_id, num_pages):
+    start = time.perf_counter()
+    for page in range(num_pages):
+        results = await repository.get_results_by_job_id(
+            job_id, page * PAGE_SIZE, (page + 1) * PAGE_SIZE - 1
+        )
+        assert len(results) == PAGE_SIZE
+    return (time.perf_counter() - start) / num_pages
+
+
+async def ingest(repository, job_id, start_mol_id, end_mol_id):
+    for i in range(start_mol_id, end_mol_id, BATCH_SIZE):
+        await repository.upsert_results(
+            [
+                Result(id=f"{job_id}-{mol_id}", job_id=job_id, mol_id=mol_id, value=mol_id)
+                for mol_id in range(i, i + BATCH_SIZE)
+            ]
+        )
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["memory", "sqlite", "rethinkdb"])
+async def test_repository_benchmark(backend, tmp_path):
+    repository = create_repository(backend, tmp_path)
+    await repository.initialize()
+
+    job_id = f"benchmark-{time.time_ns()}"
+    await repository.create_job(
+        JobInternal(id=job_id, job_type="mol-scale", source_id="source", params={})
+    )
+
+    try:
+        #
+        # page latency with a tenth of the results
+        #
+        num_pages = NUM_RESULTS // PAGE_SIZE // 10
+        await ingest(repository, job_id, 0, NUM_RESULTS // 10)
+        small_page_seconds = await measure_page_latency(repository, job_id, num_pages)
+
+        #
+        # ingest throughput
+        #
+        start = time.perf_counter()
+        await ingest(repository, job_id, NUM_RESULTS // 10, NUM_RESULTS)
+        ingest_seconds = time.perf_counter() - start
+
+        #
+        # page latency with all results
+        #
+        page_seconds = await measure_page_latency(repository, job_id, num_pages)
+
+        job = await repository.get_job_by_id(job_id)
+        assert job.num_entries_processed == NUM_RESULTS
+
+        logger.warning(
+            f"{backend}: ingest {NUM_RESULTS * 0.9 / ingest_seconds:,.0f} results/s, "
+            f"page latency {page_seconds * 1000:.2f} ms "
+            f"({small_page_seconds * 1000:.2f} ms with a tenth of the results)"
+        )
+
+        # pages are read via an index, i.e. the latency does not grow with the size of the job
+        assert page_seconds < 3 * small_page_seconds + 0.001
+    finally:
+        await repository.delete_results_by_job_id(job_id)
+        await repository.delete_job_by_id(job_id)
+        await repository.close()
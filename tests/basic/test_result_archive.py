@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from nerdd_backend.data import ResultArchive
+from nerdd_backend.models import Result
+
+
+async def to_batches(results, batch_size=7):
+    for i in range(0, len(results), batch_size):
+        yield results[i : i + batch_size]
+
+
+def create_results(job_id, num_molecules, num_atoms):
+    return [
+        Result(
+            id=f"{job_id}-{mol_id}-{atom_id}",
+            job_id=job_id,
+            mol_id=mol_id,
+            atom_id=atom_id,
+            prediction=mol_id * 0.5,
+        )
+        for mol_id in range(num_molecules)
+        for atom_id in range(num_atoms)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pages(tmp_path):
+    archive = ResultArchive(str(tmp_path))
+    results = create_results("job", num_molecules=25, num_atoms=3)
+
+    # results within a page are sorted in the archive
+    num_bytes = await archive.write(
+        "job", 10, to_batches(list(reversed(results[:30])) + results[30:])
+    )
+    assert os.path.getsize(archive.get_path("job")) == num_bytes
+
+    # single page
+    page = await archive.get_results("job", 10, 19)
+    assert page == results[30:60]
+
+    # ranges across pages
+    assert await archive.get_results("job", 8, 21) == results[24:66]
+    assert await archive.get_results("job", 20) == results[60:]
+    assert await archive.get_results("job") == results
+
+    # pages without results
+    assert await archive.get_results("job", 30, 39) == []
+
+    stats = archive.get_stats()
+    assert stats["archived"] == 1
+    assert stats["pages_read"] == 1 + 3 + 1 + 3
+    # the index was read only once
+    assert stats["index_cache"]["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_and_deleted_archives(tmp_path):
+    archive = ResultArchive(str(tmp_path))
+
+    assert await archive.get_results("job", 0, 9) is None
+    assert not await archive.contains("job")
+
+    await archive.write("job", 10, to_batches(create_results("job", num_molecules=5, num_atoms=1)))
+    assert await archive.contains("job")
+    assert len(await archive.get_results("job", 0, 9)) == 5
+
+    await archive.delete("job")
+    assert await archive.get_results("job", 0, 9) is None
+    assert not await archive.contains("job")
+
+    # deleting a missing archive is fine
+    await archive.delete("job")
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_unordered_results(tmp_path):
+    archive = ResultArchive(str(tmp_path))
+    results = create_results("job", num_molecules=25, num_atoms=1)
+
+    # an archive is only written if the results are ordered by mol_id
+    with pytest.raises(ValueError):
+        await archive.write("job", 10, to_batches(list(reversed(results))))
+    assert os.listdir(tmp_path) == []
+    assert not await archive.contains("job")
+
+
+@pytest.mark.asyncio
+async def test_numeric_order_within_pages(tmp_path):
+    archive = ResultArchive(str(tmp_path))
+
+    # a single page with mol_ids and atom_ids beyond a digit boundary (string order: 0, 1, 10, ...)
+    results = create_results("j", num_molecules=12, num_atoms=12)
+    await archive.write("j", 100, to_batches(results))
+
+    archived = await archive.get_results("j")
+    assert [(result.mol_id, result.atom_id) for result in archived] == [
+        (result.mol_id, result.atom_id) for result in results
+    ]
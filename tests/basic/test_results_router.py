@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from starlette.websockets import WebSocketState
+
+from nerdd_backend.data import JobStateStore, MemoryRepository, ResultArchive
+from nerdd_backend.models import JobInternal, JobUpdate, Result
+from nerdd_backend.routers import (
+    files_router,
+    get_results_ws,
+    jobs_router,
+    results_router,
+)
+
+
+class FakeWebSocket:
+    def __init__(self, app) -> None:
+        self.app = app
+        self.application_state = WebSocketState.CONNECTING
+        self.messages = []
+        self.close_code = None
+
+    async def accept(self):
+        self.application_state = WebSocketState.CONNECTED
+
+    async def send_json(self, data):
+        self.messages.append(data)
+
+    async def close(self, code):
+        self.application_state = WebSocketState.DISCONNECTED
+        self.close_code = code
+
+
+async def create_app(tmp_path):
+    repository = MemoryRepository()
+    await repository.initialize()
+
+    app = FastAPI()
+    app.include_router(jobs_router)
+    app.include_router(results_router)
+    app.include_router(files_router)
+    app.state.repository = repository
+    app.state.job_state_store = JobStateStore(repository, max_staleness_seconds=60)
+    app.state.result_archive = ResultArchive(str(tmp_path))
+    # the changefeed must not be used for archived jobs
+    app.state.subscription_hub = SimpleNamespace()
+    return app
+
+
+async def archive_job(app, job_id, num_molecules):
+    repository = app.state.repository
+
+    await repository.create_job(
+        JobInternal(id=job_id, job_type="mol-scale", source_id="source", params={}, page_size=10)
+    )
+    await repository.update_job(
+        JobUpdate(id=job_id, status="processing", num_entries_total=num_molecules)
+    )
+
+    # the job is requested while it is processed -> the store keeps an incomplete state
+    job = await app.state.job_state_store.get_job(job_id)
+    assert not job.is_done()
+
+    # the job completes and its results are moved to the archive
+    results = [
+        Result(id=f"{job_id}-{mol_id}", job_id=job_id, mol_id=mol_id, prediction=mol_id)
+        for mol_id in range(num_molecules)
+    ]
+    await repository.upsert_results(results)
+    await repository.update_job(JobUpdate(id=job_id, status="completed"))
+    await app.state.result_archive.write(job_id, 10, repository.iter_results_by_job_id(job_id))
+    await repository.delete_results_by_job_id(job_id)
+
+    return results
+
+
+@pytest.mark.asyncio
+async def test_archived_results_with_outdated_job_state(tmp_path):
+    app = await create_app(tmp_path)
+    results = await archive_job(app, "job", 15)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/jobs/job/results", params=dict(page=2))
+
+    assert response.status_code == 200
+    result_set = response.json()
+    assert [result["mol_id"] for result in result_set["data"]] == list(range(10, 15))
+    assert not result_set["pagination"]["is_incomplete"]
+    assert result_set["job"]["status"] == "completed"
+
+    # the store was refreshed
+    job = await app.state.job_state_store.get_job("job")
+    assert job.is_done()
+
+    # websocket
+    app.state.job_state_store.invalidate("job")
+    app.state.job_state_store.put(
+        (await app.state.repository.get_job_by_id("job")).model_copy(
+            update=dict(status="processing")
+        )
+    )
+    websocket = FakeWebSocket(app)
+    await get_results_ws(websocket, "job", page=1)
+
+    assert [message["mol_id"] for message in websocket.messages] == [
+        result.mol_id for result in results[:10]
+    ]
+    assert websocket.close_code == 1000
@@ -0,0 +1,100 @@
+import pytest
+from rethinkdb.net import Cursor
+
+from nerdd_backend.data import ConnectionPool, RethinkDbRepository
+
+
+def test_run_options():
+    repository = RethinkDbRepository(
+        "localhost",
+        28015,
+        "nerdd",
+        durability={"upsert_results": "soft"},
+        read_mode={"get_all_modules": "outdated"},
+    )
+
+    assert repository._get_run_options("upsert_results") == {"durability": "soft"}
+    assert repository._get_run_options("get_all_modules") == {"read_mode": "outdated"}
+    assert repository._get_run_options("create_job") == {}
+    assert repository._get_run_options(None) == {}
+
+    with pytest.raises(ValueError):
+        RethinkDbRepository("localhost", 28015, "nerdd", durability={"upsert_results": "fast"})
+    with pytest.raises(ValueError):
+        RethinkDbRepository("localhost", 28015, "nerdd", read_mode={"get_all_modules": "any"})
+
+
+class FakeConnection:
+    def is_open(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+class FakeCursor(Cursor):
+    def __init__(self, items, pool):
+        self.items = list(items)
+        self.pool = pool
+        self.in_use = []
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if len(self.items) == 0:
+            raise StopAsyncIteration
+        # record whether the connection is still checked out while reading
+        self.in_use.append(self.pool.get_stats()["in_use"])
+        return self.items.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeQuery:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    async def run(self, connection, **options):
+        return self.cursor
+
+
+async def create_repository():
+    async def connect():
+        return FakeConnection()
+
+    repository = RethinkDbRepository("localhost", 28015, "nerdd")
+    repository._pool = ConnectionPool(connect, min_size=0, max_size=1)
+    return repository
+
+
+@pytest.mark.asyncio
+async def test_cursors_are_read_while_connection_is_checked_out():
+    repository = await create_repository()
+    pool = repository._pool
+
+    # sequences are materialized before the connection is released
+    cursor = FakeCursor([1, 2, 3], pool)
+    assert await repository._run(FakeQuery(cursor)) == [1, 2, 3]
+    assert cursor.in_use == [1, 1, 1]
+    assert pool.get_stats()["in_use"] == 0
+
+    # streamed sequences keep the connection until the iteration is stopped
+    cursor = FakeCursor([1, 2, 3], pool)
+    items = repository._iter(FakeQuery(cursor))
+    assert await items.__anext__() == 1
+    assert pool.get_stats()["in_use"] == 1
+    await items.aclose()
+    assert cursor.closed
+    assert pool.get_stats()["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_jobs_by_empty_status_list():
+    repository = await create_repository()
+
+    # no query is sent to the database
+    assert [job async for job in repository.get_jobs_by_status("mol-scale", [])] == []
+    assert repository._pool.get_stats()["created"] == 0
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+
+from nerdd_backend.data import RecordAlreadyExistsError, RecordNotFoundError, SqliteRepository
+from nerdd_backend.models import AnonymousUser, JobInternal, JobUpdate, Result, Source
+
+
+@pytest_asyncio.fixture
+async def repository(tmp_path):
+    repository = SqliteRepository(str(tmp_path / "db.sqlite"))
+    await repository.initialize()
+    yield repository
+    await repository.close()
+
+
+def make_job(id="job", **kwargs):
+    return JobInternal(id=id, job_type="mol-scale", source_id="source", params={}, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_jobs(repository):
+    await repository.create_job(make_job(user_id="user"))
+    with pytest.raises(RecordAlreadyExistsError):
+        await repository.create_job(make_job())
+
+    await repository.update_job(JobUpdate(id="job", status="processing", num_entries_total=3))
+    job = await repository.get_job_by_id("job")
+    assert job.status == "processing"
+    assert job.num_entries_total == 3
+
+    jobs = [
+        job
+        async for job in repository.get_jobs_by_status(
+            "mol-scale", ["created", "processing"], deadline=datetime.now(timezone.utc)
+        )
+    ]
+    assert [job.id for job in jobs] == ["job"]
+
+    assert (await repository.get_job_internal("job")).id == "job"
+    user = AnonymousUser(id="user", ip_address="127.0.0.1")
+    await repository.create_user(user)
+    assert await repository.get_user_by_ip_address("127.0.0.1") == user
+    assert [job.id for job in await repository.get_recent_jobs_by_user(user, 60)] == ["job"]
+
+    await repository.delete_job_by_id("job")
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_job_by_id("job")
+
+
+@pytest.mark.asyncio
+async def test_results_and_progress(repository):
+    await repository.create_job(make_job())
+    await repository.update_job(JobUpdate(id="job", num_entries_total=5))
+
+    job_changes = repository.get_job_with_result_changes("job")
+    _, job = await job_changes.__anext__()
+    assert job.num_entries_processed == 0
+
+    await repository.upsert_results(
+        [Result(id=f"job-{i}", job_id="job", mol_id=i) for i in [3, 1, 0]]
+    )
+    _, job = await asyncio.wait_for(job_changes.__anext__(), 1)
+    assert job.entries_processed.to_intervals() == [(0, 2), (3, 4)]
+    await job_changes.aclose()
+
+    results = await repository.get_results_by_job_id("job", 1, 3)
+    assert [result.mol_id for result in results] == [1, 3]
+
+    batches = [
+        [result.mol_id for result in batch]
+        async for batch in repository.iter_results_by_job_id("job", batch_size=2)
+    ]
+    assert batches == [[0, 1], [3]]
+
+    # result changes are only delivered to subscribers of the matching range
+    changes = repository.get_result_changes("job", 0, 1)
+    initial = [await changes.__anext__() for _ in range(2)]
+    assert [new.mol_id for _, new in initial] == [0, 1]
+    await repository.upsert_results([Result(id="job-4", job_id="job", mol_id=4)])
+    await repository.upsert_results([Result(id="job-1", job_id="job", mol_id=1, value=1)])
+    old, new = await asyncio.wait_for(changes.__anext__(), 1)
+    assert old.id == new.id == "job-1"
+    await changes.aclose()
+
+    await repository.delete_results_by_job_id("job")
+    assert await repository.get_results_by_job_id("job") == []
+
+
+@pytest.mark.asyncio
+async def test_expiration(repository):
+    await repository.create_job(make_job(created_at=datetime.now(timezone.utc) - timedelta(days=2)))
+    await repository.create_job(make_job(id="recent"))
+
+    deadline = datetime.now(timezone.utc) - timedelta(days=1)
+    assert [job.id async for job in repository.get_expired_jobs(deadline)] == ["job"]
+
+
+@pytest.mark.asyncio
+async def test_sources(repository):
+    await repository.create_source(Source(id="source", filename="input.smi"))
+    assert (await repository.get_source_by_id("source")).filename == "input.smi"
+
+    await repository.delete_source_by_id("source")
+    with pytest.raises(RecordNotFoundError):
+        await repository.get_source_by_id("source")
+
+    # deleting a missing source fails (like in all other repositories)
+    with pytest.raises(RecordNotFoundError):
+        await repository.delete_source_by_id("source")
+
+
+@pytest.mark.asyncio
+async def test_compact_progress_encoding(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+
+    # progress written in the compact encoding
+    repository = SqliteRepository(path, progress_encoding="compact")
+    await repository.initialize()
+    await repository.create_job(make_job())
+    await repository.upsert_results(
+        [Result(id=f"job-{i}", job_id="job", mol_id=i) for i in [5, 1, 0]]
+    )
+    await repository.close()
+
+    with sqlite3.connect(path) as connection:
+        (data,) = connection.execute("SELECT data FROM jobs").fetchone()
+    assert isinstance(json.loads(data)["entries_processed"], str)
+
+    # both encodings are readable
+    repository = SqliteRepository(path)
+    await repository.initialize()
+    job = await repository.get_job_by_id("job")
+    assert job.entries_processed.to_intervals() == [(0, 2), (5, 6)]
+    await repository.close()
+
+
+@pytest.mark.asyncio
+async def test_close_does_not_block_the_event_loop(repository):
+    def slow_query(connection):
+        time.sleep(0.3)
+        return connection.execute("SELECT 1").fetchone()[0]
+
+    query = asyncio.create_task(repository._read(slow_query))
+    await asyncio.sleep(0.05)
+
+    num_ticks = 0
+
+    async def tick():
+        nonlocal num_ticks
+        while True:
+            num_ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    # close waits for the running query
+    await repository.close()
+    ticker.cancel()
+
+    assert await query == 1
+    assert num_ticks > 5
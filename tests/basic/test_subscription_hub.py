@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from nerdd_backend.data import RecordNotFoundError, SubscriptionHub
+from nerdd_backend.models import JobWithResults, Result
+
+
+class FakeRepository:
+    def __init__(self):
+        self.num_feeds = 0
+        self.changes = asyncio.Queue()
+
+    async def get_job_with_result_changes(self, job_id):
+        if job_id != "job":
+            raise RecordNotFoundError(JobWithResults, job_id)
+
+        self.num_feeds += 1
+        while True:
+            change = await self.changes.get()
+            if change is None:
+                break
+            yield change
+
+    async def get_result_changes(self, job_id, start_mol_id=None, end_mol_id=None):
+        self.num_feeds += 1
+        while True:
+            change = await self.changes.get()
+            if change is None:
+                break
+            yield change
+
+
+def make_job(status="processing"):
+    return JobWithResults(id="job", job_type="mol-scale", source_id="1", params={}, status=status)
+
+
+async def collect(aiter, result):
+    async for change in aiter:
+        result.append(change)
+
+
+async def wait_for_length(items, length):
+    while len(items) < length:
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_subscribers_share_a_single_feed():
+    repository = FakeRepository()
+    hub = SubscriptionHub(repository)
+
+    received1 = []
+    received2 = []
+    tasks = [
+        asyncio.create_task(collect(hub.get_job_with_result_changes("job"), received1)),
+        asyncio.create_task(collect(hub.get_job_with_result_changes("job"), received2)),
+    ]
+    await asyncio.sleep(0.01)
+
+    await repository.changes.put((None, make_job()))
+    await repository.changes.put((None, make_job("completed")))
+    await repository.changes.put(None)
+    await asyncio.gather(*tasks)
+
+    assert repository.num_feeds == 1
+    assert [new.status for _, new in received1] == ["processing", "completed"]
+    assert [new.status for _, new in received2] == ["processing", "completed"]
+    assert hub.get_stats()["num_feeds"] == 0
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_receives_current_state():
+    repository = FakeRepository()
+    hub = SubscriptionHub(repository)
+
+    received1 = []
+    task1 = asyncio.create_task(collect(hub.get_job_with_result_changes("job"), received1))
+    await asyncio.sleep(0.01)
+    await repository.changes.put((None, make_job()))
+    await asyncio.sleep(0.01)
+
+    received2 = []
+    task2 = asyncio.create_task(collect(hub.get_job_with_result_changes("job"), received2))
+    await asyncio.sleep(0.01)
+
+    await repository.changes.put(None)
+    await asyncio.gather(task1, task2)
+
+    assert len(received1) == 1
+    assert len(received2) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_resynchronized():
+    repository = FakeRepository()
+    hub = SubscriptionHub(repository, queue_size=2)
+
+    subscription = hub.get_result_changes("job", 0, 9).__aiter__()
+    first = asyncio.create_task(subscription.__anext__())
+    await asyncio.sleep(0.01)
+
+    results = [Result(id=f"job-{i}", job_id="job", mol_id=i) for i in range(10)]
+    for result in results:
+        await repository.changes.put((None, result))
+    await asyncio.sleep(0.01)
+
+    received = [await first]
+    await repository.changes.put(None)
+    async for change in subscription:
+        received.append(change)
+
+    # all results are delivered, although the queue is much smaller than the number of changes
+    assert {new.id for _, new in received} == {result.id for result in results}
+
+
+@pytest.mark.asyncio
+async def test_feed_is_closed_when_last_subscriber_leaves():
+    repository = FakeRepository()
+    hub = SubscriptionHub(repository)
+
+    task = asyncio.create_task(collect(hub.get_result_changes("job", 0, 9), []))
+    await asyncio.sleep(0.01)
+    assert hub.get_stats() == dict(num_feeds=1, num_subscribers=1)
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert hub.get_stats() == dict(num_feeds=0, num_subscribers=0)
+
+
+@pytest.mark.asyncio
+async def test_errors_are_propagated():
+    hub = SubscriptionHub(FakeRepository())
+
+    with pytest.raises(RecordNotFoundError):
+        async for _ in hub.get_job_with_result_changes("unknown"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_job_changes_are_coalesced():
+    repository = FakeRepository()
+    # a generous window, so that scheduling delays (e.g. garbage collection) do not close it early
+    hub = SubscriptionHub(repository, job_changes_window_seconds=0.5)
+
+    received = []
+    task = asyncio.create_task(collect(hub.get_job_with_result_changes("job"), received))
+
+    # the initial state is sent immediately
+    await repository.changes.put((None, make_job()))
+    await asyncio.sleep(0.01)
+    assert len(received) == 1
+
+    # progress updates within a window are merged
+    jobs = [make_job() for _ in range(100)]
+    old = received[0][1]
+    for job in jobs:
+        await repository.changes.put((old, job))
+        old = job
+    await asyncio.sleep(0.01)
+    assert len(received) == 1
+
+    await asyncio.wait_for(wait_for_length(received, 2), timeout=2)
+    assert received[1] == (received[0][1], jobs[-1])
+
+    # the final state is sent immediately
+    await repository.changes.put((jobs[-1], make_job()))
+    await repository.changes.put((jobs[-1], make_job("completed")))
+    await asyncio.sleep(0.01)
+    assert len(received) == 3
+    assert received[2][1].status == "completed"
+
+    await repository.changes.put(None)
+    await task
@@ -1,3 +1,5 @@
+import pytest
+
 # we would like to define steps that are used in multiple scenarios
 # the following does not work, because pytest_bdd.given seems to be file-aware:
 #
@@ -9,3 +11,28 @@ pytest_plugins = [
     "nerdd_module.tests",
     "nerdd_link.tests",
 ]
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        default=False,
+        help="run benchmarks (tests marked with benchmark)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: slow benchmark (skipped unless --run-benchmarks is given)"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+
+    skip_benchmark = pytest.mark.skip(reason="benchmarks only run with --run-benchmarks")
+    for item in items:
+        if item.get_closest_marker("benchmark") is not None:
+            item.add_marker(skip_benchmark)